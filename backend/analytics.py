@@ -0,0 +1,190 @@
+import logging
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from pymongo import IndexModel, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+ORDER_STATUSES = ("pending", "completed")
+TOTAL_KEY = "all"
+UNKNOWN_CATEGORY = "unknown"
+
+# Fields an order needs for its rollup contribution
+ORDER_ROLLUP_PROJECTION = {
+    "_id": 0, "id": 1, "status": 1, "created_at": 1,
+    "items.product_id": 1, "items.product_category": 1, "items.quantity": 1, "items.product_price": 1,
+}
+
+
+class InvalidRange(ValueError):
+    pass
+
+
+def _day(created_at: Union[datetime, str]) -> str:
+    # Orders not yet migrated by migrate_datetimes.py store ISO strings
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at.astimezone(timezone.utc).date().isoformat()
+
+
+def order_totals(order: dict, categories: Dict[str, str]) -> Tuple[str, Dict[Tuple[str, str], Dict[str, int]]]:
+    """Return the order's day and its units, revenue and order count per (dimension, key).
+
+    Revenue is kept in integer cents so that moving an order between
+    statuses cancels out exactly. Items carry the category they had when
+    ordered; `categories` (the current catalog) only fills in for orders
+    placed before that was recorded.
+    """
+    totals: Dict[Tuple[str, str], Dict[str, int]] = {}
+    for item in order["items"]:
+        quantity = item["quantity"]
+        cents = round(item["product_price"] * 100) * quantity
+        product_id = item["product_id"]
+        category = item.get("product_category") or categories.get(product_id) or UNKNOWN_CATEGORY
+        for key in (("total", TOTAL_KEY), ("product", product_id), ("category", category)):
+            entry = totals.setdefault(key, {"units": 0, "revenue_cents": 0, "orders": 1})
+            entry["units"] += quantity
+            entry["revenue_cents"] += cents
+    return _day(order["created_at"]), totals
+
+
+def _updates(day: str, totals: Dict[Tuple[str, str], Dict[str, int]], increments: Iterable[Tuple[str, int]]) -> List[UpdateOne]:
+    return [
+        UpdateOne(
+            {"_id": f"{dimension}|{day}|{key}"},
+            {
+                "$setOnInsert": {"dimension": dimension, "key": key, "day": day},
+                "$inc": {f"{status}.{field}": sign * value for status, sign in increments for field, value in counters.items()},
+            },
+            upsert=True,
+        )
+        for (dimension, key), counters in totals.items()
+    ]
+
+
+def _row(doc: dict, status: str) -> dict:
+    counters = doc.get(status) or {}
+    return {
+        "units": counters.get("units", 0),
+        "revenue": counters.get("revenue_cents", 0) / 100,
+        "orders": counters.get("orders", 0),
+    }
+
+
+class SalesRollups:
+    """Materialized daily sales per product, per category and in total.
+
+    One document per dimension|day|key holds units, revenue and order
+    counts nested by order status. Placing an order upserts a handful of
+    $inc writes and capturing it moves the same amounts from "pending" to
+    "completed" in one write per document, so reports never scan orders.
+    """
+
+    def __init__(self, collection, max_days: int = 366):
+        self.collection = collection
+        self.max_days = max_days
+
+    async def record(self, order: dict, categories: Dict[str, str]):
+        day, totals = order_totals(order, categories)
+        await self.collection.bulk_write(_updates(day, totals, [(order["status"], 1)]), ordered=False)
+
+    async def transition(self, order: dict, categories: Dict[str, str], new_status: str):
+        """Move an order's contribution from its current status to `new_status`."""
+        if order["status"] == new_status:
+            return
+        day, totals = order_totals(order, categories)
+        await self.collection.bulk_write(_updates(day, totals, [(order["status"], -1), (new_status, 1)]), ordered=False)
+
+    def _window(self, start: date, end: date) -> dict:
+        if end < start:
+            raise InvalidRange("'to' must not be before 'from'")
+        if (end - start).days >= self.max_days:
+            raise InvalidRange(f"At most {self.max_days} days per query")
+        return {"$gte": start.isoformat(), "$lte": end.isoformat()}
+
+    async def daily(self, start: date, end: date, status: str, dimension: str = "total", key: str = TOTAL_KEY) -> List[dict]:
+        """One row per day with sales for a single product, category or the whole store."""
+        rows = self.collection.find({"dimension": dimension, "key": key, "day": self._window(start, end)}).sort("day", 1)
+        return [{"day": doc["day"], **_row(doc, status)} async for doc in rows]
+
+    async def ranking(self, dimension: str, start: date, end: date, status: str, limit: Optional[int] = None) -> List[dict]:
+        """Keys of `dimension` ordered by revenue over [start, end]."""
+        pipeline = [
+            {"$match": {"dimension": dimension, "day": self._window(start, end)}},
+            {"$group": {
+                "_id": "$key",
+                "units": {"$sum": f"${status}.units"},
+                "revenue_cents": {"$sum": f"${status}.revenue_cents"},
+                "orders": {"$sum": f"${status}.orders"},
+            }},
+            {"$match": {"orders": {"$gt": 0}}},
+            {"$sort": {"revenue_cents": -1, "_id": 1}},
+        ]
+        if limit:
+            pipeline.append({"$limit": limit})
+        return [{"key": doc["_id"], **_row({status: doc}, status)} async for doc in self.collection.aggregate(pipeline)]
+
+    async def rebuild(self, orders, categories: Dict[str, str], indexes: Sequence[IndexModel] = (), batch_size: int = 1000) -> int:
+        """Recompute every rollup from the `orders` collection; returns the order count.
+
+        Totals are accumulated in a scratch collection that is renamed over
+        the live one, so readers never see empty or partial rollups. Orders
+        created while it ran are recorded again once it is swapped in;
+        status changes to older orders made meanwhile are only picked up by
+        the next rebuild.
+        """
+        started = datetime.now(timezone.utc)
+        scratch = self.collection.database[f"{self.collection.name}_rebuild"]
+        await scratch.drop()
+        if indexes:
+            await scratch.create_indexes(list(indexes))
+        else:
+            await self.collection.database.create_collection(scratch.name)
+        # Legacy string timestamps predate the rebuild, whatever their value
+        before = {"$or": [{"created_at": {"$lt": started}}, {"created_at": {"$type": "string"}}]}
+        count = await self._accumulate(scratch, orders.find(before, ORDER_ROLLUP_PROJECTION), categories, batch_size)
+        # Live writes for orders created from here on land in the renamed collection
+        swapped = datetime.now(timezone.utc)
+        await scratch.rename(self.collection.name, dropTarget=True)
+        after = {"created_at": {"$gte": started, "$lt": swapped}}
+        count += await self._accumulate(self.collection, orders.find(after, ORDER_ROLLUP_PROJECTION), categories, batch_size)
+        return count
+
+    async def _accumulate(self, target, orders, categories: Dict[str, str], batch_size: int) -> int:
+        """$inc the totals of `orders` into `target`, merging up to `batch_size` rollups per write."""
+        pending: Dict[str, dict] = {}
+        count = 0
+
+        async def flush():
+            if pending:
+                await target.bulk_write([
+                    UpdateOne(
+                        {"_id": _id},
+                        {"$setOnInsert": doc["fields"], "$inc": doc["inc"]},
+                        upsert=True,
+                    )
+                    for _id, doc in pending.items()
+                ], ordered=False)
+                pending.clear()
+
+        async for order in orders:
+            if order.get("status") not in ORDER_STATUSES or not order.get("items"):
+                continue
+            try:
+                day, totals = order_totals(order, categories)
+            except (ValueError, TypeError):
+                logger.warning("Skipping order %s with unreadable created_at %r", order.get("id"), order.get("created_at"))
+                continue
+            count += 1
+            for (dimension, key), counters in totals.items():
+                doc = pending.setdefault(f"{dimension}|{day}|{key}", {"fields": {"dimension": dimension, "key": key, "day": day}, "inc": {}})
+                for field, value in counters.items():
+                    path = f"{order['status']}.{field}"
+                    doc["inc"][path] = doc["inc"].get(path, 0) + value
+            if len(pending) >= batch_size:
+                await flush()
+        await flush()
+        return count
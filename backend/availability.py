@@ -0,0 +1,125 @@
+import unicodedata
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Tuple
+
+from pymongo.errors import BulkWriteError
+
+# Model.availability uses these names; index matches date.weekday()
+WEEKDAYS = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+
+DUPLICATE_KEY = 11000
+
+
+class InvalidBookingTime(ValueError):
+    pass
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+def _fold(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+
+
+_WEEKDAY_INDEX = {_fold(name): index for index, name in enumerate(WEEKDAYS)}
+
+
+def weekdays(availability: Iterable[str]) -> set:
+    """Weekday numbers for names like "Terça", "terca" or "Terça-feira"."""
+    days = set()
+    for name in availability:
+        index = _WEEKDAY_INDEX.get(_fold(name).split("-")[0].strip())
+        if index is not None:
+            days.add(index)
+    return days
+
+
+class BookingCalendar:
+    """Hour-granular booking slots backed by a claims collection.
+
+    Each booked hour is one document whose `_id` is model|date|hour, so the
+    unique `_id` index rejects overlapping bookings atomically across
+    workers, and the claims double as an interval index for free-slot
+    queries by (model_id, date).
+    """
+
+    def __init__(self, collection, opening_hour: int = 9, closing_hour: int = 20, max_days: int = 92):
+        self.collection = collection
+        self.opening_hour = opening_hour
+        self.closing_hour = closing_hour
+        self.max_days = max_days
+
+    def parse(self, day: str, time: str, duration: int) -> Tuple[date, int]:
+        """Validate a booking request and return (date, starting hour)."""
+        try:
+            booking_date = date.fromisoformat(day)
+            start = datetime.strptime(time, "%H:%M")
+        except ValueError:
+            raise InvalidBookingTime("Date must be YYYY-MM-DD and time HH:MM")
+        if start.minute:
+            raise InvalidBookingTime("Bookings start on the hour")
+        if duration < 1:
+            raise InvalidBookingTime("Duration must be at least one hour")
+        if start.hour < self.opening_hour or start.hour + duration > self.closing_hour:
+            raise InvalidBookingTime(
+                f"Bookings must fit between {self.opening_hour:02d}:00 and {self.closing_hour:02d}:00"
+            )
+        return booking_date, start.hour
+
+    async def reserve(self, model_id: str, booking_id: str, day: date, hour: int, duration: int):
+        """Claim every hour of the booking, or none of them."""
+        claims = [
+            {
+                "_id": f"{model_id}|{day.isoformat()}|{h:02d}",
+                "model_id": model_id,
+                "date": day.isoformat(),
+                "hour": h,
+                "booking_id": booking_id,
+            }
+            for h in range(hour, hour + duration)
+        ]
+        try:
+            await self.collection.insert_many(claims, ordered=True)
+        except BulkWriteError as exc:
+            await self.release(booking_id)
+            if any(error.get("code") == DUPLICATE_KEY for error in exc.details.get("writeErrors", [])):
+                raise SlotUnavailable(model_id)
+            raise
+
+    async def release(self, booking_id: str):
+        await self.collection.delete_many({"booking_id": booking_id})
+
+    async def free_slots(self, model_id: str, availability: Iterable[str], start: date, end: date, duration: int) -> List[dict]:
+        """Start times per available day in [start, end] where `duration` hours are free."""
+        if end < start:
+            raise InvalidBookingTime("'to' must not be before 'from'")
+        if (end - start).days >= self.max_days:
+            raise InvalidBookingTime(f"At most {self.max_days} days per query")
+        open_days = weekdays(availability)
+
+        busy = {}
+        claims = self.collection.find(
+            {"model_id": model_id, "date": {"$gte": start.isoformat(), "$lte": end.isoformat()}},
+            {"_id": 0, "date": 1, "hour": 1},
+        )
+        async for claim in claims:
+            busy[claim["date"]] = busy.get(claim["date"], 0) | (1 << claim["hour"])
+
+        window = (1 << duration) - 1
+        days = []
+        day = start
+        while day <= end:
+            if day.weekday() in open_days:
+                taken = busy.get(day.isoformat(), 0)
+                slots = [
+                    f"{hour:02d}:00"
+                    for hour in range(self.opening_hour, self.closing_hour - duration + 1)
+                    if not taken & (window << hour)
+                ]
+                days.append({"date": day.isoformat(), "weekday": WEEKDAYS[day.weekday()], "slots": slots})
+            day += timedelta(days=1)
+        return days
+
+    async def has_claims(self, booking_id: str) -> bool:
+        return await self.collection.find_one({"booking_id": booking_id}, {"_id": 1}) is not None
@@ -0,0 +1,45 @@
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+
+from availability import BookingCalendar, InvalidBookingTime, SlotUnavailable
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+db = client[os.environ['DB_NAME']]
+
+calendar = BookingCalendar(
+    db.booking_slots,
+    opening_hour=int(os.environ.get('BOOKING_OPENING_HOUR', '9')),
+    closing_hour=int(os.environ.get('BOOKING_CLOSING_HOUR', '20')),
+)
+
+async def main():
+    """Claim slots for bookings created before the availability engine.
+
+    Bookings are replayed oldest first, so when legacy data overlaps the
+    earliest booking keeps the slot and the later ones are reported.
+    """
+    print("📅 Registrando horários das reservas existentes...")
+    claimed = skipped = 0
+    bookings = db.bookings.find({}, {"_id": 0, "id": 1, "model_id": 1, "date": 1, "time": 1, "duration": 1}).sort("created_at", 1)
+    async for booking in bookings:
+        if await calendar.has_claims(booking["id"]):
+            continue
+        try:
+            day, hour = calendar.parse(booking["date"], booking["time"], booking["duration"])
+            await calendar.reserve(booking["model_id"], booking["id"], day, hour, booking["duration"])
+            claimed += 1
+        except (InvalidBookingTime, SlotUnavailable) as e:
+            skipped += 1
+            print(f"⚠️  Reserva {booking['id']} ({booking['date']} {booking['time']}): {type(e).__name__} {e}")
+    print(f"✅ {claimed} reservas registradas, {skipped} ignoradas")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
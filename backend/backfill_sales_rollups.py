@@ -0,0 +1,35 @@
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+
+from analytics import SalesRollups
+from indexes import INDEXES
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+db = client[os.environ['DB_NAME']]
+
+async def main():
+    """Recompute the daily sales rollups from every stored order.
+
+    The new rollups replace the old ones in one rename, so reports stay
+    readable throughout. Orders captured while this runs may keep their
+    pending totals until the next run, so prefer a quiet window.
+    """
+    print("📊 Recalculando métricas de vendas...")
+    categories = {
+        product["id"]: product.get("category")
+        async for product in db.products.find({}, {"_id": 0, "id": 1, "category": 1})
+    }
+    rollups = SalesRollups(db.sales_daily)
+    count = await rollups.rebuild(db.orders, categories, indexes=INDEXES["sales_daily"])
+    print(f"✅ {count} pedidos agregados em {await db.sales_daily.count_documents({})} registros diários")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import httpx
+from fastapi import FastAPI, Response
+
+from fast_json import encode_documents, fast_response, model_encoder, projection_for
+import server
+from server import Order, Product
+
+# One INFO line per request would drown the timings
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def synthetic_products(count: int) -> List[Product]:
+    start = datetime.now(timezone.utc)
+    return [
+        Product(
+            id=str(uuid.uuid4()),
+            name=f"Produto {i}",
+            description="Peça de coleção com acabamento artesanal " * 3,
+            price=round(49.9 + i % 300, 2),
+            category=("vestidos", "blusas", "calcas", "acessorios")[i % 4],
+            image_url=f"https://images.example.com/products/{i}.jpg",
+            sizes=["PP", "P", "M", "G", "GG"],
+            colors=["Preto", "Branco", "Vermelho"],
+            stock=i % 50,
+            created_at=start + timedelta(milliseconds=i),
+        )
+        for i in range(count)
+    ]
+
+
+def synthetic_orders(count: int) -> List[dict]:
+    start = datetime.now(timezone.utc)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": "bench-user",
+            "items": [
+                {
+                    "product_id": str(uuid.uuid4()),
+                    "quantity": 1 + j,
+                    "size": "M",
+                    "color": "Preto",
+                    "product_name": f"Produto {j}",
+                    "product_price": 129.9,
+                    "product_image": f"https://images.example.com/products/{j}.jpg",
+                }
+                for j in range(3)
+            ],
+            "total": 779.4,
+            "status": "paid",
+            "paypal_order_id": f"PAY-{i}",
+            "address": "Rua Augusta, 100 - São Paulo, SP",
+            "created_at": start - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+def build_app(products: List[Product], orders: List[dict]) -> FastAPI:
+    app = FastAPI()
+    encode_products = model_encoder(List[Product])
+    order_fields = set(projection_for(Order)) - {"_id"}
+    orders = [{key: value for key, value in order.items() if key in order_fields} for order in orders]
+
+    @app.get("/validated/products", response_model=List[Product])
+    async def validated_products():
+        return products
+
+    @app.get("/fast/products")
+    async def fast_products(response: Response):
+        return fast_response(encode_products(products), response)
+
+    @app.get("/validated/orders", response_model=List[Order])
+    async def validated_orders():
+        return orders
+
+    @app.get("/fast/orders")
+    async def fast_orders(response: Response):
+        return fast_response(encode_documents(orders), response)
+
+    return app
+
+
+async def measure(http: httpx.AsyncClient, path: str, requests: int):
+    await http.get(path)
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await http.get(path)
+        response.raise_for_status()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"   {path:<24} mediana {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms   {len(response.content) / 1024:7.1f} KiB")
+
+
+async def bench_synthetic(size: int, requests: int):
+    app = build_app(synthetic_products(size), synthetic_orders(size))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        print(f"📦 {size} documentos sintéticos, {requests} requisições por rota")
+        for resource in ("products", "orders"):
+            await measure(http, f"/validated/{resource}", requests)
+            await measure(http, f"/fast/{resource}", requests)
+
+
+async def bench_live(requests: int, limit: int):
+    app = server.create_app()
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            for flag in (False, True):
+                server.FAST_JSON = flag
+                print(f"🔌 FAST_JSON={flag}")
+                await measure(http, f"/api/products?limit={limit}", requests)
+                await measure(http, f"/api/models?limit={limit}", requests)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compara a serialização validada com o caminho orjson")
+    parser.add_argument("--size", type=int, default=500, help="documentos por resposta")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--live", action="store_true", help="usa o app real contra o MongoDB configurado")
+    args = parser.parse_args()
+
+    if args.live:
+        await bench_live(args.requests, args.size)
+    else:
+        await bench_synthetic(args.size, args.requests)
+    print("✅ Benchmark concluído!")
+
+if __name__ == "__main__":
+    asyncio.run(main())
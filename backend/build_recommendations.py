@@ -0,0 +1,40 @@
+import argparse
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+
+from recommendations import Recommendations
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+db = client[os.environ['DB_NAME']]
+
+async def main():
+    """Build or update the co-occurrence snapshot the API loads on startup.
+
+    An existing snapshot is extended from its watermark; --rebuild starts
+    over from the first order.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--output", type=Path, default=Path(os.environ.get('RECOMMENDATIONS_SNAPSHOT', ROOT_DIR / 'recommendations.npz')))
+    parser.add_argument("--rebuild", action="store_true", help="ignora o snapshot existente")
+    args = parser.parse_args()
+
+    if args.rebuild and args.output.exists():
+        args.output.unlink()
+    recommendations = Recommendations(db.orders, snapshot_path=args.output, settle_seconds=0)
+    print("🛍️  Calculando produtos comprados juntos...")
+    await recommendations.load()
+    read = await recommendations.catch_up()
+    await recommendations.save()
+    matrix = recommendations.matrix
+    print(f"✅ {read} pedidos novos, {len(matrix.ids)} produtos, {matrix.nnz} pares salvos em {args.output}")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+from typing import Iterable, List
+
+# Cart lines are identified by (product_id, size, color). Every helper here
+# builds a single server-side update so a mutation is one atomic round trip
+# and concurrent writers never overwrite each other's lines.
+
+# Fields of a stored cart line (CartItem). Lines whose quantity changes are
+# rebuilt from these rather than with $mergeObjects, which keeps the
+# pipelines runnable on mongomock in tests.
+LINE_FIELDS = ("product_id", "size", "color", "quantity", "product_name", "product_price", "product_image")
+
+
+def line_match(product_id: str, size: str, color: str) -> dict:
+    return {"product_id": product_id, "size": size, "color": color}
+
+
+def _line_expr(product_id: str, size: str, color: str, var: str = "$$this") -> dict:
+    return {"$and": [
+        {"$eq": [f"{var}.product_id", {"$literal": product_id}]},
+        {"$eq": [f"{var}.size", {"$literal": size}]},
+        {"$eq": [f"{var}.color", {"$literal": color}]},
+    ]}
+
+
+def _with_quantity(quantity) -> dict:
+    """The current line (`$$this`) with its quantity replaced by the expression `quantity`."""
+    line = {field: f"$$this.{field}" for field in LINE_FIELDS}
+    line["quantity"] = quantity
+    return line
+
+
+def _add_expr(items, item: dict) -> dict:
+    match = _line_expr(item["product_id"], item["size"], item["color"])
+    increment = _with_quantity({"$add": ["$$this.quantity", {"$literal": item["quantity"]}]})
+    return {"$cond": [
+        {"$gt": [{"$size": {"$filter": {"input": items, "cond": match}}}, 0]},
+        {"$map": {"input": items, "in": {"$cond": [match, increment, "$$this"]}}},
+        # Values such as "$x" must not be read as field paths inside a pipeline.
+        {"$concatArrays": [items, {"$literal": [item]}]},
+    ]}
+
+
+def _remove_expr(items, product_id: str, size: str, color: str) -> dict:
+    return {"$filter": {"input": items, "cond": {"$not": _line_expr(product_id, size, color)}}}
+
+
+def _set_quantity_expr(items, product_id: str, size: str, color: str, quantity: int) -> dict:
+    match = _line_expr(product_id, size, color)
+    replace = _with_quantity({"$literal": quantity})
+    return {"$map": {"input": items, "in": {"$cond": [match, replace, "$$this"]}}}
+
+
+def add_item_pipeline(item: dict, cart_id: str, updated_at) -> List[dict]:
+    """Pipeline update that increments an existing line or appends a new one.
+
+    A plain `$inc` with array filters cannot append a missing line in the same
+    operation, so the merge is expressed as an aggregation pipeline instead.
+    """
+    return [{"$set": {
+        "id": {"$ifNull": ["$id", {"$literal": cart_id}]},
+        "items": _add_expr({"$ifNull": ["$items", []]}, item),
+        "updated_at": {"$literal": updated_at},
+    }}]
+
+
+def batch_pipeline(operations: Iterable[dict], cart_id: str, updated_at) -> List[dict]:
+    """Pipeline update applying add/remove/set operations in order.
+
+    Each operation is its own `$set` stage over the previous stage's items,
+    so the pipeline grows linearly with the batch and the whole batch is a
+    single atomic write. `set` with a quantity below one removes the line;
+    `set` on a missing line is a no-op.
+    """
+    stages = [{"$set": {"items": {"$ifNull": ["$items", []]}}}]
+    for operation in operations:
+        key = (operation["product_id"], operation["size"], operation["color"])
+        if operation["op"] == "add":
+            item = {field: value for field, value in operation.items() if field != "op"}
+            items = _add_expr("$items", item)
+        elif operation["op"] == "remove" or operation["quantity"] < 1:
+            items = _remove_expr("$items", *key)
+        else:
+            items = _set_quantity_expr("$items", *key, operation["quantity"])
+        stages.append({"$set": {"items": items}})
+    stages.append({"$set": {
+        "id": {"$ifNull": ["$id", {"$literal": cart_id}]},
+        "updated_at": {"$literal": updated_at},
+    }})
+    return stages
+
+
+def remove_item_update(product_id: str, size: str, color: str, updated_at) -> dict:
+    return {
+        "$pull": {"items": line_match(product_id, size, color)},
+        "$set": {"updated_at": updated_at},
+    }
+
+
+def set_quantity_update(product_id: str, size: str, color: str, quantity: int, updated_at):
+    """Update setting the quantity of one existing line; below one it removes the line."""
+    if quantity < 1:
+        return remove_item_update(product_id, size, color, updated_at)
+    return [{"$set": {
+        "items": _set_quantity_expr("$items", product_id, size, color, quantity),
+        "updated_at": {"$literal": updated_at},
+    }}]
@@ -0,0 +1,297 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+from pagination import paginate, paginate_sorted, parse_sort, sort_key
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(item: BaseModel, exclude: Optional[set] = None) -> int:
+    data = item.model_dump_json(exclude=exclude).encode()
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class CatalogCache:
+    """In-memory copy of a catalog collection indexed by `id` and `group_by`.
+
+    While the whole collection fits in `max_size` documents the cache is
+    authoritative for listings; larger catalogs degrade to a bounded LRU of
+    individual documents and listings go back to Mongo.
+
+    Fields in `volatile_fields` are left out of document digests: changes to
+    only those fields keep the cached copy, version and fingerprint as they
+    are, so cached values of them may lag behind Mongo.
+    """
+
+    def __init__(
+        self,
+        collection,
+        model: Type[BaseModel],
+        group_by: Optional[str] = None,
+        ttl_seconds: float = 300.0,
+        max_size: int = 50000,
+        poll_interval: float = 30.0,
+        volatile_fields: Iterable[str] = (),
+    ):
+        self.collection = collection
+        self.model = model
+        self.group_by = group_by
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.poll_interval = poll_interval
+        self.volatile_fields = set(volatile_fields) or None
+        self.version = 0
+
+        self._by_id: "OrderedDict[str, BaseModel]" = OrderedDict()
+        self._by_group: Dict[str, Dict[str, BaseModel]] = {}
+        self._oid_to_id: Dict[object, str] = {}
+        self._id_to_oid: Dict[str, object] = {}
+        self._digests: Dict[str, int] = {}
+        self._fingerprint = 0
+        self._views: Dict[Tuple[Optional[str], str], Tuple[List[tuple], List[BaseModel]]] = {}
+        self._complete = False
+        self._loaded_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._watch_task: Optional[asyncio.Task] = None
+        self._listeners: List = []
+
+    # Lifecycle
+    async def start(self):
+        try:
+            await self.refresh()
+        except PyMongoError:
+            logger.exception("Catalog cache warm-up failed for %s, loading on first request", self.collection.name)
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    @property
+    def is_fresh(self) -> bool:
+        return bool(self._loaded_at) and (time.monotonic() - self._loaded_at) < self.ttl_seconds
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        """Content hash of the full catalog, identical in every worker.
+
+        It is an XOR of per-document digests, so single-document changes update
+        it in O(1). None while only part of the catalog is cached.
+        """
+        return f"{self._fingerprint:016x}" if self._complete else None
+
+    def add_listener(self, listener):
+        """Register an object with reset(items), upsert(item) and remove(id).
+
+        reset() receives None while the catalog is too large to hold in full,
+        so listeners that need every document can mark themselves unavailable.
+        """
+        self._listeners.append(listener)
+        if self._loaded_at:
+            listener.reset(self._by_id.values() if self._complete else None)
+
+    def groups(self) -> List[str]:
+        return list(self._by_group)
+
+    # Reads
+    async def page(self, group: Optional[str], sort: str, limit: int, cursor: Optional[str] = None):
+        """Return (items, next_cursor) for one page of the catalog in `sort` order."""
+        await self.ensure_fresh()
+        if not self._complete:
+            query = {self.group_by: group} if group else {}
+            docs, next_cursor = await paginate(self.collection, query, sort, limit, cursor)
+            return [self.model(**doc) for doc in docs], next_cursor
+
+        keys, items = self._sorted_view(group, parse_sort(sort)[0])
+        return paginate_sorted(keys, items, sort, limit, cursor)
+
+    async def get(self, item_id: str) -> Optional[BaseModel]:
+        await self.ensure_fresh()
+        item = self._by_id.get(item_id)
+        if item is not None:
+            if not self._complete:
+                self._by_id.move_to_end(item_id)
+            return item
+
+        doc = await self.collection.find_one({"id": item_id})
+        if not doc:
+            return None
+        return self._store(doc)
+
+    async def get_many(self, item_ids: Iterable[str]) -> Dict[str, BaseModel]:
+        """Look up several documents, fetching any misses in one query."""
+        await self.ensure_fresh()
+        found: Dict[str, BaseModel] = {}
+        missing = []
+        for item_id in dict.fromkeys(item_ids):
+            item = self._by_id.get(item_id)
+            if item is None:
+                missing.append(item_id)
+            else:
+                found[item_id] = item
+        if missing:
+            async for doc in self.collection.find({"id": {"$in": missing}}):
+                item = self._store(doc)
+                found[item.id] = item
+        return found
+
+    async def ensure_fresh(self):
+        if not self.is_fresh:
+            await self.refresh()
+
+    # Invalidation
+    def invalidate(self):
+        self._loaded_at = 0.0
+
+    def discard(self, item_id: str):
+        item = self._by_id.pop(item_id, None)
+        if item is None:
+            return
+        self._views.clear()
+        self._fingerprint ^= self._digests.pop(item_id, 0)
+        self.version += 1
+        if self.group_by:
+            group = getattr(item, self.group_by)
+            bucket = self._by_group.get(group)
+            if bucket is not None:
+                bucket.pop(item_id, None)
+                if not bucket:
+                    del self._by_group[group]
+        oid = self._id_to_oid.pop(item_id, None)
+        if oid is not None:
+            self._oid_to_id.pop(oid, None)
+        for listener in self._listeners:
+            listener.remove(item_id)
+
+    async def refresh(self, force: bool = False):
+        async with self._refresh_lock:
+            if self.is_fresh and not force:
+                return
+            count = await self.collection.estimated_document_count()
+            by_id: "OrderedDict[str, BaseModel]" = OrderedDict()
+            by_group: Dict[str, Dict[str, BaseModel]] = {}
+            oid_to_id: Dict[object, str] = {}
+            id_to_oid: Dict[str, object] = {}
+            digests: Dict[str, int] = {}
+            fingerprint = 0
+            complete = count <= self.max_size
+
+            if complete:
+                async for doc in self.collection.find({}):
+                    oid = doc.pop("_id")
+                    oid_to_id[oid] = doc["id"]
+                    id_to_oid[doc["id"]] = oid
+                    item = self.model(**doc)
+                    by_id[item.id] = item
+                    if self.group_by:
+                        by_group.setdefault(getattr(item, self.group_by), {})[item.id] = item
+                    digests[item.id] = _digest(item, self.volatile_fields)
+                    fingerprint ^= digests[item.id]
+                complete = len(by_id) <= self.max_size
+
+            if complete and self._complete and fingerprint == self._fingerprint:
+                # Nothing changed; keep the current views and listeners as they are.
+                self._loaded_at = time.monotonic()
+                return
+
+            self._by_id = by_id
+            self._by_group = by_group
+            self._views = {}
+            self._oid_to_id = oid_to_id
+            self._id_to_oid = id_to_oid
+            self._digests = digests
+            self._fingerprint = fingerprint
+            self._complete = complete
+            self._loaded_at = time.monotonic()
+            self.version += 1
+            for listener in self._listeners:
+                listener.reset(by_id.values() if complete else None)
+
+    def _sorted_view(self, group: Optional[str], field: str):
+        view = self._views.get((group, field))
+        if view is None:
+            source = self._by_group.get(group, {}).values() if group else self._by_id.values()
+            keyed = sorted((sort_key(getattr(item, field), item.id), item) for item in source)
+            view = ([key for key, _ in keyed], [item for _, item in keyed])
+            self._views[(group, field)] = view
+        return view
+
+    def _store(self, doc: dict) -> BaseModel:
+        oid = doc.pop("_id", None)
+        item = self.model(**doc)
+        previous = self._by_id.get(item.id)
+        digest = _digest(item, self.volatile_fields)
+        if previous is not None and self._digests.get(item.id) == digest:
+            # Only volatile fields or fields outside the model changed; views and the fingerprint stay valid
+            return previous
+        if self.group_by:
+            group = getattr(item, self.group_by)
+            if previous is not None and getattr(previous, self.group_by) != group:
+                self._by_group.get(getattr(previous, self.group_by), {}).pop(item.id, None)
+            self._by_group.setdefault(group, {})[item.id] = item
+        self._by_id[item.id] = item
+        self._views.clear()
+        self._fingerprint ^= self._digests.get(item.id, 0) ^ digest
+        self._digests[item.id] = digest
+        self.version += 1
+        if oid is not None:
+            self._oid_to_id[oid] = item.id
+            self._id_to_oid[item.id] = oid
+        for listener in self._listeners:
+            listener.upsert(item)
+
+        if len(self._by_id) > self.max_size:
+            self._complete = False
+            self._by_id.move_to_end(item.id)
+            while len(self._by_id) > self.max_size:
+                self.discard(next(iter(self._by_id)))
+        return item
+
+    # Change feed
+    async def _watch(self):
+        try:
+            await self._watch_change_stream()
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as exc:
+            logger.info("Change stream on %s unavailable (%s), polling every %ss", self.collection.name, exc, self.poll_interval)
+        except Exception:
+            # Whatever ended the stream, the cache must not go stale until its TTL
+            logger.exception("Change stream on %s failed, falling back to polling", self.collection.name)
+        await self._poll()
+
+    async def _watch_change_stream(self):
+        async with self.collection.watch(full_document="updateLookup") as stream:
+            async for change in stream:
+                operation = change["operationType"]
+                if operation in ("insert", "update", "replace"):
+                    doc = change.get("fullDocument")
+                    if doc:
+                        self._store(doc)
+                elif operation == "delete":
+                    item_id = self._oid_to_id.get(change["documentKey"]["_id"])
+                    if item_id is not None:
+                        self.discard(item_id)
+                else:
+                    self.invalidate()
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.refresh(force=True)
+            except Exception:
+                logger.exception("Catalog cache refresh failed for %s", self.collection.name)
@@ -0,0 +1,149 @@
+import asyncio
+import gzip
+from typing import Callable, Dict, List, Optional
+
+from fastapi import Response
+
+from catalog_cache import CatalogCache
+
+try:
+    import brotli
+except ImportError:  # Optional; without it only gzip variants are built
+    brotli = None
+
+# Bodies larger than this are compressed off the event loop
+INLINE_COMPRESS_LIMIT = 256 * 1024
+
+
+def _accepted(header: Optional[str]) -> Dict[str, float]:
+    weights = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip().lower()] = q
+    return weights
+
+
+def choose_encoding(accept_encoding: Optional[str], available) -> str:
+    """Best of `available` ("br", "gzip") for an Accept-Encoding header, else "identity"."""
+    weights = _accepted(accept_encoding)
+    wildcard = weights.get("*", 0.0)
+    best, best_q = "identity", 0.0
+    for coding in ("br", "gzip"):
+        q = weights.get(coding, wildcard)
+        if coding in available and q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class Snapshot:
+    def __init__(self, version: int, body: bytes, next_cursor: Optional[str]):
+        self.version = version
+        self.next_cursor = next_cursor
+        self.variants: Dict[str, bytes] = {"identity": body}
+
+
+class CatalogSnapshots:
+    """Pre-serialized, precompressed first pages of catalog listings.
+
+    Each view (a group, or the whole catalog when group is None) is the
+    default first page of `cache.page`, encoded once per catalog version
+    and stored with gzip and, when available, brotli variants. A version
+    bump only recompresses views whose JSON actually changed, so a price
+    change in one category leaves the others alone.
+    """
+
+    def __init__(
+        self,
+        cache: CatalogCache,
+        encode: Callable[[List], bytes],
+        sort: str,
+        limit: int,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+        min_size: int = 1024,
+    ):
+        self.cache = cache
+        self.encode = encode
+        self.sort = sort
+        self.limit = limit
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.min_size = min_size
+        self._views: Dict[Optional[str], Snapshot] = {}
+        self._lock = asyncio.Lock()
+
+    def serves(self, sort: str, limit: int, cursor: Optional[str]) -> bool:
+        return cursor is None and sort == self.sort and limit == self.limit
+
+    async def get(self, group: Optional[str] = None) -> Optional[Snapshot]:
+        """Current snapshot of a view, or None while the catalog is only partly cached."""
+        await self.cache.ensure_fresh()
+        if self.cache.fingerprint is None:
+            return None
+        # Only real groups get a view, so arbitrary query values cannot grow the cache
+        if group is not None and group not in self.cache.groups():
+            return None
+        snapshot = self._views.get(group)
+        if snapshot is not None and snapshot.version == self.cache.version:
+            return snapshot
+        async with self._lock:
+            return await self._build(group)
+
+    async def warm(self):
+        """Build every view up front so the first requests after a deploy are cheap."""
+        await self.cache.ensure_fresh()
+        if self.cache.fingerprint is None:
+            return
+        async with self._lock:
+            for group in [None, *self.cache.groups()]:
+                await self._build(group)
+
+    async def _build(self, group: Optional[str]) -> Snapshot:
+        version = self.cache.version
+        previous = self._views.get(group)
+        if previous is not None and previous.version == version:
+            return previous
+        items, next_cursor = await self.cache.page(group, self.sort, self.limit)
+        body = self.encode(items)
+        if previous is not None and previous.variants["identity"] == body and previous.next_cursor == next_cursor:
+            previous.version = version
+            return previous
+
+        snapshot = Snapshot(version, body, next_cursor)
+        if len(body) >= self.min_size:
+            if len(body) > INLINE_COMPRESS_LIMIT:
+                snapshot.variants.update(await asyncio.to_thread(self._compress, body))
+            else:
+                snapshot.variants.update(self._compress(body))
+        self._views[group] = snapshot
+        return snapshot
+
+    def _compress(self, body: bytes) -> Dict[str, bytes]:
+        variants = {"gzip": gzip.compress(body, compresslevel=self.gzip_level, mtime=0)}
+        if brotli is not None:
+            variants["br"] = brotli.compress(body, quality=self.brotli_quality, mode=brotli.MODE_TEXT)
+        return variants
+
+
+def snapshot_response(snapshot: Snapshot, accept_encoding: Optional[str], response: Response) -> Response:
+    """Raw-bytes response for the best variant, keeping headers set on `response`."""
+    encoding = choose_encoding(accept_encoding, snapshot.variants)
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    headers["vary"] = "Accept-Encoding"
+    if encoding != "identity":
+        headers["content-encoding"] = encoding
+        # Compressed bytes differ from the identity body, so the validator is weak
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["etag"] = f"W/{etag}"
+    return Response(content=snapshot.variants[encoding], media_type="application/json", headers=headers)
@@ -0,0 +1,85 @@
+import csv
+import io
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Iterable, List, Sequence
+
+import anyio
+import orjson
+
+from fast_json import ORJSON_OPTIONS
+
+# Rows are flushed to the client in chunks of about this many bytes
+CHUNK_SIZE = 64 * 1024
+
+ORDER_CSV_COLUMNS = [
+    "order_id", "created_at", "user_id", "status", "total", "address", "paypal_order_id",
+    "product_id", "product_name", "size", "color", "quantity", "product_price",
+]
+BOOKING_CSV_COLUMNS = [
+    "id", "created_at", "user_id", "model_id", "date", "time", "duration", "status", "budget", "message",
+]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def order_rows(order: dict) -> Iterable[list]:
+    """One CSV row per order line, repeating the order columns."""
+    head = [order.get(field) for field in ("id", "created_at", "user_id", "status", "total", "address", "paypal_order_id")]
+    for item in order.get("items") or [{}]:
+        yield head + [item.get(field) for field in ("product_id", "product_name", "size", "color", "quantity", "product_price")]
+
+
+def booking_rows(booking: dict) -> Iterable[list]:
+    yield [booking.get(field) for field in BOOKING_CSV_COLUMNS]
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).isoformat()
+    text = str(value)
+    # Spreadsheets run cells starting with these as formulas
+    if isinstance(value, str) and text[:1] in ("=", "+", "-", "@"):
+        return "'" + text
+    return text
+
+
+async def _chunked(cursor, encode: Callable[[dict], bytes], head: bytes = b"") -> AsyncIterator[bytes]:
+    """Encode documents from `cursor` into ~CHUNK_SIZE byte chunks.
+
+    Only one cursor batch and one chunk are held at a time. The response
+    awaits each send, so a slow client pauses the cursor instead of
+    buffering rows, and a disconnect cancels the generator, which closes
+    the server-side cursor.
+    """
+    buffer = bytearray(head)
+    try:
+        async for doc in cursor:
+            buffer += encode(doc)
+            if len(buffer) >= CHUNK_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+    finally:
+        with anyio.CancelScope(shield=True):
+            await cursor.close()
+
+
+def ndjson_stream(cursor) -> AsyncIterator[bytes]:
+    return _chunked(cursor, lambda doc: orjson.dumps(doc, option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE))
+
+
+def csv_stream(cursor, columns: Sequence[str], rows: Callable[[dict], Iterable[list]]) -> AsyncIterator[bytes]:
+    text = io.StringIO()
+    writer = csv.writer(text)
+
+    def encode(values: List[list]) -> bytes:
+        writer.writerows([[_cell(value) for value in row] for row in values])
+        data = text.getvalue().encode()
+        text.seek(0)
+        text.truncate()
+        return data
+
+    return _chunked(cursor, lambda doc: encode(list(rows(doc))), head=encode([list(columns)]))
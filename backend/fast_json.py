@@ -0,0 +1,31 @@
+from typing import Any, Callable, Dict, Type
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+# Mongo returns naive datetimes unless the client is tz_aware; both are UTC.
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+def projection_for(model: Type[BaseModel]) -> Dict[str, int]:
+    """Mongo projection returning only the fields `model` declares."""
+    projection = {"_id": 0}
+    projection.update({name: 1 for name in model.model_fields})
+    return projection
+
+
+def encode_documents(documents: Any) -> bytes:
+    """Encode trusted, already-projected Mongo documents without validation."""
+    return orjson.dumps(documents, option=ORJSON_OPTIONS)
+
+
+def model_encoder(type_: Any) -> Callable[[Any], bytes]:
+    """Serializer for model instances (or lists of them) that skips validation."""
+    return TypeAdapter(type_).dump_json
+
+
+def fast_response(body: bytes, response: Response) -> Response:
+    """Wrap pre-encoded JSON, keeping headers set on the injected `response`."""
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return Response(content=body, media_type="application/json", headers=headers)
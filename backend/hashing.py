@@ -0,0 +1,75 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+
+class HasherSaturated(Exception):
+    pass
+
+
+# CryptContext is not picklable, so workers build their own from the rounds.
+# passlib is imported on first use, keeping it out of the app's import time.
+@lru_cache(maxsize=None)
+def _context(rounds: int) -> "CryptContext":
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+
+def _load_backend(rounds: int) -> None:
+    # Resolving the bcrypt backend runs its self-test, which costs several hashes
+    _context(rounds).handler().get_backend()
+
+
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return _context(rounds).verify_and_update(password, hashed)
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated executor so it never blocks the event loop.
+
+    At most `max_pending` calls may be queued or running; further calls fail
+    fast with HasherSaturated instead of piling up behind the workers.
+    """
+
+    def __init__(self, rounds: int = 12, max_workers: int = 4, max_pending: int = 64, use_processes: bool = False):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pending = 0
+        executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self._executor: Executor = executor_cls(max_workers=max_workers)
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password, self.rounds)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Return (valid, new_hash); new_hash is set when the stored cost is outdated."""
+        return await self._submit(_verify_and_update, password, hashed, self.rounds)
+
+    async def warm_up(self):
+        """Spin up the executor and load passlib and the bcrypt backend before the first login."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executor, _load_backend, self.rounds) for _ in range(self.max_workers)
+        ))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _submit(self, fn, *args):
+        if self._pending >= self.max_pending:
+            raise HasherSaturated()
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
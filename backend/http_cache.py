@@ -0,0 +1,48 @@
+import hashlib
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request, Response
+
+from catalog_cache import CatalogCache
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so W/"x" matches "x".
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def conditional_get(
+    *caches: CatalogCache,
+    cache_control: str,
+    extra: Optional[Callable[[Request], Awaitable[object]]] = None,
+):
+    """Dependency that answers 304 from the catalog fingerprint alone.
+
+    The ETag combines the fingerprints of `caches` with the request URL, so it
+    is the same in every worker and changes whenever any cached document does.
+    `extra` adds a value the caches leave out, such as live stock, to the ETag.
+    A matching If-None-Match short-circuits before the handler runs; otherwise
+    the ETag and Cache-Control headers are added to the response.
+    """
+    async def dependency(request: Request, response: Response):
+        fingerprints = []
+        for cache in caches:
+            await cache.ensure_fresh()
+            if cache.fingerprint is None:
+                return
+            fingerprints.append(cache.fingerprint)
+
+        key = f"{request.url.path}?{request.url.query}"
+        if extra is not None:
+            key += f"#{await extra(request)}"
+        digest = hashlib.blake2b(key.encode(), digest_size=6).hexdigest()
+        etag = f'"{"-".join(fingerprints)}-{digest}"'
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+        if _matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    return dependency
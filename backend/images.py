@@ -0,0 +1,249 @@
+import asyncio
+import hashlib
+import importlib.util
+import io
+import logging
+import os
+import re
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ttl_cache import TTLCache
+
+# Pillow is optional; without it only variants already on disk are served.
+# It is imported by the render workers only, keeping it out of the app's import time.
+PILLOW_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (320, 640, 960, 1280)
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+EXTENSIONS = {"webp": ".webp", "jpeg": ".jpg"}
+KEY_PATTERN = re.compile(r"[0-9a-f]{32}")
+# Serving a variant refreshes its mtime, the eviction order, at most this often
+TOUCH_INTERVAL = 3600.0
+# Eviction frees space down to this fraction of max_bytes
+EVICT_TARGET = 0.9
+
+
+def parse_widths(value: str) -> Tuple[int, ...]:
+    return tuple(sorted({int(width) for width in value.split(",") if width.strip()}))
+
+
+def content_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def choose_format(accept: Optional[str]) -> str:
+    return "webp" if "image/webp" in (accept or "") else "jpeg"
+
+
+def srcset(base_url: str, key: str, widths: Iterable[Tuple[int, int]]) -> str:
+    """srcset value for (url width, actual width) pairs as returned by ImageStore.render."""
+    return ", ".join(f"{base_url}/{key}/{width} {actual}w" for width, actual in widths)
+
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _render(original: Path, directory: Path, widths: Sequence[int], quality: int) -> List[Tuple[int, int, int]]:
+    """Write WebP and JPEG variants of `original`; returns (url width, actual width, bytes written).
+
+    Widths at or above the original's size collapse into one variant at the
+    original size, served under the smallest such standard width, so images
+    are never upscaled and URLs only ever use configured widths.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(original) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            flattened = Image.new("RGB", image.size, (255, 255, 255))
+            flattened.paste(image, mask=image.getchannel("A"))
+            image = flattened
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+    written = []
+    for width in widths:
+        actual = min(width, image.width)
+        height = max(1, round(image.height * actual / image.width))
+        resized = image if actual == image.width else image.resize((actual, height), Image.LANCZOS)
+        size = 0
+        for fmt, ext in EXTENSIONS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, "WEBP" if fmt == "webp" else "JPEG", quality=quality, optimize=True, progressive=fmt == "jpeg")
+            _write_atomic(directory / f"{width}{ext}", buffer.getvalue())
+            size += buffer.tell()
+        written.append((width, actual, size))
+        if actual == image.width:
+            break
+    return written
+
+
+class ImageStore:
+    """Content-addressed originals and their resized variants on local disk.
+
+    Originals are stored once under `originals/` by the hash of their bytes
+    and never evicted. Variants live under `variants/.../<key>/<width>.<ext>`;
+    once they exceed `max_bytes` the least recently served are deleted and
+    rendered again from the original on their next request. Rendering runs
+    on a process pool so resizing never blocks the event loop.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        widths: Sequence[int] = DEFAULT_WIDTHS,
+        quality: int = 80,
+        max_bytes: int = 1 << 30,
+        max_workers: int = 2,
+    ):
+        self.root = Path(root)
+        self.widths = tuple(sorted(widths))
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self._executor: Optional[Executor] = None
+        self._rendering: Dict[str, asyncio.Future] = {}
+        # Largest width each recently rendered original has, so larger requests skip rendering
+        self._largest: TTLCache[int] = TTLCache(max_size=10000, ttl_seconds=3600)
+        self._variant_bytes: Optional[int] = None
+        self._evicting: Optional[asyncio.Task] = None
+
+    @property
+    def can_render(self) -> bool:
+        return PILLOW_AVAILABLE
+
+    def original_path(self, key: str) -> Path:
+        return self.root / "originals" / key[:2] / key
+
+    def variant_dir(self, key: str) -> Path:
+        return self.root / "variants" / key[:2] / key
+
+    def variant_path(self, key: str, width: int, fmt: str) -> Path:
+        return self.variant_dir(key) / f"{width}{EXTENSIONS[fmt]}"
+
+    def ingest(self, data: bytes) -> str:
+        """Store an original image and return its key; storing the same bytes twice is a no-op."""
+        key = content_key(data)
+        path = self.original_path(key)
+        if not path.exists():
+            _write_atomic(path, data)
+        return key
+
+    async def render(self, key: str, widths: Optional[Sequence[int]] = None) -> List[Tuple[int, int]]:
+        """Render every standard width of an original; returns (url width, actual width) pairs."""
+        if not self.can_render:
+            raise RuntimeError("Pillow is required to render image variants")
+        written = await asyncio.get_running_loop().run_in_executor(
+            self._pool(), _render, self.original_path(key), self.variant_dir(key), widths or self.widths, self.quality,
+        )
+        self._largest.set(key, written[-1][0])
+        await self._account(sum(size for _, _, size in written))
+        return [(width, actual) for width, actual, _ in written]
+
+    async def variant(self, key: str, width: int, fmt: str) -> Optional[Path]:
+        """Path of a variant, rendering it again if it was evicted; None if it cannot exist."""
+        if not KEY_PATTERN.fullmatch(key) or width not in self.widths or fmt not in FORMATS:
+            return None
+        path = self.variant_path(key, width, fmt)
+        try:
+            modified = path.stat().st_mtime
+        except FileNotFoundError:
+            return await self._rerender(key, width, path)
+        if time.time() - modified > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return path
+
+    async def _rerender(self, key: str, width: int, path: Path) -> Optional[Path]:
+        largest = self._largest.get(key)
+        if largest is not None and width > largest:
+            return None
+        if not self.can_render or not self.original_path(key).exists():
+            self._largest.set(key, 0)
+            return None
+        # Concurrent requests for an evicted image share one render
+        pending = self._rendering.get(key)
+        if pending is None:
+            pending = self._rendering[key] = asyncio.ensure_future(self.render(key))
+            pending.add_done_callback(lambda _: self._rendering.pop(key, None))
+        try:
+            await asyncio.shield(pending)
+        except Exception:
+            logger.exception("Could not render image %s", key)
+            self._largest.set(key, 0)
+            return None
+        return path if path.exists() else None
+
+    async def _account(self, written: int):
+        if self._variant_bytes is None:
+            self._variant_bytes = await asyncio.to_thread(self.variant_bytes)
+        else:
+            self._variant_bytes += written
+        if self._variant_bytes > self.max_bytes and self._evicting is None:
+            self._evicting = asyncio.create_task(self._evict())
+
+    async def _evict(self):
+        try:
+            freed = await asyncio.to_thread(self.evict)
+            logger.info("Evicted %d bytes of image variants", freed)
+        except OSError:
+            logger.exception("Image variant eviction failed")
+        finally:
+            self._variant_bytes = None
+            self._evicting = None
+
+    def _variant_files(self) -> List[Tuple[float, int, Path]]:
+        files = []
+        for path in (self.root / "variants").glob("*/*/*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def variant_bytes(self) -> int:
+        return sum(size for _, size, _ in self._variant_files())
+
+    def evict(self) -> int:
+        """Delete least recently served variants until under the size bound; returns bytes freed."""
+        files = sorted(self._variant_files())
+        excess = sum(size for _, size, _ in files) - int(self.max_bytes * EVICT_TARGET)
+        freed = 0
+        for _, size, path in files:
+            if freed >= excess:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            freed += size
+            try:
+                path.parent.rmdir()
+            except OSError:
+                pass
+        return freed
+
+    def _pool(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def close(self):
+        if self._evicting is not None:
+            self._evicting.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
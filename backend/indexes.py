@@ -0,0 +1,108 @@
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Every index the API relies on, by collection. Keep in sync with the queries
+# in server.py; `manage_indexes.py report` flags drift in either direction.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "products": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("category", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="category_created_at"),
+    ],
+    "carts": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "orders": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_id_created_at"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+    ],
+    "models": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("name", ASCENDING), ("id", ASCENDING)], name="name_id"),
+    ],
+    "bookings": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_id_created_at"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+    ],
+    # One document per booked hour; the _id (model|date|hour) rejects overlaps
+    "booking_slots": [
+        IndexModel([("model_id", ASCENDING), ("date", ASCENDING)], name="model_id_date"),
+        IndexModel([("booking_id", ASCENDING)], name="booking_id"),
+    ],
+    # Daily sales rollups; the _id (dimension|day|key) makes updates upserts
+    "sales_daily": [
+        IndexModel([("dimension", ASCENDING), ("day", ASCENDING)], name="dimension_day"),
+        IndexModel([("dimension", ASCENDING), ("key", ASCENDING), ("day", ASCENDING)], name="dimension_key_day"),
+    ],
+    # Shared rate limit buckets, dropped once they would be full again
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "partnerships": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+}
+
+
+def _key(spec) -> tuple:
+    return tuple((field, direction) for field, direction in spec.items())
+
+
+async def ensure_indexes(db, registry: Dict[str, List[IndexModel]] = INDEXES) -> List[str]:
+    """Create any declared index that is missing. Safe to run on every startup.
+
+    Returns the names of indexes that could not be built (e.g. a unique index
+    over existing duplicates) so the caller can report them.
+    """
+    failed = []
+    for collection, models in registry.items():
+        for model in models:
+            try:
+                await db[collection].create_indexes([model])
+            except OperationFailure as exc:
+                name = f"{collection}.{model.document['name']}"
+                logger.error("Could not create index %s: %s", name, exc)
+                failed.append(name)
+    return failed
+
+
+async def index_report(db, registry: Dict[str, List[IndexModel]] = INDEXES) -> dict:
+    """Compare live indexes with the registry.
+
+    `missing` are declared but absent, `undeclared` exist but are not in the
+    registry and `unused` have served no operations since the server started.
+    """
+    report = {"missing": [], "undeclared": [], "unused": []}
+    existing_collections = set(await db.list_collection_names())
+    for collection in sorted(set(registry) | existing_collections):
+        declared = {_key(model.document["key"]): model.document["name"] for model in registry.get(collection, [])}
+        live = {}
+        if collection in existing_collections:
+            async for index in db[collection].list_indexes():
+                live[_key(index["key"])] = index["name"]
+
+        for key, name in declared.items():
+            if key not in live:
+                report["missing"].append(f"{collection}.{name}")
+        for key, name in live.items():
+            if name != "_id_" and key not in declared:
+                report["undeclared"].append(f"{collection}.{name}")
+
+        if collection in existing_collections:
+            try:
+                async for stats in db[collection].aggregate([{"$indexStats": {}}]):
+                    if stats["name"] != "_id_" and stats["accesses"]["ops"] == 0:
+                        report["unused"].append(f"{collection}.{stats['name']}")
+            except OperationFailure as exc:
+                logger.warning("$indexStats unavailable for %s: %s", collection, exc)
+    return report
@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse
+
+from images import DEFAULT_WIDTHS, ImageStore, parse_widths, srcset
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+db = client[os.environ['DB_NAME']]
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+def find_source(source: Path, url: str, *names: str) -> Optional[Path]:
+    """Local file for an image: the URL's file name, or it or one of `names` plus an image extension."""
+    names = (Path(urlparse(url).path).name, *names)
+    candidates = [source / names[0]] + [source / f"{name}{ext}" for name in names if name for ext in IMAGE_EXTENSIONS]
+    return next((path for path in candidates if path.is_file()), None)
+
+async def main():
+    """Generate responsive variants for product and portfolio images found in a local folder.
+
+    Files are matched by the file name in image_url / portfolio_images, or
+    named after the product id (`<id>.jpg`) or model id and portfolio
+    position (`<id>-0.jpg`). Matched documents get the srcset the API returns.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--source", type=Path, default=Path(os.environ.get('IMAGE_SOURCE_DIR', ROOT_DIR / 'image_sources')),
+                        help="pasta com as imagens originais")
+    parser.add_argument("--base-url", default=os.environ.get('IMAGE_BASE_URL', '/api/images'),
+                        help="prefixo das URLs no srcset")
+    args = parser.parse_args()
+
+    store = ImageStore(
+        Path(os.environ.get('IMAGE_STORE_DIR', ROOT_DIR / 'images')),
+        widths=parse_widths(os.environ.get('IMAGE_WIDTHS', '')) or DEFAULT_WIDTHS,
+        quality=int(os.environ.get('IMAGE_QUALITY', '80')),
+        max_bytes=int(os.environ.get('IMAGE_CACHE_MAX_MB', '1024')) * 1024 * 1024,
+        max_workers=int(os.environ.get('IMAGE_WORKERS', str(os.cpu_count() or 2))),
+    )
+    if not store.can_render:
+        raise SystemExit("❌ A geração de variantes requer o pacote Pillow (pip install pillow)")
+
+    async def variants(path: Optional[Path]) -> str:
+        if path is None:
+            return ""
+        key = store.ingest(path.read_bytes())
+        return srcset(args.base_url, key, await store.render(key))
+
+    async def ingest_product(product):
+        value = await variants(find_source(args.source, product["image_url"], product["id"]))
+        if value:
+            await db.products.update_one({"id": product["id"]}, {"$set": {"image_srcset": value}})
+        return bool(value)
+
+    async def ingest_model(model):
+        values = [
+            await variants(find_source(args.source, url, f"{model['id']}-{index}"))
+            for index, url in enumerate(model.get("portfolio_images", []))
+        ]
+        if any(values):
+            await db.models.update_one({"id": model["id"]}, {"$set": {"portfolio_srcsets": values}})
+        return sum(map(bool, values))
+
+    print(f"🖼️  Gerando variantes a partir de {args.source}...")
+    try:
+        products = await db.products.find({}, {"_id": 0, "id": 1, "image_url": 1}).to_list(None)
+        models = await db.models.find({}, {"_id": 0, "id": 1, "portfolio_images": 1}).to_list(None)
+        product_count = sum(await asyncio.gather(*(ingest_product(product) for product in products)))
+        portfolio_count = sum(await asyncio.gather(*(ingest_model(model) for model in models)))
+        freed = store.evict()
+    finally:
+        store.close()
+    print(f"✅ {product_count}/{len(products)} produtos e {portfolio_count} imagens de portfólio processados")
+    if freed:
+        print(f"🧹 {freed // 1024} KB de variantes antigas removidos")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+import logging
+from typing import Dict
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Returned by standalone servers, which cannot run multi-document transactions
+ILLEGAL_OPERATION = 20
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id: str):
+        super().__init__(product_id)
+        self.product_id = product_id
+
+
+async def _reserve(db, quantities: Dict[str, int], session=None):
+    # Concurrent checkouts touch shared SKUs in the same order, which keeps
+    # write-conflict retries short.
+    for product_id, quantity in sorted(quantities.items()):
+        result = await db.products.update_one(
+            {"id": product_id, "stock": {"$gte": quantity}},
+            {"$inc": {"stock": -quantity}},
+            session=session,
+        )
+        if result.modified_count == 0:
+            raise InsufficientStock(product_id)
+
+
+async def place_order(client, db, order_doc: dict, quantities: Dict[str, int]):
+    """Reserve stock, insert the order and clear the buyer's cart atomically.
+
+    Every stock decrement is conditional on enough stock being left, so
+    overselling fails fast with InsufficientStock and the transaction rolls
+    back. Write conflicts between concurrent checkouts are retried by
+    `with_transaction`.
+    """
+    async def transaction(session):
+        await _reserve(db, quantities, session=session)
+        await db.orders.insert_one(order_doc, session=session)
+        await db.carts.delete_one({"user_id": order_doc["user_id"]}, session=session)
+
+    async with await client.start_session() as session:
+        try:
+            await session.with_transaction(transaction)
+            return
+        except OperationFailure as exc:
+            if exc.code != ILLEGAL_OPERATION:
+                raise
+            logger.warning("Transactions unsupported by this deployment, using compensating updates")
+
+    await _place_order_without_transaction(db, order_doc, quantities)
+
+
+async def _place_order_without_transaction(db, order_doc: dict, quantities: Dict[str, int]):
+    reserved: Dict[str, int] = {}
+    try:
+        for product_id, quantity in sorted(quantities.items()):
+            await _reserve(db, {product_id: quantity})
+            reserved[product_id] = quantity
+        await db.orders.insert_one(order_doc)
+    except BaseException:
+        for product_id, quantity in reserved.items():
+            await db.products.update_one({"id": product_id}, {"$inc": {"stock": quantity}})
+        raise
+    await db.carts.delete_one({"user_id": order_doc["user_id"]})
@@ -0,0 +1,393 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+from pymongo.errors import OperationFailure
+
+# Checkout must never reach the real PayPal API from a load test
+os.environ.setdefault("PAYPAL_BACKEND", "fake")
+# Every simulated shopper shares one client address
+os.environ.setdefault("RATE_LIMITS_ENABLED", "false")
+
+import seed_data
+import server
+
+ROOT_DIR = Path(__file__).parent
+
+# One INFO line per request would drown the report
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Relative weight of each scenario in the traffic mix
+DEFAULT_MIX = {
+    "browse": 55,
+    "search": 15,
+    "cart": 12,
+    "checkout": 5,
+    "booking": 5,
+    "account": 8,
+}
+
+# --backend mongo drops its database at the end, so only names with this suffix are accepted
+SCRATCH_DB_SUFFIX = "_loadtest"
+
+# Any other status counts as an error in the report
+EXPECTED_STATUSES = {200, 304}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Latency samples and status counts grouped by route template."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def add(self, route: str, elapsed_ms: float, status: str, ok: bool):
+        self.samples[route].append(elapsed_ms)
+        self.statuses[route][status] += 1
+        if not ok:
+            self.errors[route] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        routes = {}
+        everything: List[float] = []
+        for route in sorted(self.samples):
+            timings = sorted(self.samples[route])
+            everything.extend(timings)
+            routes[route] = self._stats(timings, self.errors[route], elapsed)
+            routes[route]["statuses"] = dict(self.statuses[route])
+        everything.sort()
+        return {"routes": routes, "total": self._stats(everything, sum(self.errors.values()), elapsed)}
+
+    @staticmethod
+    def _stats(timings: List[float], errors: int, elapsed: float) -> dict:
+        return {
+            "requests": len(timings),
+            "errors": errors,
+            "rps": round(len(timings) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(timings) / len(timings), 3) if timings else 0.0,
+            "p50_ms": round(percentile(timings, 0.50), 3),
+            "p95_ms": round(percentile(timings, 0.95), 3),
+            "p99_ms": round(percentile(timings, 0.99), 3),
+            "max_ms": round(timings[-1], 3) if timings else 0.0,
+        }
+
+
+class Shopper:
+    """One virtual user: registers once, then runs scenarios until the deadline."""
+
+    def __init__(self, http: httpx.AsyncClient, recorder: Recorder, catalog: dict, rng: random.Random, think_time: float):
+        self.http = http
+        self.recorder = recorder
+        self.catalog = catalog
+        self.rng = rng
+        self.think_time = think_time
+        self.email = f"loadtest-{uuid.uuid4().hex[:12]}@example.com"
+        self.password = uuid.uuid4().hex
+        self.headers: Dict[str, str] = {}
+        self.etags: Dict[str, str] = {}
+
+    async def call(self, method: str, route: str, path: str, expected=EXPECTED_STATUSES, **kwargs) -> Optional[httpx.Response]:
+        # Browsers revalidate catalog pages they have seen, so we do too
+        headers = dict(self.headers)
+        if method == "GET" and path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+        started = time.perf_counter()
+        try:
+            response = await self.http.request(method, path, headers=headers, **kwargs)
+        except Exception as exc:
+            self.recorder.add(f"{method} {route}", (time.perf_counter() - started) * 1000, type(exc).__name__, False)
+            return None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.recorder.add(f"{method} {route}", elapsed_ms, str(response.status_code), response.status_code in expected)
+        if method == "GET" and "etag" in response.headers:
+            self.etags[path] = response.headers["etag"]
+        return response
+
+    async def register(self):
+        response = await self.call("POST", "/api/auth/register", "/api/auth/register", json={
+            "email": self.email, "name": "Cliente Carga", "password": self.password,
+        })
+        if response is not None and response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def run(self, mix: Dict[str, int], deadline: float):
+        await self.register()
+        scenarios = list(mix)
+        weights = [mix[name] for name in scenarios]
+        while time.monotonic() < deadline:
+            scenario = self.rng.choices(scenarios, weights)[0]
+            await getattr(self, scenario)()
+            if self.think_time:
+                await asyncio.sleep(self.rng.uniform(0, 2 * self.think_time))
+
+    # Scenarios
+    def _product(self) -> dict:
+        return self.rng.choice(self.catalog["products"])
+
+    async def browse(self):
+        category = self.rng.choice(self.catalog["categories"])
+        await self.call("GET", "/api/products", "/api/products")
+        await self.call("GET", "/api/products", f"/api/products?category={category}&sort=-price&limit=24")
+        await self.call("GET", "/api/products/{product_id}", f"/api/products/{self._product()['id']}")
+
+    async def search(self):
+        term = self.rng.choice(self.catalog["terms"])
+        await self.call("GET", "/api/products/search", f"/api/products/search?q={term}&limit=24")
+
+    async def _add_to_cart(self, product: dict, quantity: int):
+        return await self.call("POST", "/api/cart", "/api/cart", json={
+            "product_id": product["id"],
+            "quantity": quantity,
+            "size": product["sizes"][0],
+            "color": product["colors"][0],
+            "product_name": product["name"],
+            "product_price": product["price"],
+            "product_image": product["image_url"],
+        })
+
+    async def cart(self):
+        product = self._product()
+        await self.call("GET", "/api/cart", "/api/cart")
+        await self._add_to_cart(product, 1)
+        await self.call(
+            "PUT", "/api/cart/{product_id}", f"/api/cart/{product['id']}",
+            params={"size": product["sizes"][0], "color": product["colors"][0]},
+            json={"quantity": self.rng.randint(1, 3)},
+        )
+
+    async def checkout(self):
+        product = self._product()
+        response = await self._add_to_cart(product, 1)
+        if response is None or response.status_code != 200:
+            return
+        await self.call("POST", "/api/orders", "/api/orders", json={
+            "address": "Rua Augusta, 100 - São Paulo, SP",
+            "items": response.json()["items"],
+        })
+        await self.call("GET", "/api/orders", "/api/orders?limit=20")
+
+    async def booking(self):
+        model = self.rng.choice(self.catalog["models"])
+        await self.call("GET", "/api/models", "/api/models")
+        await self.call("GET", "/api/models/{model_id}", f"/api/models/{model['id']}")
+        start = date.today() + timedelta(days=self.rng.randint(1, 60))
+        duration = self.rng.randint(1, 4)
+        response = await self.call(
+            "GET", "/api/models/{model_id}/slots", f"/api/models/{model['id']}/slots",
+            params={"from": start.isoformat(), "to": (start + timedelta(days=6)).isoformat(), "duration": duration},
+        )
+        if response is None or response.status_code != 200:
+            return
+        free = [(day["date"], slot) for day in response.json() for slot in day["slots"]]
+        if not free:
+            return
+        day, time_ = self.rng.choice(free)
+        # Another shopper may take the slot first; a 409 is the expected outcome then
+        await self.call("POST", "/api/bookings", "/api/bookings", expected={200, 409}, json={
+            "model_id": model["id"],
+            "date": day,
+            "time": time_,
+            "duration": duration,
+            "message": "Ensaio para campanha de verão",
+            "budget": 1500.0,
+        })
+
+    async def account(self):
+        await self.call("POST", "/api/auth/login", "/api/auth/login", json={"email": self.email, "password": self.password})
+        await self.call("GET", "/api/auth/me", "/api/auth/me")
+        await self.call("GET", "/api/bookings", "/api/bookings?limit=20")
+
+
+# Backends
+async def _standalone_session():
+    return _StandaloneSession()
+
+
+class _StandaloneSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def with_transaction(self, callback):
+        raise OperationFailure("Transaction numbers are only allowed on a replica set member or mongos", 20)
+
+
+def _change_streams_unsupported(self, *args, **kwargs):
+    raise OperationFailure("The $changeStream stage is only supported on replica sets", 40573)
+
+
+def mock_client():
+    """In-process motor stand-in that behaves like a standalone mongod."""
+    try:
+        from mongomock_motor import AsyncMongoMockClient, AsyncMongoMockCollection
+    except ImportError:
+        raise SystemExit("❌ --backend mock requer o pacote mongomock-motor (pip install mongomock-motor)")
+    AsyncMongoMockCollection.watch = _change_streams_unsupported
+    client = AsyncMongoMockClient(tz_aware=True)
+    client.start_session = _standalone_session
+    return client
+
+
+def use_database(client, db):
+    server.bind_database(client, db)
+    # Never overwrite the real snapshot with load-test orders
+    server.recommendations.snapshot_path = None
+    seed_data.db = db
+
+
+async def seed(db):
+    print("🌱 Populando catálogo de teste...")
+    await seed_data.seed_products()
+    await seed_data.seed_models()
+    # Checkouts must measure the write path, not run out of stock
+    await db.products.update_many({}, {"$set": {"stock": 1_000_000}})
+
+
+async def load_catalog(http: httpx.AsyncClient) -> dict:
+    products = (await http.get("/api/products", params={"limit": 500})).json()
+    models = (await http.get("/api/models", params={"limit": 500})).json()
+    terms = sorted({word.lower() for product in products for word in product["name"].split() if len(word) > 3})
+    return {
+        "products": products,
+        "models": models,
+        "categories": sorted({product["category"] for product in products}),
+        "terms": terms or [""],
+    }
+
+
+# Reporting
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict):
+    print(f"{'rota':<34} {'req':>7} {'err':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]
+    for route, stats in rows:
+        print(
+            f"{route:<34} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>8.1f} "
+            f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}"
+        )
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Routes whose p95 grew by more than `tolerance` relative to `baseline`."""
+    regressions = []
+    for route, stats in report["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if not previous or not previous["p95_ms"]:
+            continue
+        change = stats["p95_ms"] / previous["p95_ms"] - 1
+        if change > tolerance:
+            regressions.append(f"{route}: p95 {previous['p95_ms']:.2f} → {stats['p95_ms']:.2f} ms (+{change:.0%})")
+    return regressions
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"cenário desconhecido: {name}")
+        mix[name] = int(weight)
+    return mix
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da API com cenários de compra e agendamento")
+    parser.add_argument("--backend", choices=["mock", "mongo"], default="mock",
+                        help="mock usa mongomock-motor em processo; mongo usa MONGO_URL")
+    parser.add_argument("--db-name", default=f"{os.environ['DB_NAME']}{SCRATCH_DB_SUFFIX}",
+                        help=f"banco usado com --backend mongo; precisa terminar em {SCRATCH_DB_SUFFIX} (é apagado ao final)")
+    parser.add_argument("--users", type=int, default=20, help="usuários virtuais simultâneos")
+    parser.add_argument("--duration", type=float, default=30.0, help="segundos de carga")
+    parser.add_argument("--think-time", type=float, default=0.0, help="pausa média entre cenários, em segundos")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="ex.: browse=60,search=20,checkout=20")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, default=ROOT_DIR / "load_test_results.json")
+    parser.add_argument("--baseline", type=Path, help="resultado anterior para detectar regressões de p95")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="aumento de p95 tolerado (0.25 = 25%%)")
+    args = parser.parse_args()
+    # The database is seeded and then dropped, so never let it be a real one
+    if args.backend == "mongo" and (not args.db_name.endswith(SCRATCH_DB_SUFFIX) or args.db_name == os.environ['DB_NAME']):
+        parser.error(f"--db-name deve terminar em {SCRATCH_DB_SUFFIX}, pois o banco é apagado ao final")
+
+    if args.backend == "mock":
+        client = mock_client()
+    else:
+        client = server.create_mongo_client()
+    db = client[args.db_name]
+    use_database(client, db)
+    await seed(db)
+
+    recorder = Recorder()
+    app = server.create_app(mongo_client=client, db_name=args.db_name)
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as http:
+            catalog = await load_catalog(http)
+            shoppers = [
+                Shopper(http, recorder, catalog, random.Random(args.seed + i), args.think_time)
+                for i in range(args.users)
+            ]
+            print(f"🚀 {args.users} usuários por {args.duration:.0f}s ({args.backend})")
+            started = time.monotonic()
+            await asyncio.gather(*(shopper.run(args.mix, started + args.duration) for shopper in shoppers))
+            elapsed = time.monotonic() - started
+        if args.backend == "mongo":
+            await client.drop_database(args.db_name)
+            client.close()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "backend": args.backend,
+            "users": args.users,
+            "duration_s": round(elapsed, 3),
+            "think_time_s": args.think_time,
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        **recorder.summary(elapsed),
+    }
+    print_report(report)
+    args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"💾 Resultados salvos em {args.output}")
+
+    if args.baseline:
+        regressions = compare(report, json.loads(args.baseline.read_text()), args.tolerance)
+        for line in regressions:
+            print(f"⚠️  {line}")
+        if regressions:
+            raise SystemExit(1)
+    print("✅ Teste de carga concluído!")
+
+if __name__ == "__main__":
+    asyncio.run(main())
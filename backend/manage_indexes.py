@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+
+from indexes import ensure_indexes, index_report
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url)
+db = client[os.environ['DB_NAME']]
+
+async def report():
+    result = await index_report(db)
+    labels = {
+        "missing": "❌ Índices ausentes",
+        "undeclared": "⚠️  Índices não declarados",
+        "unused": "💤 Índices sem uso desde o último restart",
+    }
+    for section, label in labels.items():
+        print(f"{label}: {len(result[section])}")
+        for name in result[section]:
+            print(f"   - {name}")
+    return 1 if result["missing"] else 0
+
+async def ensure():
+    print("🔧 Criando índices declarados...")
+    failed = await ensure_indexes(db)
+    for name in failed:
+        print(f"❌ Falha ao criar {name}")
+    if not failed:
+        print("✅ Índices em dia!")
+    return 1 if failed else 0
+
+async def main():
+    parser = argparse.ArgumentParser(description="Relatório e criação dos índices do MongoDB")
+    parser.add_argument("command", choices=["report", "ensure"], nargs="?", default="report")
+    args = parser.parse_args()
+    try:
+        return await (report() if args.command == "report" else ensure())
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
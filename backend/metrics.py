@@ -0,0 +1,270 @@
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: non-cumulative bucket counts (+Inf last) and the sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = [(labels, list(counts), total[0]) for labels, (counts, total) in self._series.items()]
+        lines = []
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served.")
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status"),
+)
+REQUEST_PHASE_DURATION = Histogram(
+    "http_request_phase_seconds",
+    "Time each request spent per phase; 'other' is handler, validation and serialization time.",
+    ("method", "route", "phase"),
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds",
+    "Mongo command latency by the route that issued it ('background' outside requests).",
+    ("route", "collection", "command"),
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongo_command_failures_total", "Mongo commands that returned an error.", ("collection", "command"),
+)
+APP_STARTUP_SECONDS = Gauge(
+    "app_startup_seconds", "Worker cold-start time by phase ('startup' is the whole lifespan warm-up).", ("phase",),
+)
+
+UNMATCHED_ROUTE = "unmatched"
+BACKGROUND_ROUTE = "background"
+MAX_TRACED_COMMANDS = 50
+
+
+class RequestTrace:
+    """Per-request accumulator shared with executor threads through a ContextVar."""
+
+    def __init__(self, scope, keep_commands: bool):
+        self.scope = scope
+        self.phases: Dict[str, float] = {}
+        self.commands: Optional[List[Tuple[str, str, float]]] = [] if keep_commands else None
+
+    @property
+    def route(self) -> str:
+        # The router stores the matched route in the scope; its template keeps label cardinality bounded.
+        return getattr(self.scope.get("route"), "path_format", UNMATCHED_ROUTE)
+
+    def add_phase(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_command(self, collection: str, command: str, seconds: float):
+        self.add_phase("mongo", seconds)
+        if self.commands is not None and len(self.commands) < MAX_TRACED_COMMANDS:
+            self.commands.append((collection, command, seconds))
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+@contextmanager
+def track(phase: str):
+    """Attribute the wrapped block's wall time to `phase` of the current request."""
+    trace = _current_trace.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if trace is not None:
+            trace.add_phase(phase, time.perf_counter() - started)
+
+
+def _collection_of(event) -> str:
+    if event.command_name == "getMore":
+        target = event.command.get("collection")
+    else:
+        target = event.command.get(event.command_name)
+    return target if isinstance(target, str) else ""
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """pymongo command listener that attributes each command to its request.
+
+    Motor runs pymongo on executor threads but copies the caller's context
+    into them, so the request's trace is visible from `started`.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[object, int], Tuple[Optional[RequestTrace], str]] = {}
+
+    def started(self, event):
+        self._pending[(event.connection_id, event.request_id)] = (_current_trace.get(), _collection_of(event))
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        _, collection = self._finish(event)
+        MONGO_COMMAND_FAILURES.inc(collection, event.command_name)
+
+    def _finish(self, event):
+        trace, collection = self._pending.pop((event.connection_id, event.request_id), (None, ""))
+        seconds = event.duration_micros / 1_000_000
+        MONGO_COMMAND_DURATION.observe(seconds, trace.route if trace else BACKGROUND_ROUTE, collection, event.command_name)
+        if trace is not None:
+            trace.add_command(collection, event.command_name, seconds)
+        return trace, collection
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, in-flight requests and phase breakdowns.
+
+    Requests slower than `slow_request_ms` are logged with their Mongo
+    commands for a `slow_sample_rate` fraction of occurrences.
+    """
+
+    def __init__(self, app, slow_request_ms: float = 0.0, slow_sample_rate: float = 1.0):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+        self.slow_sample_rate = slow_sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(scope, keep_commands=self.slow_request_ms > 0)
+        token = _current_trace.set(trace)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec()
+            _current_trace.reset(token)
+            self._record(scope, trace, status_code, elapsed)
+
+    def _record(self, scope, trace: RequestTrace, status_code: int, elapsed: float):
+        method = scope["method"]
+        route = trace.route
+        REQUEST_DURATION.observe(elapsed, method, route, str(status_code))
+        for phase, seconds in trace.phases.items():
+            REQUEST_PHASE_DURATION.observe(seconds, method, route, phase)
+        REQUEST_PHASE_DURATION.observe(max(0.0, elapsed - sum(trace.phases.values())), method, route, "other")
+
+        if self.slow_request_ms and elapsed * 1000 >= self.slow_request_ms and random.random() < self.slow_sample_rate:
+            phases = ", ".join(f"{phase}={seconds * 1000:.1f}ms" for phase, seconds in sorted(trace.phases.items()))
+            commands = "; ".join(
+                f"{collection}.{command} {seconds * 1000:.1f}ms" for collection, command, seconds in trace.commands or []
+            )
+            logger.warning(
+                "Slow request %s %s -> %s in %.1fms [%s] mongo: %s",
+                method, route, status_code, elapsed * 1000, phases or "no phases", commands or "none",
+            )
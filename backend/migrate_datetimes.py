@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+db = client[os.environ['DB_NAME']]
+
+# Timestamp fields that older releases stored as ISO strings
+DATETIME_FIELDS = {
+    "users": ["created_at"],
+    "products": ["created_at"],
+    "carts": ["updated_at"],
+    "orders": ["created_at"],
+    "bookings": ["created_at"],
+    "partnerships": ["timestamp"],
+}
+
+MIGRATION_ID = "datetimes_to_bson"
+
+def parse_iso(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+async def load_checkpoint(collection: str):
+    state = await db.migrations.find_one({"_id": MIGRATION_ID}) or {}
+    return state.get("checkpoints", {}).get(collection)
+
+async def save_checkpoint(collection: str, last_id):
+    await db.migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {f"checkpoints.{collection}": last_id, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+async def migrate_collection(collection: str, fields, batch_size: int, pause: float):
+    """Convert string timestamps in `_id` order, one checkpointed batch at a time.
+
+    Each update is conditional on the old string value, so documents rewritten
+    by the application meanwhile are left alone and the job can run online.
+    """
+    string_filter = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    last_id = await load_checkpoint(collection)
+    converted = 0
+    while True:
+        query = {"$and": [string_filter, {"_id": {"$gt": last_id}}]} if last_id is not None else string_filter
+        projection = {field: 1 for field in fields}
+        batch = await db[collection].find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        updates = []
+        for doc in batch:
+            for field in fields:
+                value = doc.get(field)
+                if not isinstance(value, str):
+                    continue
+                try:
+                    parsed = parse_iso(value)
+                except ValueError:
+                    print(f"⚠️  {collection} {doc['_id']}: {field} inválido ({value!r})")
+                    continue
+                updates.append(UpdateOne({"_id": doc["_id"], field: value}, {"$set": {field: parsed}}))
+        if updates:
+            result = await db[collection].bulk_write(updates, ordered=False)
+            converted += result.modified_count
+
+        last_id = batch[-1]["_id"]
+        await save_checkpoint(collection, last_id)
+        print(f"   {collection}: {converted} campos convertidos", end="\r")
+        if pause:
+            await asyncio.sleep(pause)
+    print(f"✅ {collection}: {converted} campos convertidos")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Converte datas ISO em string para datas BSON nativas")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.0, help="segundos de espera entre lotes")
+    parser.add_argument("--restart", action="store_true", help="ignora checkpoints salvos")
+    parser.add_argument("collections", nargs="*", default=list(DATETIME_FIELDS))
+    args = parser.parse_args()
+
+    if args.restart:
+        await db.migrations.delete_one({"_id": MIGRATION_ID})
+    print("🕒 Migrando datas para BSON...")
+    for collection in args.collections:
+        await migrate_collection(collection, DATETIME_FIELDS[collection], args.batch_size, args.pause)
+    print("✅ Migração completa!")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,149 @@
+import base64
+import bisect
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# Types a cursor value may have per sort field; null is always allowed since
+# documents may lack the field. Anything else would make comparisons fail.
+CURSOR_VALUE_TYPES = {
+    "price": (int, float),
+    "created_at": (datetime,),
+    "name": (str,),
+    "id": (str,),
+}
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def _check_type(field: str, value: Any):
+    expected = CURSOR_VALUE_TYPES.get(field)
+    if value is None or expected is None:
+        return
+    if isinstance(value, bool) or not isinstance(value, expected):
+        raise InvalidCursor(f"Cursor value does not match sort field {field}")
+
+
+def encode_cursor(sort: str, value: Any, item_id: str) -> str:
+    """Opaque token for the position just after (value, item_id) in `sort` order."""
+    raw = json.dumps({"s": sort, "k": [_encode_value(value), item_id]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort: str) -> Tuple[Any, str]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        value, item_id = payload["k"]
+        value = _decode_value(value)
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+    if payload.get("s") != sort:
+        raise InvalidCursor("Cursor was issued for a different sort order")
+    if not isinstance(item_id, str):
+        raise InvalidCursor("Malformed cursor")
+    _check_type(parse_sort(sort)[0], value)
+    return value, item_id
+
+
+def parse_sort(sort: str) -> Tuple[str, bool]:
+    """'-price' -> ('price', True); a leading '-' means descending."""
+    return (sort[1:], True) if sort.startswith("-") else (sort, False)
+
+
+# Mongo
+def keyset_filter(field: str, descending: bool, value: Any, item_id: str) -> dict:
+    """Documents strictly after (value, item_id) in (field, id) order.
+
+    Missing/null values sort before everything else, as they do in Mongo.
+    """
+    id_op = "$lt" if descending else "$gt"
+    if field == "id":
+        return {"id": {id_op: item_id}}
+
+    if value is None:
+        if descending:
+            return {field: None, "id": {id_op: item_id}}
+        return {"$or": [{field: None, "id": {id_op: item_id}}, {field: {"$ne": None}}]}
+
+    value_op = "$lt" if descending else "$gt"
+    clauses = [{field: {value_op: value}}, {field: value, "id": {id_op: item_id}}]
+    if descending:
+        clauses.append({field: None})
+    return {"$or": clauses}
+
+
+def mongo_sort(field: str, descending: bool) -> List[Tuple[str, int]]:
+    direction = -1 if descending else 1
+    if field == "id":
+        return [("id", direction)]
+    return [(field, direction), ("id", direction)]
+
+
+async def paginate(collection, query: dict, sort: str, limit: int, cursor: Optional[str], projection: Optional[dict] = None):
+    """Return (documents, next_cursor) for one page of `query` ordered by `sort`."""
+    field, descending = parse_sort(sort)
+    if cursor:
+        value, item_id = decode_cursor(cursor, sort)
+        query = {"$and": [query, keyset_filter(field, descending, value, item_id)]} if query else keyset_filter(field, descending, value, item_id)
+
+    docs = await collection.find(query, projection or {"_id": 0}).sort(mongo_sort(field, descending)).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(sort, last.get(field), last["id"])
+    return docs, next_cursor
+
+
+# In memory
+def sort_key(value: Any, item_id: str) -> tuple:
+    return (value is not None, value if value is not None else 0, item_id)
+
+
+def paginate_sorted(keys: Sequence[tuple], items: Sequence[Any], sort: str, limit: int, cursor: Optional[str]):
+    """Page through `items`, already sorted ascending by the parallel `keys`."""
+    field, descending = parse_sort(sort)
+    position = None
+    if cursor:
+        key = sort_key(*decode_cursor(cursor, sort))
+        try:
+            # A naive $date against aware keys still fails to compare
+            position = (bisect.bisect_left if descending else bisect.bisect_right)(keys, key)
+        except TypeError:
+            raise InvalidCursor(f"Cursor value does not match sort field {field}")
+    if descending:
+        end = len(items) if position is None else position
+        start = max(end - limit, 0)
+        page = list(reversed(items[start:end]))
+        has_more = start > 0
+    else:
+        start = position or 0
+        page = list(items[start:start + limit])
+        has_more = start + limit < len(items)
+
+    next_cursor = None
+    if has_more and page:
+        last = page[-1]
+        next_cursor = encode_cursor(sort, getattr(last, field), last.id)
+    return page, next_cursor
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from typing import Mapping, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+PAYPAL_BASE_URLS = {
+    "sandbox": "https://api-m.sandbox.paypal.com",
+    "live": "https://api-m.paypal.com",
+}
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class PayPalError(Exception):
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def order_body(reference_id: str, amount: float, currency: str = "USD") -> dict:
+    return {
+        "intent": "CAPTURE",
+        "purchase_units": [{
+            "reference_id": reference_id,
+            "amount": {
+                "currency_code": currency,
+                "value": f"{amount:.2f}"
+            }
+        }]
+    }
+
+
+class PayPalClient:
+    """Async PayPal Orders v2 client over a shared keep-alive connection pool.
+
+    Every call sends a PayPal-Request-Id, which makes create and capture
+    idempotent on PayPal's side, so transport errors and 5xx answers are
+    retried with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        mode: str = "sandbox",
+        timeout: float = 10.0,
+        max_connections: int = 20,
+        retries: int = 2,
+        backoff: float = 0.2,
+        refresh_margin: float = 300.0,
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.retries = retries
+        self.backoff = backoff
+        self.refresh_margin = refresh_margin
+        self._http = httpx.AsyncClient(
+            base_url=PAYPAL_BASE_URLS[mode],
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def create_order(self, reference_id: str, amount: float, currency: str = "USD") -> dict:
+        return await self._request("POST", "/v2/checkout/orders", json=order_body(reference_id, amount, currency))
+
+    async def capture_order(self, order_id: str) -> dict:
+        return await self._request("POST", f"/v2/checkout/orders/{order_id}/capture")
+
+    async def aclose(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+        await self._http.aclose()
+
+    # Access token
+    async def _access_token(self) -> str:
+        now = time.monotonic()
+        if self._token and now < self._token_expires_at - self.refresh_margin:
+            return self._token
+        if self._token and now < self._token_expires_at:
+            # Still valid: serve it and refresh ahead of expiry in the background.
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh_ahead())
+            return self._token
+        return await self._refresh_token()
+
+    async def _refresh_ahead(self):
+        try:
+            await self._refresh_token()
+        except (PayPalError, httpx.HTTPError):
+            logger.warning("PayPal token refresh-ahead failed, retrying on next call", exc_info=True)
+
+    async def _refresh_token(self) -> str:
+        async with self._token_lock:
+            if self._token and time.monotonic() < self._token_expires_at - self.refresh_margin:
+                return self._token
+            response = await self._http.post(
+                "/v1/oauth2/token",
+                data={"grant_type": "client_credentials"},
+                auth=(self.client_id, self.client_secret),
+            )
+            if response.status_code != 200:
+                raise PayPalError(f"PayPal authentication failed: {response.text}", response.status_code)
+            payload = response.json()
+            self._token = payload["access_token"]
+            self._token_expires_at = time.monotonic() + float(payload.get("expires_in", 0))
+            return self._token
+
+    # Requests
+    async def _request(self, method: str, path: str, json: Optional[dict] = None) -> dict:
+        request_id = str(uuid.uuid4())
+        error: PayPalError = PayPalError("PayPal request failed")
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+            try:
+                token = await self._access_token()
+                response = await self._http.request(method, path, json=json, headers={
+                    "Authorization": f"Bearer {token}",
+                    "PayPal-Request-Id": request_id,
+                    "Prefer": "return=representation",
+                })
+            except httpx.TransportError as exc:
+                error = PayPalError(f"PayPal request failed: {exc!r}")
+                continue
+
+            if response.status_code == 401:
+                self._token = None
+                error = PayPalError(response.text, response.status_code)
+                continue
+            if response.status_code in RETRYABLE_STATUS:
+                error = PayPalError(response.text, response.status_code)
+                continue
+            if response.status_code >= 400:
+                raise PayPalError(response.text, response.status_code)
+            return response.json()
+        raise error
+
+
+class FakePayPalClient:
+    """Local stand-in with the PayPalClient interface for offline load tests."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._orders = {}
+
+    async def create_order(self, reference_id: str, amount: float, currency: str = "USD") -> dict:
+        await asyncio.sleep(self.latency)
+        order = order_body(reference_id, amount, currency)
+        order.update({"id": f"FAKE-{uuid.uuid4().hex[:17].upper()}", "status": "CREATED"})
+        self._orders[order["id"]] = order
+        return order
+
+    async def capture_order(self, order_id: str) -> dict:
+        await asyncio.sleep(self.latency)
+        order = self._orders.get(order_id)
+        if order is None:
+            raise PayPalError(f"Order {order_id} not found", 404)
+        if order["status"] != "COMPLETED":
+            unit = order["purchase_units"][0]
+            unit["payments"] = {"captures": [{
+                "id": f"FAKE-{uuid.uuid4().hex[:17].upper()}", "status": "COMPLETED", "amount": dict(unit["amount"]),
+            }]}
+            order["status"] = "COMPLETED"
+        return order
+
+    async def aclose(self):
+        self._orders.clear()
+
+
+def create_paypal_client(env: Mapping[str, str]):
+    """Build the client selected by PAYPAL_BACKEND, or None when unconfigured."""
+    backend = env.get('PAYPAL_BACKEND', 'http')
+    if backend == 'fake':
+        return FakePayPalClient(latency=float(env.get('PAYPAL_FAKE_LATENCY_MS', '0')) / 1000)
+
+    client_id = env.get('PAYPAL_CLIENT_ID', '')
+    client_secret = env.get('PAYPAL_SECRET', '')
+    if not (client_id and client_secret):
+        return None
+    return PayPalClient(
+        client_id,
+        client_secret,
+        mode=env.get('PAYPAL_MODE', 'sandbox'),
+        timeout=float(env.get('PAYPAL_TIMEOUT', '10')),
+        max_connections=int(env.get('PAYPAL_MAX_CONNECTIONS', '20')),
+        retries=int(env.get('PAYPAL_RETRIES', '2')),
+    )
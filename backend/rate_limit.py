@@ -0,0 +1,233 @@
+import json
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = Counter("rate_limited_requests_total", "Requests rejected by a rate limit.", ("rule",))
+
+KEY_TYPES = ("ip", "user", "email")
+# Auth bodies are tiny; anything larger is not inspected for an email
+MAX_INSPECTED_BODY = 16 * 1024
+
+
+class RateLimit:
+    """`burst` requests at once, refilled at `rate` per second, per distinct key."""
+
+    def __init__(self, method: str, path: str, key: str, rate: float, burst: float):
+        if key not in KEY_TYPES:
+            raise ValueError(f"Unknown rate limit key {key!r}")
+        self.method = method.upper()
+        self.path = path
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self.name = f"{self.method} {path} {key}"
+        self._pattern = re.compile("^" + re.sub(r"\\\{[^/]+?\\\}", "[^/]+", re.escape(path)) + "$")
+
+    def matches(self, method: str, path: str) -> bool:
+        return method == self.method and self._pattern.match(path) is not None
+
+
+def parse_rules(spec: str) -> List[RateLimit]:
+    """Parse "METHOD PATH KEY COUNT/SECONDS[:BURST]" rules separated by semicolons."""
+    rules = []
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        try:
+            method, path, key, limit = entry.split()
+            amount, _, burst = limit.partition(":")
+            count, _, seconds = amount.partition("/")
+            rules.append(RateLimit(method, path, key, float(count) / float(seconds), float(burst or count)))
+        except ValueError as exc:
+            raise ValueError(f"Invalid rate limit {entry!r}: {exc}")
+    return rules
+
+
+class MemoryBuckets:
+    """Token buckets for one process, as (tokens, updated_at) pairs in an LRU."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float) -> Tuple[bool, float]:
+        """Spend one token; returns (allowed, seconds until a token is available)."""
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+class MongoBuckets:
+    """Token buckets shared by every worker, one document per key.
+
+    Refill and spend happen in a single pipeline update using the server's
+    clock, so concurrent workers see one consistent bucket. A TTL index on
+    `expires_at` drops buckets once they would be full again. If Mongo is
+    unreachable requests are let through rather than failing closed.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def take(self, key: str, rate: float, burst: float) -> Tuple[bool, float]:
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        refilled = {"$min": [burst, {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, rate]}]}]}
+        try:
+            bucket = await self.collection.find_one_and_update(
+                {"_id": key},
+                [
+                    {"$set": {"tokens": refilled, "updated_at": "$$NOW"}},
+                    {"$set": {
+                        "allowed": {"$gte": ["$tokens", 1]},
+                        "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                        "expires_at": {"$add": ["$$NOW", math.ceil(burst / rate * 1000)]},
+                    }},
+                ],
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except PyMongoError:
+            logger.warning("Rate limit store unavailable, allowing request", exc_info=True)
+            return True, 0.0
+        if bucket["allowed"]:
+            return True, 0.0
+        return False, (1 - bucket["tokens"]) / rate
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value
+    return None
+
+
+def client_ip(scope, trust_forwarded: bool) -> str:
+    forwarded = _header(scope, b"x-forwarded-for") if trust_forwarded else None
+    if forwarded:
+        # The last hop is the one our proxy appended; earlier ones are client-controlled
+        return forwarded.decode("latin-1").split(",")[-1].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing token-bucket limits before routing.
+
+    Rejected requests get a 429 with Retry-After before the body is parsed
+    or any handler work (bcrypt, Mongo, PayPal) starts. `identify_user`
+    maps a bearer token to a user id for "user" keys; "email" keys read the
+    JSON body and replay it to the application.
+    """
+
+    def __init__(
+        self,
+        app,
+        rules: List[RateLimit],
+        buckets=None,
+        identify_user: Optional[Callable[[str], Optional[str]]] = None,
+        trust_forwarded: bool = False,
+    ):
+        self.app = app
+        self.rules = rules
+        self.buckets = buckets or MemoryBuckets()
+        self.identify_user = identify_user
+        self.trust_forwarded = trust_forwarded
+        self._warned_forwarded = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rules = [rule for rule in self.rules if rule.matches(scope["method"], scope["path"])]
+        if not rules:
+            await self.app(scope, receive, send)
+            return
+
+        body = None
+        if any(rule.key == "email" for rule in rules):
+            body, receive = await self._buffer_body(receive)
+
+        for rule in rules:
+            value = self._key(rule.key, scope, body)
+            if value is None:
+                continue
+            allowed, retry_after = await self.buckets.take(f"{rule.name}|{value}", rule.rate, rule.burst)
+            if not allowed:
+                RATE_LIMITED.inc(rule.name)
+                await self._reject(send, retry_after)
+                return
+        await self.app(scope, receive, send)
+
+    def _key(self, key: str, scope, body: Optional[bytes]) -> Optional[str]:
+        if key == "ip":
+            if not self.trust_forwarded and not self._warned_forwarded and _header(scope, b"x-forwarded-for"):
+                # Behind a proxy every client shares the proxy's address and bucket
+                self._warned_forwarded = True
+                logger.warning("Rate limiting by peer address although requests carry X-Forwarded-For; "
+                               "set TRUST_FORWARDED_FOR=true when running behind a reverse proxy")
+            return client_ip(scope, self.trust_forwarded)
+        if key == "user":
+            for name, value in scope.get("headers", []):
+                if name == b"authorization" and self.identify_user is not None:
+                    scheme, _, token = value.decode("latin-1").partition(" ")
+                    return self.identify_user(token.strip()) if scheme.lower() == "bearer" else None
+            return None
+        try:
+            email = json.loads(body or b"").get("email")
+        except (ValueError, AttributeError):
+            return None
+        return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+    async def _buffer_body(self, receive):
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                # Client went away; let the app see the disconnect
+                return None, _replay([message], receive)
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            more_body = message.get("more_body", False)
+            if size > MAX_INSPECTED_BODY and more_body:
+                return None, _replay([{"type": "http.request", "body": b"".join(chunks), "more_body": True}], receive)
+        body = b"".join(chunks)
+        return body, _replay([{"type": "http.request", "body": body, "more_body": False}], receive)
+
+    async def _reject(self, send, retry_after: float):
+        payload = b'{"detail":"Too many requests"}'
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(payload)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": payload})
+
+
+def _replay(messages: List[Dict], receive):
+    async def replayed():
+        if messages:
+            return messages.pop(0)
+        return await receive()
+    return replayed
@@ -0,0 +1,259 @@
+import asyncio
+import heapq
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# indptr, indices, counts of a CSR matrix whose rows are sorted by count.
+# NumPy is imported on first use, keeping it out of the app's import time.
+Csr = Tuple["np.ndarray", "np.ndarray", "np.ndarray"]
+Delta = Dict[int, Dict[int, int]]
+
+
+def _empty_csr(rows: int = 0) -> Csr:
+    import numpy as np
+    return np.zeros(rows + 1, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+
+
+def fold(csr: Optional[Csr], delta: Delta, n: int) -> Csr:
+    """Add `delta` to `csr` (None when empty) and re-sort every row by descending count.
+
+    Pure NumPy over COO triplets, so it can run off the event loop.
+    """
+    import numpy as np
+    indptr, indices, counts = csr if csr is not None else _empty_csr()
+    delta_rows = np.fromiter((row for row, cols in delta.items() for _ in cols), dtype=np.int64)
+    delta_cols = np.fromiter((col for cols in delta.values() for col in cols), dtype=np.int64)
+    delta_counts = np.fromiter((count for cols in delta.values() for count in cols.values()), dtype=np.int64)
+
+    rows = np.concatenate([np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr)), delta_rows])
+    cols = np.concatenate([indices.astype(np.int64), delta_cols])
+    keys, inverse = np.unique(rows * n + cols, return_inverse=True)
+    summed = np.bincount(inverse, weights=np.concatenate([counts, delta_counts])).astype(np.int32)
+    rows, cols = keys // n, keys % n
+
+    order = np.lexsort((cols, -summed, rows))
+    new_indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=new_indptr[1:])
+    return new_indptr, cols[order].astype(np.int32), summed[order]
+
+
+class CoOccurrence:
+    """Sparse product x product counts of how often two products share an order.
+
+    Counts live in CSR arrays with each row sorted by count, so the top-k
+    for a product is a slice. New orders land in a small per-row delta
+    that lookups merge on the fly until `fold` rewrites the arrays.
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self._index: Dict[str, int] = {}
+        # None until the first fold or load
+        self._csr: Optional[Csr] = None
+        self._delta: Delta = {}
+        self._folding: Delta = {}
+        self.pending_pairs = 0
+
+    @property
+    def nnz(self) -> int:
+        return len(self._csr[1]) if self._csr is not None else 0
+
+    def _position(self, product_id: str) -> int:
+        index = self._index.get(product_id)
+        if index is None:
+            index = self._index[product_id] = len(self.ids)
+            self.ids.append(product_id)
+        return index
+
+    def add_order(self, product_ids: Iterable[str]):
+        positions = sorted({self._position(product_id) for product_id in product_ids})
+        for row in positions:
+            cols = self._delta.setdefault(row, {})
+            for col in positions:
+                if col != row:
+                    cols[col] = cols.get(col, 0) + 1
+        self.pending_pairs += len(positions) * (len(positions) - 1)
+
+    def top(self, product_id: str, k: int) -> List[str]:
+        row = self._index.get(product_id)
+        if row is None:
+            return []
+        merged: Dict[int, int] = {}
+        extra = [delta[row] for delta in (self._folding, self._delta) if row in delta]
+        if self._csr is not None:
+            indptr, indices, counts = self._csr
+            start, end = (indptr[row], indptr[row + 1]) if row + 1 < len(indptr) else (0, 0)
+            if not extra:
+                return [self.ids[col] for col in indices[start:min(end, start + k)].tolist()]
+            merged = dict(zip(indices[start:end].tolist(), counts[start:end].tolist()))
+        for cols in extra:
+            for col, count in cols.items():
+                merged[col] = merged.get(col, 0) + count
+        return [self.ids[col] for col in heapq.nsmallest(k, merged, key=lambda col: (-merged[col], col))]
+
+    def begin_fold(self) -> Tuple[Optional[Csr], Delta, int]:
+        # A fold that was cancelled midway leaves its delta behind; keep it
+        folding = self._folding
+        for row, cols in self._delta.items():
+            target = folding.setdefault(row, {})
+            for col, count in cols.items():
+                target[col] = target.get(col, 0) + count
+        self._folding, self._delta = folding, {}
+        self.pending_pairs = 0
+        return self._csr, self._folding, len(self.ids)
+
+    def finish_fold(self, csr: Csr):
+        self._csr = csr
+        self._folding = {}
+
+    def compact(self):
+        if self._delta or self._folding:
+            self.finish_fold(fold(*self.begin_fold()))
+
+    # Snapshot
+    def save(self, path: Path, **meta: str):
+        """Write the compacted matrix atomically as a compressed .npz file."""
+        import numpy as np
+        self.compact()
+        indptr, indices, counts = self._csr if self._csr is not None else _empty_csr()
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(
+                f, ids=np.array(self.ids, dtype=str), indptr=indptr, indices=indices, counts=counts,
+                **{key: np.array(value) for key, value in meta.items()},
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Tuple["CoOccurrence", Dict[str, str]]:
+        import numpy as np
+        matrix = cls()
+        with np.load(path, allow_pickle=False) as data:
+            matrix.ids = data["ids"].tolist()
+            matrix._csr = (data["indptr"], data["indices"], data["counts"])
+            meta = {key: str(data[key]) for key in data.files if key not in ("ids", "indptr", "indices", "counts")}
+        matrix._index = {product_id: index for index, product_id in enumerate(matrix.ids)}
+        return matrix, meta
+
+
+class Recommendations:
+    """"Frequently bought together" built from the orders collection.
+
+    Every worker tails `orders` by (created_at, id) on its own schedule, so
+    orders placed by any worker are picked up within `poll_interval`.
+    Orders younger than `settle_seconds` are left for the next pass, which
+    keeps a slow checkout transaction from landing behind the watermark.
+    """
+
+    def __init__(
+        self,
+        orders,
+        snapshot_path: Optional[Path] = None,
+        poll_interval: float = 60.0,
+        snapshot_interval: float = 600.0,
+        settle_seconds: float = 10.0,
+        batch_size: int = 5000,
+        min_fold_pairs: int = 20000,
+    ):
+        self.orders = orders
+        self.snapshot_path = snapshot_path
+        self.poll_interval = poll_interval
+        self.snapshot_interval = snapshot_interval
+        self.settle_seconds = settle_seconds
+        self.batch_size = batch_size
+        self.min_fold_pairs = min_fold_pairs
+        self.matrix = CoOccurrence()
+        self._watermark: Optional[Tuple[datetime, str]] = None
+        self._saved_watermark: Optional[Tuple[datetime, str]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self.load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def load(self):
+        if self.snapshot_path and self.snapshot_path.exists():
+            try:
+                self.matrix, meta = await asyncio.to_thread(CoOccurrence.load, self.snapshot_path)
+                if meta.get("watermark_at"):
+                    self._watermark = (datetime.fromisoformat(meta["watermark_at"]), meta["watermark_id"])
+                self._saved_watermark = self._watermark
+                logger.info("Loaded %d co-occurrences from %s", self.matrix.nnz, self.snapshot_path)
+            except (OSError, ValueError, KeyError):
+                logger.exception("Ignoring unreadable recommendation snapshot %s", self.snapshot_path)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.save()
+
+    def related(self, product_id: str, k: int) -> List[str]:
+        return self.matrix.top(product_id, k)
+
+    async def catch_up(self) -> int:
+        """Fold in orders placed since the watermark; returns how many were read."""
+        read = 0
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.settle_seconds)
+        while True:
+            query = {"created_at": {"$lt": cutoff}}
+            if self._watermark:
+                at, order_id = self._watermark
+                query = {"$and": [query, {"$or": [{"created_at": {"$gt": at}}, {"created_at": at, "id": {"$gt": order_id}}]}]}
+            cursor = self.orders.find(query, {"_id": 0, "id": 1, "created_at": 1, "items.product_id": 1})
+            batch = await cursor.sort([("created_at", 1), ("id", 1)]).limit(self.batch_size).to_list(None)
+            for order in batch:
+                self.matrix.add_order(item["product_id"] for item in order.get("items", []))
+            if batch:
+                last = batch[-1]
+                self._watermark = (last["created_at"], last["id"])
+                read += len(batch)
+            # Fold geometrically so a cold build does O(log n) rewrites
+            if self.matrix.pending_pairs >= max(self.min_fold_pairs, self.matrix.nnz // 4):
+                await self._fold()
+            if len(batch) < self.batch_size:
+                return read
+
+    async def _fold(self):
+        csr, delta, n = self.matrix.begin_fold()
+        self.matrix.finish_fold(await asyncio.to_thread(fold, csr, delta, n))
+
+    async def save(self):
+        if not self.snapshot_path or self._watermark == self._saved_watermark:
+            return
+        at, order_id = self._watermark
+        await self._fold()
+        await asyncio.to_thread(self.matrix.save, self.snapshot_path, watermark_at=at.isoformat(), watermark_id=order_id)
+        self._saved_watermark = self._watermark
+
+    async def _run(self):
+        last_saved = time.monotonic()
+        while True:
+            try:
+                read = await self.catch_up()
+                if read:
+                    logger.info("Recommendations updated from %d orders", read)
+                if time.monotonic() - last_saved >= self.snapshot_interval:
+                    await self.save()
+                    last_saved = time.monotonic()
+            except PyMongoError:
+                logger.exception("Recommendation refresh failed")
+            except OSError:
+                logger.exception("Could not write recommendation snapshot %s", self.snapshot_path)
+            await asyncio.sleep(self.poll_interval)
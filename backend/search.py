@@ -0,0 +1,292 @@
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from pydantic import BaseModel
+
+STOPWORDS = frozenset({
+    "a", "as", "o", "os", "e", "de", "da", "das", "do", "dos", "em", "na", "nas",
+    "no", "nos", "com", "para", "por", "um", "uma", "the", "and",
+})
+
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "category": 2.0,
+    "colors": 1.5,
+    "sizes": 1.0,
+    "description": 1.0,
+}
+
+FACETS = ("category", "sizes", "colors")
+
+MAX_PREFIX_EXPANSIONS = 50
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents: 'Calça' -> 'calca'."""
+    text = text.lower()
+    if text.isascii():
+        return text
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+
+def _stem(token: str) -> str:
+    # Plural folding is enough for a clothing catalog: 'calcas' ~ 'calca'.
+    return token[:-1] if len(token) > 3 and token.endswith("s") else token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(token) for token in _TOKEN_RE.findall(fold(text)) if token not in STOPWORDS]
+
+
+def _bits(mask: int) -> Iterable[int]:
+    """Positions of the set bits of `mask`, lowest first."""
+    reversed_bits = bin(mask)[:1:-1]
+    position = reversed_bits.find("1")
+    while position != -1:
+        yield position
+        position = reversed_bits.find("1", position + 1)
+
+
+def _mask(slots: Iterable[int], size: int) -> int:
+    bitmap = bytearray((size + 7) // 8)
+    for slot in slots:
+        bitmap[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bitmap, "little")
+
+
+class SearchHits(NamedTuple):
+    total: int
+    items: List[BaseModel]
+    facets: Dict[str, Dict[str, int]]
+
+
+class SearchIndex:
+    """Inverted index over catalog products with bitset facets.
+
+    Each product gets a slot number; term postings, facet values and the
+    live-document set are Python ints used as bitsets, so filtering and facet
+    counting are a handful of big-int ANDs and popcounts per query.
+    Subscribe it to a CatalogCache to keep it current.
+    """
+
+    def __init__(self):
+        self._clear()
+
+    def _clear(self):
+        self.available = False
+        self._items: List[Optional[BaseModel]] = []
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._live = 0
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._term_masks: Dict[str, int] = {}
+        self._terms: List[str] = []
+        self._doc_terms: Dict[int, List[str]] = {}
+        self._facet_masks: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+        self._facet_labels: Dict[str, Dict[str, str]] = {facet: {} for facet in FACETS}
+        self._prices: List[Tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    # CatalogCache listener interface
+    def reset(self, items: Optional[Iterable[BaseModel]]):
+        self._clear()
+        if items is None:
+            return
+        # Bulk load: collect slot lists first and build each bitset once.
+        facet_slots: Dict[str, Dict[str, List[int]]] = {facet: {} for facet in FACETS}
+        for slot, item in enumerate(items):
+            self._items.append(item)
+            self._slots[item.id] = slot
+            weights = self._term_weights(item)
+            for term, weight in weights.items():
+                self._postings.setdefault(term, {})[slot] = weight
+            self._doc_terms[slot] = list(weights)
+            for facet, key in self._facet_keys(item):
+                facet_slots[facet].setdefault(key, []).append(slot)
+                self._facet_labels[facet].setdefault(key, self._label(item, facet, key))
+            self._prices.append((item.price, slot))
+
+        size = len(self._items)
+        self._live = _mask(range(size), size)
+        self._term_masks = {term: _mask(postings, size) for term, postings in self._postings.items()}
+        self._terms = sorted(self._postings)
+        self._facet_masks = {
+            facet: {key: _mask(slots, size) for key, slots in values.items()}
+            for facet, values in facet_slots.items()
+        }
+        self._prices.sort()
+        self.available = True
+
+    def upsert(self, item: BaseModel):
+        if not self.available:
+            return
+        self.remove(item.id)
+        self._add(item)
+
+    def remove(self, product_id: str):
+        slot = self._slots.pop(product_id, None)
+        if slot is None:
+            return
+        item = self._items[slot]
+        bit = 1 << slot
+        self._live &= ~bit
+        for term in self._doc_terms.pop(slot):
+            postings = self._postings[term]
+            del postings[slot]
+            if postings:
+                self._term_masks[term] &= ~bit
+            else:
+                del self._postings[term]
+                del self._term_masks[term]
+                del self._terms[bisect.bisect_left(self._terms, term)]
+        for facet, key in self._facet_keys(item):
+            masks = self._facet_masks[facet]
+            masks[key] &= ~bit
+            if not masks[key]:
+                del masks[key]
+                del self._facet_labels[facet][key]
+        del self._prices[bisect.bisect_left(self._prices, (item.price, slot))]
+        self._items[slot] = None
+        self._free.append(slot)
+
+    # Queries
+    def search(
+        self,
+        query: str = "",
+        category: Optional[str] = None,
+        size: Optional[str] = None,
+        color: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        limit: int = 24,
+        offset: int = 0,
+    ) -> SearchHits:
+        tokens = tokenize(query)
+        mask = self._live
+        expansions: List[List[str]] = []
+        for position, token in enumerate(tokens):
+            terms = [token] if token in self._term_masks else []
+            if position == len(tokens) - 1:
+                terms = terms + self._prefix_terms(token)
+            if not terms:
+                mask = 0
+                break
+            expansions.append(terms)
+            term_mask = 0
+            for term in terms:
+                term_mask |= self._term_masks[term]
+            mask &= term_mask
+
+        for facet, value in (("category", category), ("sizes", size), ("colors", color)):
+            if value:
+                mask &= self._facet_masks[facet].get(fold(value), 0)
+        if min_price is not None or max_price is not None:
+            mask &= self._price_mask(min_price, max_price)
+
+        facets = {
+            facet: {
+                self._facet_labels[facet][key]: count
+                for key, facet_mask in self._facet_masks[facet].items()
+                if (count := (mask & facet_mask).bit_count())
+            }
+            for facet in FACETS
+        }
+        total = mask.bit_count()
+
+        if expansions:
+            page = self._rank(_bits(mask), expansions, offset + limit)[offset:]
+        else:
+            page = []
+            for index, slot in enumerate(_bits(mask)):
+                if index >= offset + limit:
+                    break
+                if index >= offset:
+                    page.append(slot)
+
+        return SearchHits(total, [self._items[slot] for slot in page], facets)
+
+    # Internals
+    def _add(self, item: BaseModel):
+        slot = self._free.pop() if self._free else len(self._items)
+        if slot == len(self._items):
+            self._items.append(item)
+        else:
+            self._items[slot] = item
+        self._slots[item.id] = slot
+        bit = 1 << slot
+        self._live |= bit
+
+        weights = self._term_weights(item)
+        for term, weight in weights.items():
+            if term not in self._postings:
+                self._postings[term] = {}
+                self._term_masks[term] = 0
+                bisect.insort(self._terms, term)
+            self._postings[term][slot] = weight
+            self._term_masks[term] |= bit
+        self._doc_terms[slot] = list(weights)
+
+        for facet, key in self._facet_keys(item):
+            self._facet_masks[facet][key] = self._facet_masks[facet].get(key, 0) | bit
+            self._facet_labels[facet].setdefault(key, self._label(item, facet, key))
+        bisect.insort(self._prices, (item.price, slot))
+
+    @staticmethod
+    def _term_weights(item: BaseModel) -> Dict[str, float]:
+        weights: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            value = getattr(item, field)
+            for text in (value if isinstance(value, list) else [value]):
+                for token in tokenize(text):
+                    weights[token] = weights.get(token, 0.0) + weight
+        return weights
+
+    @staticmethod
+    def _facet_keys(item: BaseModel) -> Iterable[Tuple[str, str]]:
+        yield "category", fold(item.category)
+        for facet in ("sizes", "colors"):
+            for value in set(fold(value) for value in getattr(item, facet)):
+                yield facet, value
+
+    @staticmethod
+    def _label(item: BaseModel, facet: str, key: str) -> str:
+        values = [item.category] if facet == "category" else getattr(item, facet)
+        return next(value for value in values if fold(value) == key)
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        start = bisect.bisect_right(self._terms, prefix)
+        terms = []
+        for term in self._terms[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def _price_mask(self, min_price: Optional[float], max_price: Optional[float]) -> int:
+        low = 0 if min_price is None else bisect.bisect_left(self._prices, (min_price, -1))
+        high = len(self._prices) if max_price is None else bisect.bisect_right(self._prices, (max_price, math.inf))
+        return _mask((slot for _, slot in self._prices[low:high]), len(self._items))
+
+    def _rank(self, slots: Iterable[int], expansions: List[List[str]], count: int) -> List[int]:
+        """Top `count` slots by summed tf-idf; each token scores its best expansion."""
+        total_docs = len(self._slots)
+        groups = [
+            [(self._postings[term], math.log(1 + total_docs / len(self._postings[term]))) for term in terms]
+            for terms in expansions
+        ]
+        if all(len(group) == 1 for group in groups):
+            single = [group[0] for group in groups]
+            return heapq.nlargest(count, slots, key=lambda slot: sum(postings[slot] * idf for postings, idf in single))
+
+        def score(slot: int) -> float:
+            return sum(max(postings.get(slot, 0.0) * idf for postings, idf in group) for group in groups)
+
+        return heapq.nlargest(count, slots, key=score)
@@ -1,10 +1,21 @@
+import argparse
 import asyncio
+import random
+import time
+import unicodedata
+from functools import lru_cache
+from itertools import accumulate, islice
+from math import gcd
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from datetime import datetime, timezone, timedelta
 import uuid
 
+from hashing import PasswordHasher
+from indexes import ensure_indexes
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
@@ -104,6 +115,10 @@ async def seed_products():
         }
     ]
     
+    now = datetime.now(timezone.utc)
+    for position, product in enumerate(products):
+        product["created_at"] = now + timedelta(milliseconds=position)
+    
     await db.products.delete_many({})
     await db.products.insert_many(products)
     print(f"✅ {len(products)} produtos adicionados")
@@ -164,10 +179,294 @@ async def seed_models():
     await db.models.insert_many(models)
     print(f"✅ {len(models)} modelos adicionadas")
 
+# Synthetic datasets
+# Every document is derived from (seed, kind, index) alone, so any run with
+# the same arguments produces byte-identical collections.
+SYNTHETIC_PASSWORD = "senha123"
+SYNTHETIC_EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+# Share of the catalog per category; a few categories dominate, as in the store
+CATEGORY_WEIGHTS = {
+    "vestidos": 28, "blusas": 24, "calcas": 14, "saias": 9,
+    "esportivo": 8, "casacos": 7, "bodies": 6, "acessorios": 4,
+}
+CATEGORY_NOUNS = {
+    "vestidos": "Vestido", "blusas": "Blusa", "calcas": "Calça", "saias": "Saia",
+    "esportivo": "Legging", "casacos": "Casaco", "bodies": "Body", "acessorios": "Bolsa",
+}
+CATEGORY_PRICES = {
+    "vestidos": 139.9, "blusas": 79.9, "calcas": 159.9, "saias": 109.9,
+    "esportivo": 129.9, "casacos": 229.9, "bodies": 69.9, "acessorios": 99.9,
+}
+CATEGORY_SIZES = {
+    "calcas": ["36", "38", "40", "42", "44", "46"],
+    "acessorios": ["Único"],
+}
+DEFAULT_SIZES = ["PP", "P", "M", "G", "GG"]
+STYLES = [
+    "Floral", "Básica", "Midi", "Longa", "Cropped", "Oversized", "Plissada", "Alfaiataria",
+    "Canelada", "Estampada", "Jeans", "Linho", "Tricô", "Cetim", "Transpassada", "Listrada",
+]
+OCCASIONS = ["Verão", "Inverno", "Festa", "Casual", "Trabalho", "Praia", "Noite", "Fitness"]
+COLORS = [
+    "Preto", "Branco", "Nude", "Rosa", "Azul", "Azul Marinho", "Vinho", "Bege",
+    "Caramelo", "Verde", "Cinza", "Roxo", "Vermelho", "Off White",
+]
+FIRST_NAMES = [
+    "Ana", "Beatriz", "Camila", "Daniela", "Eduarda", "Fernanda", "Gabriela", "Helena", "Isabela",
+    "Júlia", "Larissa", "Mariana", "Natália", "Patrícia", "Rafaela", "Sofia", "Thaís", "Vitória",
+    "Bruno", "Carlos", "Diego", "Felipe", "Gustavo", "Lucas", "Marcelo", "Pedro", "Rafael", "Thiago",
+]
+LAST_NAMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima",
+    "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Mendes", "Araújo",
+]
+CITIES = ["São Paulo, SP", "Rio de Janeiro, RJ", "Belo Horizonte, MG", "Curitiba, PR", "Porto Alegre, RS", "Recife, PE", "Salvador, BA"]
+STREETS = ["Rua Augusta", "Av. Paulista", "Rua das Flores", "Rua XV de Novembro", "Av. Atlântica", "Rua da Bahia"]
+
+# Lines per order and units per line, skewed towards small baskets
+ORDER_LINES = {1: 48, 2: 26, 3: 13, 4: 7, 5: 4, 6: 2}
+LINE_QUANTITIES = {1: 80, 2: 15, 3: 5}
+ORDER_STATUSES = {"completed": 82, "pending": 18}
+CART_LINES = {1: 40, 2: 30, 3: 15, 4: 10, 5: 5}
+
+
+def _rng(seed: int, kind: str, index: int) -> random.Random:
+    return random.Random(f"{seed}/{kind}/{index}")
+
+
+def _pick(rng: random.Random, weights: dict):
+    return rng.choices(list(weights), list(weights.values()))[0]
+
+
+def _ascii(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+
+
+def synthetic_id(seed: int, kind: str, index: int) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"seed-{seed}/{kind}/{index}"))
+
+
+def _timestamp(rng: random.Random, days: int) -> datetime:
+    return SYNTHETIC_EPOCH - timedelta(seconds=rng.uniform(0, days * 86400))
+
+
+class Popularity:
+    """Zipf-distributed picks over `size` items.
+
+    Ranks are mapped onto indexes by a seeded bijection so the bestsellers
+    are scattered across categories and creation dates.
+    """
+
+    def __init__(self, size: int, exponent: float, seed: int):
+        self.size = size
+        self.cum_weights = list(accumulate(1 / rank ** exponent for rank in range(1, size + 1)))
+        rng = random.Random(f"{seed}/popularity/{size}")
+        self.stride = rng.randrange(1, size) if size > 1 else 1
+        while gcd(self.stride, size) != 1:
+            self.stride += 1
+        self.offset = rng.randrange(size)
+
+    def sample(self, rng: random.Random, k: int = 1):
+        ranks = rng.choices(range(self.size), cum_weights=self.cum_weights, k=k)
+        return [(rank * self.stride + self.offset) % self.size for rank in ranks]
+
+
+def synthetic_product(seed: int, index: int, days: int) -> dict:
+    rng = _rng(seed, "product", index)
+    category = _pick(rng, CATEGORY_WEIGHTS)
+    noun, style, occasion = CATEGORY_NOUNS[category], rng.choice(STYLES), rng.choice(OCCASIONS)
+    product_id = synthetic_id(seed, "product", index)
+    return {
+        "id": product_id,
+        "name": f"{noun} {style} {occasion}",
+        "description": f"{noun} {style.lower()} para ocasiões de {occasion.lower()}, com tecido de toque macio e caimento leve",
+        "price": max(19.9, round(round(CATEGORY_PRICES[category] * rng.lognormvariate(0, 0.35)) - 0.1, 2)),
+        "category": category,
+        "sizes": CATEGORY_SIZES.get(category, DEFAULT_SIZES),
+        "colors": rng.sample(COLORS, rng.randint(1, 4)),
+        "image_url": f"https://picsum.photos/seed/{product_id}/400/600",
+        "stock": 0 if rng.random() < 0.08 else rng.randint(1, 80),
+        "created_at": _timestamp(rng, days),
+    }
+
+
+@lru_cache(maxsize=200_000)
+def _product_for_lines(seed: int, index: int, days: int) -> dict:
+    return synthetic_product(seed, index, days)
+
+
+def _line(rng: random.Random, product: dict) -> dict:
+    return {
+        "product_id": product["id"],
+        "quantity": _pick(rng, LINE_QUANTITIES),
+        "size": rng.choice(product["sizes"]),
+        "color": rng.choice(product["colors"]),
+        "product_name": product["name"],
+        "product_price": product["price"],
+        "product_image": product["image_url"],
+    }
+
+
+def synthetic_users(seed: int, count: int, days: int, password_hash: str):
+    for index in range(count):
+        rng = _rng(seed, "user", index)
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield {
+            "id": synthetic_id(seed, "user", index),
+            "email": _ascii(f"{first}.{last}.{index}@example.com").lower(),
+            "name": f"{first} {last}",
+            "role": "customer",
+            "created_at": _timestamp(rng, days),
+            "password": password_hash,
+        }
+
+
+def synthetic_carts(seed: int, count: int, days: int, popularity: Popularity):
+    # One cart per user: the first `count` users have a cart
+    for index in range(count):
+        rng = _rng(seed, "cart", index)
+        picks = popularity.sample(rng, _pick(rng, CART_LINES))
+        yield {
+            "id": synthetic_id(seed, "cart", index),
+            "user_id": synthetic_id(seed, "user", index),
+            "items": [_line(rng, _product_for_lines(seed, pick, days)) for pick in picks],
+            "updated_at": _timestamp(rng, min(days, 30)),
+        }
+
+
+def synthetic_orders(seed: int, count: int, days: int, popularity: Popularity, buyers: Popularity):
+    for index in range(count):
+        rng = _rng(seed, "order", index)
+        items = [
+            _line(rng, _product_for_lines(seed, pick, days))
+            for pick in popularity.sample(rng, _pick(rng, ORDER_LINES))
+        ]
+        status = _pick(rng, ORDER_STATUSES)
+        yield {
+            "id": synthetic_id(seed, "order", index),
+            "user_id": synthetic_id(seed, "user", buyers.sample(rng)[0]),
+            "items": items,
+            "total": round(sum(item["product_price"] * item["quantity"] for item in items), 2),
+            "status": status,
+            "paypal_order_id": f"SYN{index:010d}" if status == "completed" else None,
+            "address": f"{rng.choice(STREETS)}, {rng.randint(1, 3000)} - {rng.choice(CITIES)}",
+            "created_at": _timestamp(rng, days),
+        }
+
+
+def synthetic_bookings(seed: int, count: int, users: int, days: int, models: list):
+    for index in range(count):
+        rng = _rng(seed, "booking", index)
+        model = rng.choice(models)
+        duration = rng.randint(1, 8)
+        created_at = _timestamp(rng, days)
+        yield {
+            "id": synthetic_id(seed, "booking", index),
+            "user_id": synthetic_id(seed, "user", rng.randrange(users)),
+            "model_id": model["id"],
+            "date": (created_at + timedelta(days=rng.randint(3, 60))).date().isoformat(),
+            "time": f"{rng.randint(9, 18):02d}:00",
+            "duration": duration,
+            "status": "pending",
+            "message": "Ensaio fotográfico para campanha da nova coleção",
+            "budget": round(model["hourly_rate"] * duration * rng.uniform(0.8, 1.3), 2),
+            "created_at": created_at,
+        }
+
+
+def _batches(docs, size: int):
+    iterator = iter(docs)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+async def insert_stream(collection: str, docs, total: int, batch_size: int, concurrency: int):
+    """Insert `docs` in batches with up to `concurrency` insert_many calls in flight."""
+    await db[collection].drop()
+    slots = asyncio.Semaphore(concurrency)
+    tasks = []
+    inserted = 0
+    started = time.monotonic()
+
+    async def insert(batch):
+        nonlocal inserted
+        try:
+            await db[collection].insert_many(batch, ordered=False)
+        finally:
+            slots.release()
+        inserted += len(batch)
+        rate = inserted / max(time.monotonic() - started, 1e-6)
+        print(f"   {collection}: {inserted}/{total} ({rate:,.0f} docs/s)", end="\r")
+
+    for batch in _batches(docs, batch_size):
+        await slots.acquire()
+        tasks.append(asyncio.create_task(insert(batch)))
+    await asyncio.gather(*tasks)
+    print(f"✅ {inserted} {collection} inseridos em {time.monotonic() - started:.1f}s" + " " * 20)
+
+
+async def seed_synthetic(args):
+    if (args.orders or args.carts) and not args.products:
+        raise SystemExit("❌ --orders e --carts exigem --products")
+    if (args.orders or args.carts or args.bookings) and not args.users:
+        raise SystemExit("❌ --orders, --carts e --bookings exigem --users")
+    if args.carts > args.users:
+        raise SystemExit("❌ --carts não pode ser maior que --users")
+
+    popularity = Popularity(args.products, args.zipf, args.seed) if args.products else None
+    options = dict(batch_size=args.batch_size, concurrency=args.concurrency)
+
+    if args.products:
+        docs = (synthetic_product(args.seed, index, args.days) for index in range(args.products))
+        await insert_stream("products", docs, args.products, **options)
+    if args.users:
+        # One bcrypt hash shared by every synthetic user keeps generation fast
+        hasher = PasswordHasher(rounds=int(os.environ.get('BCRYPT_ROUNDS', '12')))
+        password_hash = await hasher.hash(SYNTHETIC_PASSWORD)
+        hasher.shutdown()
+        docs = synthetic_users(args.seed, args.users, args.days, password_hash)
+        await insert_stream("users", docs, args.users, **options)
+        print(f"🔑 Senha dos usuários sintéticos: {SYNTHETIC_PASSWORD}")
+    if args.carts:
+        docs = synthetic_carts(args.seed, args.carts, args.days, popularity)
+        await insert_stream("carts", docs, args.carts, **options)
+    if args.orders:
+        buyers = Popularity(args.users, 0.8, args.seed + 1)
+        docs = synthetic_orders(args.seed, args.orders, args.days, popularity, buyers)
+        await insert_stream("orders", docs, args.orders, **options)
+    if args.bookings:
+        models = await db.models.find({}, {"_id": 0, "id": 1, "hourly_rate": 1}).sort("name", 1).to_list(None)
+        if not models:
+            await seed_models()
+            models = await db.models.find({}, {"_id": 0, "id": 1, "hourly_rate": 1}).sort("name", 1).to_list(None)
+        docs = synthetic_bookings(args.seed, args.bookings, args.users, args.days, models)
+        await insert_stream("bookings", docs, args.bookings, **options)
+
+    # Building indexes once after the bulk load is much faster than maintaining them per insert
+    print("🗂️  Criando índices...")
+    await ensure_indexes(db)
+
 async def main():
+    parser = argparse.ArgumentParser(description="Popula o banco com dados de exemplo ou sintéticos")
+    parser.add_argument("--products", type=int, default=0, help="produtos sintéticos")
+    parser.add_argument("--users", type=int, default=0, help="usuários sintéticos")
+    parser.add_argument("--carts", type=int, default=0, help="carrinhos (um por usuário)")
+    parser.add_argument("--orders", type=int, default=0, help="pedidos sintéticos")
+    parser.add_argument("--bookings", type=int, default=0, help="agendamentos sintéticos")
+    parser.add_argument("--seed", type=int, default=42, help="semente; a mesma semente gera os mesmos dados")
+    parser.add_argument("--days", type=int, default=365, help="janela de datas de criação, em dias")
+    parser.add_argument("--zipf", type=float, default=1.1, help="expoente da popularidade dos produtos")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4, help="insert_many simultâneos")
+    args = parser.parse_args()
+
     print("🌱 Iniciando seed do banco de dados...")
-    await seed_products()
-    await seed_models()
+    if any((args.products, args.users, args.carts, args.orders, args.bookings)):
+        await seed_synthetic(args)
+    else:
+        await seed_products()
+        await seed_models()
     print("✅ Seed completo!")
     client.close()
 
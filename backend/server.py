@@ -1,45 +1,88 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+import time
+
+# Cold-start timing starts before the heavy imports below
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from contextlib import asynccontextmanager
+import asyncio
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr, ConfigDict
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 import uuid
-from datetime import datetime, timezone, timedelta
-from passlib.context import CryptContext
+from datetime import date, datetime, timezone, timedelta
 import jwt
-from paypalcheckoutsdk.core import PayPalHttpClient, SandboxEnvironment
-from paypalcheckoutsdk.orders import OrdersCreateRequest, OrdersCaptureRequest
+
+from analytics import ORDER_ROLLUP_PROJECTION, InvalidRange, SalesRollups
+from availability import BookingCalendar, InvalidBookingTime, SlotUnavailable, weekdays
+from cart_ops import add_item_pipeline, batch_pipeline, line_match, remove_item_update, set_quantity_update
+from catalog_cache import CatalogCache
+from catalog_snapshots import CatalogSnapshots, snapshot_response
+from hashing import HasherSaturated, PasswordHasher
+from indexes import ensure_indexes
+from inventory import InsufficientStock, place_order
+from metrics import APP_STARTUP_SECONDS, MetricsMiddleware, MongoCommandTracer, render_metrics, track
+from exports import BOOKING_CSV_COLUMNS, MEDIA_TYPES, ORDER_CSV_COLUMNS, booking_rows, csv_stream, ndjson_stream, order_rows
+from fast_json import encode_documents, fast_response, model_encoder, projection_for
+from http_cache import conditional_get
+from images import DEFAULT_WIDTHS, FORMATS, ImageStore, choose_format, parse_widths
+from rate_limit import MemoryBuckets, MongoBuckets, RateLimitMiddleware, parse_rules
+from recommendations import Recommendations
+from search import SearchIndex
+from write_behind import QueueFull, WriteBehindQueue
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, InvalidCursor, paginate
+from ttl_cache import TTLCache
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Mongo, PayPal and the password hasher are created by the app lifespan
+client: Optional[AsyncIOMotorClient] = None
+db = None
+password_hasher: Optional[PasswordHasher] = None
+paypal_client = None
+
+# Pool options passed to the Mongo client when the variable is set
+MONGO_POOL_OPTIONS = {
+    "maxPoolSize": "MONGO_MAX_POOL_SIZE",
+    "minPoolSize": "MONGO_MIN_POOL_SIZE",
+    "maxIdleTimeMS": "MONGO_MAX_IDLE_TIME_MS",
+    "waitQueueTimeoutMS": "MONGO_WAIT_QUEUE_TIMEOUT_MS",
+    "connectTimeoutMS": "MONGO_CONNECT_TIMEOUT_MS",
+    "socketTimeoutMS": "MONGO_SOCKET_TIMEOUT_MS",
+    "serverSelectionTimeoutMS": "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+}
+
+def create_mongo_client() -> AsyncIOMotorClient:
+    options = {option: int(os.environ[name]) for option, name in MONGO_POOL_OPTIONS.items() if os.environ.get(name)}
+    return AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True, event_listeners=[MongoCommandTracer()], **options)
+
+def create_password_hasher() -> PasswordHasher:
+    return PasswordHasher(
+        rounds=int(os.environ.get('BCRYPT_ROUNDS', '12')),
+        max_workers=int(os.environ.get('HASH_WORKERS', '4')),
+        max_pending=int(os.environ.get('HASH_QUEUE_DEPTH', '64')),
+        use_processes=os.environ.get('HASH_EXECUTOR', 'thread') == 'process',
+    )
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
 SECRET_KEY = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440
 
-# PayPal Config
-paypal_client_id = os.environ.get('PAYPAL_CLIENT_ID', '')
-paypal_secret = os.environ.get('PAYPAL_SECRET', '')
-
-if paypal_client_id and paypal_secret:
-    environment = SandboxEnvironment(client_id=paypal_client_id, client_secret=paypal_secret)
-    paypal_client = PayPalHttpClient(environment)
-else:
-    paypal_client = None
+# Trust the principal claims embedded in the token instead of loading the user
+AUTH_STATELESS = os.environ.get('AUTH_STATELESS', 'false').lower() in ('1', 'true', 'yes')
 
-app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
 # Models
@@ -75,7 +118,17 @@ class Product(BaseModel):
     sizes: List[str]
     colors: List[str]
     image_url: str
+    # Responsive variants written by ingest_images.py; clients fall back to image_url
+    image_srcset: Optional[str] = None
+    # Volatile in the catalog cache, so listings may lag; GET /products/{id}
+    # reads it from Mongo and orders check it when they are placed
     stock: int = 10
+    created_at: Optional[datetime] = None
+
+class ProductSearchResult(BaseModel):
+    total: int
+    items: List[Product]
+    facets: Dict[str, Dict[str, int]]
 
 class CartItem(BaseModel):
     product_id: str
@@ -85,6 +138,8 @@ class CartItem(BaseModel):
     product_name: str
     product_price: float
     product_image: str
+    # Set on order lines so sales reports keep the category the item was sold under
+    product_category: Optional[str] = None
 
 class Cart(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -93,6 +148,31 @@ class Cart(BaseModel):
     items: List[CartItem] = []
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class CartQuantityUpdate(BaseModel):
+    quantity: int
+
+# Upper bound on operations per batch; each one is a stage of the update pipeline
+MAX_CART_OPERATIONS = 100
+
+class CartOperation(BaseModel):
+    op: Literal["add", "remove", "set"]
+    product_id: str
+    size: str
+    color: str
+    quantity: Optional[int] = None
+
+class CartBatch(BaseModel):
+    operations: List[CartOperation] = Field(max_length=MAX_CART_OPERATIONS)
+
+class CartLine(BaseModel):
+    product_id: str
+    size: str
+    color: str
+    quantity: int
+
+class CartMerge(BaseModel):
+    items: List[CartLine] = Field(max_length=MAX_CART_OPERATIONS)
+
 class Order(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -107,7 +187,7 @@ class Order(BaseModel):
 class OrderCreate(BaseModel):
     address: str
     items: List[CartItem]
-    total: float
+    total: Optional[float] = None
 
 class Model(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -116,6 +196,8 @@ class Model(BaseModel):
     bio: str
     hourly_rate: float
     portfolio_images: List[str]
+    # Parallel to portfolio_images; empty where no variants were generated
+    portfolio_srcsets: List[str] = []
     availability: List[str] = []
 
 class ModelBooking(BaseModel):
@@ -139,6 +221,11 @@ class ModelBookingCreate(BaseModel):
     message: str
     budget: float
 
+class DaySlots(BaseModel):
+    date: str
+    weekday: str
+    slots: List[str]
+
 class Partnership(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -155,15 +242,71 @@ class PartnershipCreate(BaseModel):
     message: str
 
 class PayPalOrderRequest(BaseModel):
-    amount: float
     order_id: str
+    # Ignored; the stored order total is charged
+    amount: Optional[float] = None
+
+class SalesDay(BaseModel):
+    day: str
+    units: int
+    revenue: float
+    orders: int
+
+class SalesRanking(BaseModel):
+    key: str
+    units: int
+    revenue: float
+    orders: int
+
+# Response encoding
+# FAST_JSON skips response_model re-validation for documents the API wrote itself
+FAST_JSON = os.environ.get('FAST_JSON', 'false').lower() in ('1', 'true', 'yes')
+encode_products = model_encoder(List[Product])
+encode_product = model_encoder(Product)
+encode_models = model_encoder(List[Model])
+encode_model = model_encoder(Model)
+ORDER_PROJECTION = projection_for(Order)
+BOOKING_PROJECTION = projection_for(ModelBooking)
+
+# Query helpers
+def date_range(field: str, since: Optional[datetime], until: Optional[datetime]) -> dict:
+    bounds = {}
+    if since:
+        bounds["$gte"] = since
+    if until:
+        bounds["$lt"] = until
+    return {field: bounds} if bounds else {}
 
 # Auth helpers
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+def hasher_busy():
+    return HTTPException(
+        status_code=503,
+        detail="Authentication service busy, try again",
+        headers={"Retry-After": "1"},
+    )
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def verify_password(plain_password, hashed_password):
+    try:
+        with track("bcrypt"):
+            return await password_hasher.verify_and_update(plain_password, hashed_password)
+    except HasherSaturated:
+        raise hasher_busy()
+
+async def get_password_hash(password):
+    try:
+        with track("bcrypt"):
+            return await password_hasher.hash(password)
+    except HasherSaturated:
+        raise hasher_busy()
+
+def principal_claims(user: User) -> dict:
+    return {
+        "sub": user.id,
+        "email": user.email,
+        "name": user.name,
+        "role": user.role,
+        "created_at": user.created_at.isoformat(),
+    }
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -172,10 +315,24 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+principal_cache: TTLCache[User] = TTLCache(
+    max_size=int(os.environ.get('PRINCIPAL_CACHE_MAX_SIZE', '10000')),
+    ttl_seconds=float(os.environ.get('PRINCIPAL_CACHE_TTL', '60')),
+)
+
+def invalidate_user(user_id: str):
+    """Call after every write to db.users so this worker's next request reloads the user.
+
+    Other workers, and edits made outside the API, see the change once their
+    cached copy expires after PRINCIPAL_CACHE_TTL.
+    """
+    principal_cache.discard(user_id)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with track("jwt"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
@@ -184,10 +341,30 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
-    if user is None:
+    if AUTH_STATELESS and "email" in payload:
+        return User(
+            id=user_id,
+            email=payload["email"],
+            name=payload["name"],
+            role=payload.get("role", "customer"),
+            created_at=payload["created_at"],
+        )
+    
+    user = principal_cache.get(user_id)
+    if user is not None:
+        return user
+    
+    user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+    if user_doc is None:
         raise HTTPException(status_code=401, detail="User not found")
-    return User(**user)
+    user = User(**user_doc)
+    principal_cache.set(user_id, user)
+    return user
+
+async def get_admin_user(current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
 
 # Auth routes
 @api_router.post("/auth/register", response_model=Token)
@@ -196,28 +373,32 @@ async def register(user_data: UserCreate):
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash(user_data.password)
     user = User(email=user_data.email, name=user_data.name)
     
     doc = user.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     doc['password'] = hashed_password
     
     await db.users.insert_one(doc)
-    access_token = create_access_token(data={"sub": user.id})
+    invalidate_user(user.id)
+    access_token = create_access_token(data=principal_claims(user))
     return Token(access_token=access_token, token_type="bearer", user=user)
 
 @api_router.post("/auth/login", response_model=Token)
 async def login(user_data: UserLogin):
     user_doc = await db.users.find_one({"email": user_data.email}, {"_id": 0})
-    if not user_doc or not verify_password(user_data.password, user_doc['password']):
+    if not user_doc:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if isinstance(user_doc['created_at'], str):
-        user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
+    valid, new_hash = await verify_password(user_data.password, user_doc['password'])
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        await db.users.update_one({"id": user_doc['id']}, {"$set": {"password": new_hash}})
+        invalidate_user(user_doc['id'])
     
     user = User(**{k: v for k, v in user_doc.items() if k != 'password'})
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_access_token(data=principal_claims(user))
     return Token(access_token=access_token, token_type="bearer", user=user)
 
 @api_router.get("/auth/me", response_model=User)
@@ -225,84 +406,218 @@ async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 # Product routes
-@api_router.get("/products", response_model=List[Product])
-async def get_products(category: Optional[str] = None):
-    query = {"category": category} if category else {}
-    products = await db.products.find(query, {"_id": 0}).to_list(1000)
+CATALOG_CACHE_CONTROL = os.environ.get(
+    'CATALOG_CACHE_CONTROL', 'public, max-age=60, stale-while-revalidate=300'
+)
+
+catalog_cache = CatalogCache(
+    None,
+    Product,
+    group_by="category",
+    ttl_seconds=float(os.environ.get('CATALOG_CACHE_TTL', '300')),
+    max_size=int(os.environ.get('CATALOG_CACHE_MAX_SIZE', '50000')),
+    poll_interval=float(os.environ.get('CATALOG_CACHE_POLL_INTERVAL', '30')),
+    # Checkouts must not change catalog ETags or re-encode listing snapshots
+    volatile_fields=("stock",),
+)
+search_index = SearchIndex()
+catalog_cache.add_listener(search_index)
+catalog_conditional_get = Depends(conditional_get(catalog_cache, cache_control=CATALOG_CACHE_CONTROL))
+
+# Default listing pages are served from pre-encoded, precompressed bytes
+CATALOG_SNAPSHOTS = os.environ.get('CATALOG_SNAPSHOTS', 'true').lower() in ('1', 'true', 'yes')
+SNAPSHOT_GZIP_LEVEL = int(os.environ.get('SNAPSHOT_GZIP_LEVEL', '6'))
+SNAPSHOT_BROTLI_QUALITY = int(os.environ.get('SNAPSHOT_BROTLI_QUALITY', '5'))
+product_snapshots = CatalogSnapshots(
+    catalog_cache, encode_products, "created_at", DEFAULT_PAGE_SIZE,
+    gzip_level=SNAPSHOT_GZIP_LEVEL, brotli_quality=SNAPSHOT_BROTLI_QUALITY,
+)
+
+async def serve_snapshot(snapshots: CatalogSnapshots, group: Optional[str], request: Request, response: Response) -> Optional[Response]:
+    snapshot = await snapshots.get(group)
+    if snapshot is None:
+        return None
+    if snapshot.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = snapshot.next_cursor
+    return snapshot_response(snapshot, request.headers.get("accept-encoding"), response)
+
+@api_router.get("/products", response_model=List[Product], dependencies=[catalog_conditional_get])
+async def get_products(
+    request: Request,
+    response: Response,
+    category: Optional[str] = None,
+    sort: str = Query("created_at", pattern="^-?(created_at|price|name|id)$"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    if CATALOG_SNAPSHOTS and product_snapshots.serves(sort, limit, cursor):
+        snapshot = await serve_snapshot(product_snapshots, category, request, response)
+        if snapshot is not None:
+            return snapshot
+    products, next_cursor = await catalog_cache.page(category, sort, limit, cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if FAST_JSON:
+        return fast_response(encode_products(products), response)
     return products
 
-@api_router.get("/products/{product_id}", response_model=Product)
-async def get_product(product_id: str):
-    product = await db.products.find_one({"id": product_id}, {"_id": 0})
+@api_router.get("/products/search", response_model=ProductSearchResult, dependencies=[catalog_conditional_get])
+async def search_products(
+    q: str = "",
+    category: Optional[str] = None,
+    size: Optional[str] = None,
+    color: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    limit: int = Query(24, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+):
+    await catalog_cache.ensure_fresh()
+    if not search_index.available:
+        raise HTTPException(status_code=503, detail="Search index unavailable")
+    hits = search_index.search(q, category, size, color, min_price, max_price, limit, offset)
+    return ProductSearchResult(total=hits.total, items=hits.items, facets=hits.facets)
+
+async def live_stock(request: Request) -> Optional[int]:
+    """Current stock of the product in the path, read once per request."""
+    if not hasattr(request.state, "stock"):
+        doc = await db.products.find_one({"id": request.path_params["product_id"]}, {"_id": 0, "stock": 1})
+        request.state.stock = doc.get("stock") if doc else None
+    return request.state.stock
+
+@api_router.get(
+    "/products/{product_id}", response_model=Product,
+    dependencies=[Depends(conditional_get(catalog_cache, cache_control=CATALOG_CACHE_CONTROL, extra=live_stock))],
+)
+async def get_product(product_id: str, request: Request, response: Response):
+    product = await catalog_cache.get(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    stock = await live_stock(request)
+    if stock is not None and stock != product.stock:
+        product = product.model_copy(update={"stock": stock})
+    if FAST_JSON:
+        return fast_response(encode_product(product), response)
     return product
 
+recommendations = Recommendations(
+    None,
+    snapshot_path=Path(os.environ.get('RECOMMENDATIONS_SNAPSHOT', ROOT_DIR / 'recommendations.npz')),
+    poll_interval=float(os.environ.get('RECOMMENDATIONS_POLL_INTERVAL', '60')),
+    snapshot_interval=float(os.environ.get('RECOMMENDATIONS_SNAPSHOT_INTERVAL', '600')),
+)
+
+@api_router.get("/products/{product_id}/related", response_model=List[Product])
+async def get_related_products(product_id: str, response: Response, limit: int = Query(8, ge=1, le=50)):
+    if not await catalog_cache.get(product_id):
+        raise HTTPException(status_code=404, detail="Product not found")
+    # Over-fetch so products removed from the catalog can be skipped
+    related_ids = recommendations.related(product_id, limit * 2)
+    products = await catalog_cache.get_many(related_ids)
+    related = [products[related_id] for related_id in related_ids if related_id in products][:limit]
+    if FAST_JSON:
+        return fast_response(encode_products(related), response)
+    return related
+
 # Cart routes
+CART_PROJECTION = {"_id": 0}
+
 @api_router.get("/cart", response_model=Cart)
 async def get_cart(current_user: User = Depends(get_current_user)):
-    cart = await db.carts.find_one({"user_id": current_user.id}, {"_id": 0})
-    if not cart:
-        cart = Cart(user_id=current_user.id).model_dump()
-        cart['updated_at'] = cart['updated_at'].isoformat()
-        await db.carts.insert_one(cart)
-    else:
-        if isinstance(cart['updated_at'], str):
-            cart['updated_at'] = datetime.fromisoformat(cart['updated_at'])
+    new_cart = Cart(user_id=current_user.id).model_dump()
+    cart = await db.carts.find_one_and_update(
+        {"user_id": current_user.id},
+        {"$setOnInsert": new_cart},
+        projection=CART_PROJECTION,
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
     return Cart(**cart)
 
+async def upsert_cart(user_id: str, pipeline: List[dict]) -> Cart:
+    try:
+        cart = await db.carts.find_one_and_update(
+            {"user_id": user_id}, pipeline,
+            projection=CART_PROJECTION, upsert=True, return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Lost the race to create this user's cart; it exists now.
+        cart = await db.carts.find_one_and_update(
+            {"user_id": user_id}, pipeline,
+            projection=CART_PROJECTION, return_document=ReturnDocument.AFTER,
+        )
+    return Cart(**cart)
+
+async def priced_operations(operations: List[CartOperation], skip_unknown: bool = False) -> List[dict]:
+    """Validate operations and fill product details for adds from the catalog."""
+    adds = [operation.product_id for operation in operations if operation.op == "add"]
+    products = await catalog_cache.get_many(adds) if adds else {}
+    resolved = []
+    for operation in operations:
+        if operation.op != "remove" and operation.quantity is None:
+            raise HTTPException(status_code=400, detail=f"Operation '{operation.op}' requires a quantity")
+        doc = operation.model_dump()
+        if operation.op == "add":
+            if operation.quantity < 1:
+                raise HTTPException(status_code=400, detail="Item quantity must be positive")
+            product = products.get(operation.product_id)
+            if product is None:
+                if skip_unknown:
+                    continue
+                raise HTTPException(status_code=400, detail=f"Unknown product: {operation.product_id}")
+            doc.update(product_name=product.name, product_price=product.price, product_image=product.image_url)
+        resolved.append(doc)
+    return resolved
+
 @api_router.post("/cart", response_model=Cart)
-async def add_to_cart(item: CartItem, current_user: User = Depends(get_current_user)):
-    cart = await db.carts.find_one({"user_id": current_user.id}, {"_id": 0})
-    
+async def add_to_cart(line: CartLine, current_user: User = Depends(get_current_user)):
+    # Name, price and image come from the catalog; any the client sent are ignored.
+    [operation] = await priced_operations([CartOperation(op="add", **line.model_dump())])
+    operation.pop("op")
+    pipeline = add_item_pipeline(
+        operation,
+        cart_id=str(uuid.uuid4()),
+        updated_at=datetime.now(timezone.utc),
+    )
+    return await upsert_cart(current_user.id, pipeline)
+
+@api_router.post("/cart/batch", response_model=Cart)
+async def batch_update_cart(batch: CartBatch, current_user: User = Depends(get_current_user)):
+    operations = await priced_operations(batch.operations)
+    pipeline = batch_pipeline(operations, cart_id=str(uuid.uuid4()), updated_at=datetime.now(timezone.utc))
+    return await upsert_cart(current_user.id, pipeline)
+
+@api_router.post("/cart/merge", response_model=Cart)
+async def merge_guest_cart(guest: CartMerge, current_user: User = Depends(get_current_user)):
+    """Fold a guest cart into the user's cart; quantities of matching lines add up."""
+    operations = [CartOperation(op="add", **line.model_dump()) for line in guest.items]
+    # Lines for products removed since the guest added them are dropped.
+    operations = await priced_operations(operations, skip_unknown=True)
+    pipeline = batch_pipeline(operations, cart_id=str(uuid.uuid4()), updated_at=datetime.now(timezone.utc))
+    return await upsert_cart(current_user.id, pipeline)
+
+@api_router.put("/cart/{product_id}", response_model=Cart)
+async def set_cart_quantity(product_id: str, size: str, color: str, update: CartQuantityUpdate, current_user: User = Depends(get_current_user)):
+    query = {"user_id": current_user.id}
+    if update.quantity >= 1:
+        query["items"] = {"$elemMatch": line_match(product_id, size, color)}
+    cart = await db.carts.find_one_and_update(
+        query,
+        set_quantity_update(product_id, size, color, update.quantity, datetime.now(timezone.utc)),
+        projection=CART_PROJECTION, return_document=ReturnDocument.AFTER,
+    )
     if not cart:
-        cart = Cart(user_id=current_user.id, items=[item])
-    else:
-        if isinstance(cart['updated_at'], str):
-            cart['updated_at'] = datetime.fromisoformat(cart['updated_at'])
-        cart_obj = Cart(**cart)
-        
-        found = False
-        for existing_item in cart_obj.items:
-            if (existing_item.product_id == item.product_id and 
-                existing_item.size == item.size and 
-                existing_item.color == item.color):
-                existing_item.quantity += item.quantity
-                found = True
-                break
-        
-        if not found:
-            cart_obj.items.append(item)
-        
-        cart = cart_obj
-    
-    cart.updated_at = datetime.now(timezone.utc)
-    doc = cart.model_dump()
-    doc['updated_at'] = doc['updated_at'].isoformat()
-    
-    await db.carts.replace_one({"user_id": current_user.id}, doc, upsert=True)
-    return cart
+        raise HTTPException(status_code=404, detail="Item not in cart")
+    return Cart(**cart)
 
 @api_router.delete("/cart/{product_id}")
 async def remove_from_cart(product_id: str, size: str, color: str, current_user: User = Depends(get_current_user)):
-    cart = await db.carts.find_one({"user_id": current_user.id}, {"_id": 0})
-    if not cart:
+    result = await db.carts.update_one(
+        {"user_id": current_user.id},
+        remove_item_update(product_id, size, color, datetime.now(timezone.utc)),
+    )
+    if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Cart not found")
-    
-    if isinstance(cart['updated_at'], str):
-        cart['updated_at'] = datetime.fromisoformat(cart['updated_at'])
-    cart_obj = Cart(**cart)
-    
-    cart_obj.items = [item for item in cart_obj.items 
-                      if not (item.product_id == product_id and 
-                             item.size == size and 
-                             item.color == color)]
-    
-    cart_obj.updated_at = datetime.now(timezone.utc)
-    doc = cart_obj.model_dump()
-    doc['updated_at'] = doc['updated_at'].isoformat()
-    
-    await db.carts.replace_one({"user_id": current_user.id}, doc)
     return {"message": "Item removed"}
 
 @api_router.delete("/cart")
@@ -311,53 +626,96 @@ async def clear_cart(current_user: User = Depends(get_current_user)):
     return {"message": "Cart cleared"}
 
 # Order routes
+sales_rollups = SalesRollups(None)
+
 @api_router.post("/orders", response_model=Order)
 async def create_order(order_data: OrderCreate, current_user: User = Depends(get_current_user)):
+    if not order_data.items:
+        raise HTTPException(status_code=400, detail="Order has no items")
+    quantities = {}
+    for item in order_data.items:
+        if item.quantity < 1:
+            raise HTTPException(status_code=400, detail="Item quantity must be positive")
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    
+    products = {
+        product['id']: product
+        async for product in db.products.find(
+            {"id": {"$in": list(quantities)}},
+            {"_id": 0, "id": 1, "name": 1, "price": 1, "image_url": 1, "category": 1},
+        )
+    }
+    missing = set(quantities) - set(products)
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Unknown products: {', '.join(sorted(missing))}")
+    
+    # Prices come from the catalog; whatever the client sent is ignored.
+    items = [
+        item.model_copy(update={
+            "product_name": products[item.product_id]['name'],
+            "product_price": products[item.product_id]['price'],
+            "product_image": products[item.product_id]['image_url'],
+            "product_category": products[item.product_id].get('category'),
+        })
+        for item in order_data.items
+    ]
     order = Order(
         user_id=current_user.id,
-        items=order_data.items,
-        total=order_data.total,
+        items=items,
+        total=round(sum(item.product_price * item.quantity for item in items), 2),
         address=order_data.address
     )
     
-    doc = order.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    
-    await db.orders.insert_one(doc)
-    await db.carts.delete_one({"user_id": current_user.id})
+    try:
+        await place_order(client, db, order.model_dump(), quantities)
+    except InsufficientStock as e:
+        raise HTTPException(status_code=409, detail=f"Insufficient stock for {products[e.product_id]['name']}")
+    try:
+        await sales_rollups.record(order.model_dump(), {pid: p.get('category') for pid, p in products.items()})
+    except PyMongoError:
+        logger.exception("Sales rollup update failed for order %s", order.id)
     
     return order
 
 @api_router.get("/orders", response_model=List[Order])
-async def get_orders(current_user: User = Depends(get_current_user)):
-    orders = await db.orders.find({"user_id": current_user.id}, {"_id": 0}).to_list(1000)
-    for order in orders:
-        if isinstance(order['created_at'], str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
+async def get_orders(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+):
+    query = {"user_id": current_user.id, **date_range("created_at", since, until)}
+    orders, next_cursor = await paginate(db.orders, query, "-created_at", limit, cursor, ORDER_PROJECTION)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if FAST_JSON:
+        return fast_response(encode_documents(orders), response)
     return orders
 
 # PayPal routes
+def captured_amount(response: dict) -> Optional[str]:
+    """Amount PayPal actually captured, as "12.34", or None if nothing completed in USD."""
+    captures = response["purchase_units"][0].get("payments", {}).get("captures", [])
+    completed = [capture["amount"] for capture in captures if capture.get("status") == "COMPLETED"]
+    if not completed or any(amount["currency_code"] != "USD" for amount in completed):
+        return None
+    return f"{sum(float(amount['value']) for amount in completed):.2f}"
+
 @api_router.post("/paypal/create-order")
-async def create_paypal_order(request: PayPalOrderRequest):
+async def create_paypal_order(request: PayPalOrderRequest, current_user: User = Depends(get_current_user)):
     if not paypal_client:
         raise HTTPException(status_code=503, detail="PayPal not configured")
-    
-    request_obj = OrdersCreateRequest()
-    request_obj.prefer('return=representation')
-    request_obj.request_body({
-        "intent": "CAPTURE",
-        "purchase_units": [{
-            "reference_id": request.order_id,
-            "amount": {
-                "currency_code": "USD",
-                "value": f"{request.amount:.2f}"
-            }
-        }]
-    })
+    order = await db.orders.find_one({"id": request.order_id, "user_id": current_user.id}, {"_id": 0, "total": 1, "status": 1})
+    if order is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if order["status"] == "completed":
+        raise HTTPException(status_code=409, detail="Order already paid")
     
     try:
-        response = paypal_client.execute(request_obj)
-        return {"id": response.result.id}
+        response = await paypal_client.create_order(request.order_id, order["total"])
+        return {"id": response["id"]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -366,37 +724,161 @@ async def capture_paypal_order(order_id: str, current_user: User = Depends(get_c
     if not paypal_client:
         raise HTTPException(status_code=503, detail="PayPal not configured")
     
-    request_obj = OrdersCaptureRequest(order_id)
-    
     try:
-        response = paypal_client.execute(request_obj)
-        
-        reference_id = response.result.purchase_units[0].reference_id
-        await db.orders.update_one(
-            {"id": reference_id, "user_id": current_user.id},
-            {"$set": {"status": "completed", "paypal_order_id": order_id}}
-        )
-        
-        return {"status": "success", "order_id": reference_id}
+        response = await paypal_client.capture_order(order_id)
+        reference_id = response["purchase_units"][0]["reference_id"]
+        captured = captured_amount(response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    order = await db.orders.find_one({"id": reference_id, "user_id": current_user.id}, {"_id": 0, "total": 1})
+    if order is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if captured != f"{order['total']:.2f}":
+        logger.error("PayPal order %s captured %s for order %s totalling %.2f", order_id, captured, reference_id, order["total"])
+        raise HTTPException(status_code=409, detail="Captured amount does not match the order total")
+    
+    # Only the first capture of an order moves its sales to "completed"
+    previous = await db.orders.find_one_and_update(
+        {"id": reference_id, "user_id": current_user.id, "status": {"$ne": "completed"}},
+        {"$set": {"status": "completed", "paypal_order_id": order_id}},
+        projection=ORDER_ROLLUP_PROJECTION,
+    )
+    if previous is not None:
+        try:
+            products = await catalog_cache.get_many(item["product_id"] for item in previous["items"])
+            await sales_rollups.transition(previous, {pid: p.category for pid, p in products.items()}, "completed")
+        except PyMongoError:
+            logger.exception("Sales rollup update failed for order %s", reference_id)
+    return {"status": "success", "order_id": reference_id}
 
 # Model routes
-@api_router.get("/models", response_model=List[Model])
-async def get_models():
-    models = await db.models.find({}, {"_id": 0}).to_list(1000)
+models_cache = CatalogCache(
+    None,
+    Model,
+    ttl_seconds=float(os.environ.get('CATALOG_CACHE_TTL', '300')),
+    max_size=int(os.environ.get('CATALOG_CACHE_MAX_SIZE', '50000')),
+    poll_interval=float(os.environ.get('CATALOG_CACHE_POLL_INTERVAL', '30')),
+)
+models_conditional_get = Depends(conditional_get(models_cache, cache_control=CATALOG_CACHE_CONTROL))
+model_snapshots = CatalogSnapshots(
+    models_cache, encode_models, "name", DEFAULT_PAGE_SIZE,
+    gzip_level=SNAPSHOT_GZIP_LEVEL, brotli_quality=SNAPSHOT_BROTLI_QUALITY,
+)
+
+@api_router.get("/models", response_model=List[Model], dependencies=[models_conditional_get])
+async def get_models(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    if CATALOG_SNAPSHOTS and model_snapshots.serves("name", limit, cursor):
+        snapshot = await serve_snapshot(model_snapshots, None, request, response)
+        if snapshot is not None:
+            return snapshot
+    models, next_cursor = await models_cache.page(None, "name", limit, cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if FAST_JSON:
+        return fast_response(encode_models(models), response)
     return models
 
-@api_router.get("/models/{model_id}", response_model=Model)
-async def get_model(model_id: str):
-    model = await db.models.find_one({"id": model_id}, {"_id": 0})
+@api_router.get("/models/{model_id}", response_model=Model, dependencies=[models_conditional_get])
+async def get_model(model_id: str, response: Response):
+    model = await models_cache.get(model_id)
     if not model:
         raise HTTPException(status_code=404, detail="Model not found")
+    if FAST_JSON:
+        return fast_response(encode_model(model), response)
     return model
 
+# Image routes
+image_store = ImageStore(
+    Path(os.environ.get('IMAGE_STORE_DIR', ROOT_DIR / 'images')),
+    widths=parse_widths(os.environ.get('IMAGE_WIDTHS', '')) or DEFAULT_WIDTHS,
+    quality=int(os.environ.get('IMAGE_QUALITY', '80')),
+    max_bytes=int(os.environ.get('IMAGE_CACHE_MAX_MB', '1024')) * 1024 * 1024,
+    max_workers=int(os.environ.get('IMAGE_WORKERS', '2')),
+)
+# Variant URLs are content-addressed, so they never change meaning
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@api_router.get("/images/{key}/{width}", include_in_schema=False)
+async def get_image(key: str, width: int, request: Request):
+    fmt = choose_format(request.headers.get("accept"))
+    path = await image_store.variant(key, width, fmt)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(
+        path, media_type=FORMATS[fmt], headers={"Cache-Control": IMAGE_CACHE_CONTROL, "Vary": "Accept"},
+    )
+
+booking_calendar = BookingCalendar(
+    None,
+    opening_hour=int(os.environ.get('BOOKING_OPENING_HOUR', '9')),
+    closing_hour=int(os.environ.get('BOOKING_CLOSING_HOUR', '20')),
+)
+
+# Write-behind inserts for append-only collections, opt-in per collection
+WRITE_BEHIND_COLLECTIONS = [name for name in os.environ.get('WRITE_BEHIND_COLLECTIONS', '').split(',') if name]
+
+async def release_failed_bookings(docs: List[dict]):
+    for doc in docs:
+        await booking_calendar.release(doc["id"])
+
+write_queues: Dict[str, WriteBehindQueue] = {
+    name: WriteBehindQueue(
+        None,
+        max_batch=int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', '500')),
+        flush_interval=float(os.environ.get('WRITE_BEHIND_FLUSH_INTERVAL', '0.2')),
+        max_pending=int(os.environ.get('WRITE_BEHIND_MAX_PENDING', '10000')),
+        on_failure=release_failed_bookings if name == "bookings" else None,
+    )
+    for name in WRITE_BEHIND_COLLECTIONS
+}
+
+async def append_document(collection, doc: dict):
+    """Insert `doc`, through the collection's write-behind queue when it has one."""
+    queue = write_queues.get(collection.name)
+    if queue is None:
+        await collection.insert_one(doc)
+        return
+    try:
+        await queue.put(doc)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Service busy, try again", headers={"Retry-After": "1"})
+
+@api_router.get("/models/{model_id}/slots", response_model=List[DaySlots])
+async def get_model_slots(
+    model_id: str,
+    from_: Optional[date] = Query(None, alias="from"),
+    to: Optional[date] = None,
+    duration: int = Query(1, ge=1, le=24),
+):
+    model = await models_cache.get(model_id)
+    if not model:
+        raise HTTPException(status_code=404, detail="Model not found")
+    start = from_ or datetime.now(timezone.utc).date()
+    end = to or start + timedelta(days=13)
+    try:
+        return await booking_calendar.free_slots(model.id, model.availability, start, end, duration)
+    except InvalidBookingTime as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # Model Booking routes
 @api_router.post("/bookings", response_model=ModelBooking)
 async def create_booking(booking_data: ModelBookingCreate, current_user: User = Depends(get_current_user)):
+    model = await models_cache.get(booking_data.model_id)
+    if not model:
+        raise HTTPException(status_code=404, detail="Model not found")
+    try:
+        booking_date, hour = booking_calendar.parse(booking_data.date, booking_data.time, booking_data.duration)
+    except InvalidBookingTime as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if booking_date.weekday() not in weekdays(model.availability):
+        raise HTTPException(status_code=409, detail="Model is not available on this day")
+    
     booking = ModelBooking(
         user_id=current_user.id,
         model_id=booking_data.model_id,
@@ -407,18 +889,34 @@ async def create_booking(booking_data: ModelBookingCreate, current_user: User =
         budget=booking_data.budget
     )
     
-    doc = booking.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
+    try:
+        await booking_calendar.reserve(model.id, booking.id, booking_date, hour, booking.duration)
+    except SlotUnavailable:
+        raise HTTPException(status_code=409, detail="Time slot already booked")
     
-    await db.bookings.insert_one(doc)
+    doc = booking.model_dump()
+    try:
+        await append_document(db.bookings, doc)
+    except BaseException:
+        await booking_calendar.release(booking.id)
+        raise
     return booking
 
 @api_router.get("/bookings", response_model=List[ModelBooking])
-async def get_bookings(current_user: User = Depends(get_current_user)):
-    bookings = await db.bookings.find({"user_id": current_user.id}, {"_id": 0}).to_list(1000)
-    for booking in bookings:
-        if isinstance(booking['created_at'], str):
-            booking['created_at'] = datetime.fromisoformat(booking['created_at'])
+async def get_bookings(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+):
+    query = {"user_id": current_user.id, **date_range("created_at", since, until)}
+    bookings, next_cursor = await paginate(db.bookings, query, "-created_at", limit, cursor, BOOKING_PROJECTION)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if FAST_JSON:
+        return fast_response(encode_documents(bookings), response)
     return bookings
 
 # Partnership routes
@@ -432,20 +930,124 @@ async def create_partnership(partnership_data: PartnershipCreate):
     )
     
     doc = partnership.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
-    
-    await db.partnerships.insert_one(doc)
+    await append_document(db.partnerships, doc)
     return partnership
 
-app.include_router(api_router)
+# Admin analytics routes
+OrderStatus = Literal["pending", "completed"]
+
+def sales_window(from_: Optional[date], to: Optional[date]):
+    end = to or datetime.now(timezone.utc).date()
+    return from_ or end - timedelta(days=29), end
+
+@api_router.get("/admin/analytics/daily", response_model=List[SalesDay])
+async def get_daily_sales(
+    from_: Optional[date] = Query(None, alias="from"),
+    to: Optional[date] = None,
+    status: OrderStatus = "completed",
+    product_id: Optional[str] = None,
+    category: Optional[str] = None,
+    admin: User = Depends(get_admin_user),
+):
+    if product_id and category:
+        raise HTTPException(status_code=400, detail="Filter by product_id or category, not both")
+    dimension, key = ("product", product_id) if product_id else ("category", category) if category else ("total", "all")
+    try:
+        return await sales_rollups.daily(*sales_window(from_, to), status, dimension, key)
+    except InvalidRange as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/admin/analytics/products", response_model=List[SalesRanking])
+async def get_product_sales(
+    from_: Optional[date] = Query(None, alias="from"),
+    to: Optional[date] = None,
+    status: OrderStatus = "completed",
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    admin: User = Depends(get_admin_user),
+):
+    try:
+        return await sales_rollups.ranking("product", *sales_window(from_, to), status, limit)
+    except InvalidRange as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/admin/analytics/categories", response_model=List[SalesRanking])
+async def get_category_sales(
+    from_: Optional[date] = Query(None, alias="from"),
+    to: Optional[date] = None,
+    status: OrderStatus = "completed",
+    admin: User = Depends(get_admin_user),
+):
+    try:
+        return await sales_rollups.ranking("category", *sales_window(from_, to), status)
+    except InvalidRange as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Admin export routes
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+ExportFormat = Literal["ndjson", "csv"]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
+def export_response(collection, name: str, fmt: str, query: dict, projection: dict, columns, rows) -> StreamingResponse:
+    cursor = collection.find(query, projection).sort([("created_at", 1), ("id", 1)]).batch_size(EXPORT_BATCH_SIZE)
+    body = ndjson_stream(cursor) if fmt == "ndjson" else csv_stream(cursor, columns, rows)
+    filename = f"{name}-{datetime.now(timezone.utc):%Y%m%d%H%M%S}.{fmt}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"},
+    )
+
+@api_router.get("/admin/exports/orders")
+async def export_orders(
+    format: ExportFormat = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    status: Optional[str] = None,
+    admin: User = Depends(get_admin_user),
+):
+    query = {**date_range("created_at", since, until), **({"status": status} if status else {})}
+    return export_response(db.orders, "orders", format, query, ORDER_PROJECTION, ORDER_CSV_COLUMNS, order_rows)
+
+@api_router.get("/admin/exports/bookings")
+async def export_bookings(
+    format: ExportFormat = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    status: Optional[str] = None,
+    admin: User = Depends(get_admin_user),
+):
+    query = {**date_range("created_at", since, until), **({"status": status} if status else {})}
+    return export_response(db.bookings, "bookings", format, query, BOOKING_PROJECTION, BOOKING_CSV_COLUMNS, booking_rows)
+
+async def invalid_cursor_handler(request, exc: InvalidCursor):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+DEFAULT_RATE_LIMITS = (
+    "POST /api/auth/login ip 20/60;"
+    "POST /api/auth/login email 5/60;"
+    "POST /api/auth/register ip 5/60:10;"
+    "POST /api/paypal/create-order user 10/60;"
+    "POST /api/paypal/capture-order/{order_id} user 10/60;"
+    "POST /api/orders user 10/60"
 )
+RATE_LIMITS_ENABLED = os.environ.get('RATE_LIMITS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Must be true behind a reverse proxy or ingress: otherwise "ip" limits see the
+# proxy's address and every client shares one bucket (login: 20/min in total).
+# Leave it false when clients connect directly, as they could forge the header.
+TRUST_FORWARDED_FOR = os.environ.get('TRUST_FORWARDED_FOR', 'false').lower() in ('1', 'true', 'yes')
+
+def token_subject(token: str) -> Optional[str]:
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except jwt.InvalidTokenError:
+        return None
+
+if os.environ.get('RATE_LIMIT_BACKEND', 'memory') == 'mongo':
+    rate_limit_buckets = MongoBuckets(None)
+else:
+    rate_limit_buckets = MemoryBuckets(max_keys=int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000')))
+
+async def metrics():
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
 
 logging.basicConfig(
     level=logging.INFO,
@@ -453,6 +1055,141 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+# App factory and lifespan
+WARMUP_CONNECTIONS = int(os.environ.get('WARMUP_CONNECTIONS', os.environ.get('MONGO_MIN_POOL_SIZE') or '2'))
+
+def bind_database(mongo_client, database):
+    """Point the API and every Mongo-backed component at `database`."""
+    global client, db
+    client, db = mongo_client, database
+    catalog_cache.collection = database.products
+    models_cache.collection = database.models
+    booking_calendar.collection = database.booking_slots
+    sales_rollups.collection = database.sales_daily
+    recommendations.orders = database.orders
+    for name, queue in write_queues.items():
+        queue.collection = database[name]
+    if isinstance(rate_limit_buckets, MongoBuckets):
+        rate_limit_buckets.collection = database.rate_limits
+
+def load_paypal_client():
+    # Imported here so workers without PayPal never load the HTTP client stack
+    from paypal_gateway import create_paypal_client
+    return create_paypal_client(os.environ)
+
+async def open_connections(mongo_client, count: int):
+    # Concurrent pings each need their own socket, so the pool ends up with `count` open connections
+    await asyncio.gather(*(mongo_client.admin.command("ping") for _ in range(max(1, count))))
+
+async def warm_up(mongo_client, timings: Dict[str, float]):
+    async def step(name, coroutine):
+        started = time.perf_counter()
+        try:
+            await coroutine
+        except PyMongoError:
+            logger.exception("Warm-up step %s failed", name)
+        timings[name] = time.perf_counter() - started
+
+    await step("mongo", open_connections(mongo_client, WARMUP_CONNECTIONS))
+    await step("indexes", ensure_indexes(db))
+    await step("catalog", asyncio.gather(catalog_cache.start(), models_cache.start()))
+    await step("hasher", password_hasher.warm_up())
+    await step("recommendations", recommendations.start())
+    for queue in write_queues.values():
+        await queue.start()
+    if CATALOG_SNAPSHOTS:
+        await step("snapshots", asyncio.gather(product_snapshots.warm(), model_snapshots.warm()))
+
+async def shut_down(owned_client: Optional[AsyncIOMotorClient]):
+    """Release every resource; a failing step is logged and the rest still run."""
+    # Flush buffered inserts first, while Mongo is still reachable
+    steps = [(f"write queue {name}", queue.stop) for name, queue in write_queues.items()]
+    steps += [
+        ("catalog", catalog_cache.stop),
+        ("models", models_cache.stop),
+        ("recommendations", recommendations.stop),
+        ("hasher", password_hasher.shutdown),
+        ("images", image_store.close),
+    ]
+    if paypal_client:
+        steps.append(("paypal", paypal_client.aclose))
+    if owned_client is not None:
+        steps.append(("mongo", owned_client.close))
+    for name, action in steps:
+        try:
+            result = action()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception:
+            logger.exception("Shutdown step %s failed", name)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the process-wide resources; the worker takes traffic once warm-up is done."""
+    global password_hasher, paypal_client
+    started = time.perf_counter()
+    owns_client = app.state.mongo_client is None
+    mongo_client = create_mongo_client() if owns_client else app.state.mongo_client
+    bind_database(mongo_client, mongo_client[app.state.db_name or os.environ['DB_NAME']])
+    password_hasher = create_password_hasher()
+    paypal_client = load_paypal_client()
+
+    timings: Dict[str, float] = {}
+    await warm_up(mongo_client, timings)
+    timings["startup"] = time.perf_counter() - started
+    for phase, seconds in {"import": IMPORT_SECONDS, **timings}.items():
+        APP_STARTUP_SECONDS.set(seconds, phase)
+    logger.info(
+        "Worker ready in %.0fms (import %.0fms; %s)",
+        (IMPORT_SECONDS + timings["startup"]) * 1000,
+        IMPORT_SECONDS * 1000,
+        ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in timings.items() if phase != "startup"),
+    )
+    try:
+        yield
+    finally:
+        await shut_down(mongo_client if owns_client else None)
+
+def create_app(mongo_client: Optional[AsyncIOMotorClient] = None, db_name: Optional[str] = None) -> FastAPI:
+    """Build the API application.
+
+    Without `mongo_client` the lifespan connects using MONGO_URL and the pool
+    options above; a given client (tests, load tests) is used as is and left
+    open. Handlers share module-level state, so run one app per process.
+    """
+    app = FastAPI(lifespan=lifespan)
+    app.state.mongo_client = mongo_client
+    app.state.db_name = db_name
+    app.include_router(api_router)
+    app.add_exception_handler(InvalidCursor, invalid_cursor_handler)
+    app.add_api_route("/metrics", metrics, include_in_schema=False)
+
+    # Rate limiting, inside CORS so 429s still carry CORS headers
+    if RATE_LIMITS_ENABLED:
+        app.add_middleware(
+            RateLimitMiddleware,
+            rules=parse_rules(os.environ.get('RATE_LIMITS', DEFAULT_RATE_LIMITS)),
+            buckets=rate_limit_buckets,
+            identify_user=token_subject,
+            trust_forwarded=TRUST_FORWARDED_FOR,
+        )
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER],
+    )
+
+    # Metrics
+    app.add_middleware(
+        MetricsMiddleware,
+        slow_request_ms=float(os.environ.get('SLOW_REQUEST_MS', '0')),
+        slow_sample_rate=float(os.environ.get('SLOW_REQUEST_SAMPLE_RATE', '1.0')),
+    )
+    return app
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+app = create_app()
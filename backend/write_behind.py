@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+WRITE_BEHIND_PENDING = Gauge(
+    "write_behind_pending_documents", "Documents buffered for a batched insert.", ("collection",),
+)
+WRITE_BEHIND_DROPPED = Counter(
+    "write_behind_dropped_documents_total", "Buffered documents the database rejected.", ("collection",),
+)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class WriteBehindQueue:
+    """Buffers inserts for an append-only collection and writes them with insert_many.
+
+    A batch is flushed when `max_batch` documents are waiting or
+    `flush_interval` seconds after the first one arrived. At most
+    `max_pending` documents are held; `put` then waits up to `put_timeout`
+    for room and raises QueueFull. Batches that fail for transient reasons
+    stay queued and are retried; documents the server rejects are passed to
+    `on_failure`. Duplicate keys from a retried batch count as written.
+    """
+
+    def __init__(
+        self,
+        collection,
+        max_batch: int = 500,
+        flush_interval: float = 0.2,
+        max_pending: int = 10000,
+        put_timeout: float = 1.0,
+        retry_delay: float = 1.0,
+        on_failure: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+    ):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.retry_delay = retry_delay
+        self.on_failure = on_failure
+        self._buffer: List[dict] = []
+        self._in_flight = 0
+        self._has_work = asyncio.Event()
+        self._batch_ready = asyncio.Event()
+        self._has_room = asyncio.Condition()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer) + self._in_flight
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background flusher and write everything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        attempts = 0
+        while self._buffer and attempts < 3:
+            if not await self.flush():
+                attempts += 1
+                await asyncio.sleep(self.retry_delay)
+        if self._buffer:
+            logger.error("Dropping %d unwritten %s documents on shutdown", len(self._buffer), self.collection.name)
+
+    async def put(self, doc: dict):
+        if self.pending >= self.max_pending:
+            async with self._has_room:
+                try:
+                    await asyncio.wait_for(
+                        self._has_room.wait_for(lambda: self.pending < self.max_pending), self.put_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    raise QueueFull(self.collection.name)
+        self._buffer.append(doc)
+        WRITE_BEHIND_PENDING.inc(self.collection.name)
+        self._has_work.set()
+        if len(self._buffer) >= self.max_batch:
+            self._batch_ready.set()
+
+    async def flush(self) -> bool:
+        """Write every buffered document; returns False if a batch must be retried."""
+        async with self._flush_lock:
+            while self._buffer:
+                batch = self._buffer[:self.max_batch]
+                del self._buffer[:len(batch)]
+                self._in_flight = len(batch)
+                try:
+                    await self._insert(batch)
+                except PyMongoError:
+                    logger.exception("Batched insert into %s failed, retrying %d documents", self.collection.name, len(batch))
+                    self._buffer[:0] = batch
+                    return False
+                except BaseException:
+                    # Cancelled mid-write: keep the batch, a retry is deduplicated by _id
+                    self._buffer[:0] = batch
+                    raise
+                finally:
+                    self._in_flight = 0
+                WRITE_BEHIND_PENDING.dec(self.collection.name, amount=len(batch))
+                async with self._has_room:
+                    self._has_room.notify_all()
+            return True
+
+    async def _insert(self, batch: List[dict]):
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+        except BulkWriteError as exc:
+            errors = [error for error in exc.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY]
+            if errors:
+                rejected = [batch[error["index"]] for error in errors]
+                WRITE_BEHIND_DROPPED.inc(self.collection.name, amount=len(rejected))
+                logger.error("%s rejected %d buffered documents: %s", self.collection.name, len(rejected), errors[0].get("errmsg"))
+                if self.on_failure is not None:
+                    await self.on_failure(rejected)
+
+    async def _run(self):
+        while True:
+            await self._has_work.wait()
+            if len(self._buffer) < self.max_batch:
+                # Give the batch a chance to fill before writing it
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._has_work.clear()
+            self._batch_ready.clear()
+            if not await self.flush():
+                await asyncio.sleep(self.retry_delay)
+            if self._buffer:
+                self._has_work.set()
@@ -0,0 +1,13 @@
+import { axiosInstance } from '../App';
+
+// List endpoints return one page at a time and an X-Next-Cursor header while more remain
+export const fetchAllPages = async (url, params = {}) => {
+  const items = [];
+  let cursor;
+  do {
+    const response = await axiosInstance.get(url, { params: cursor ? { ...params, cursor } : params });
+    items.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return items;
+};
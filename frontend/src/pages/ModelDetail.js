@@ -77,6 +77,8 @@ const ModelDetail = () => {
             <div className="glassmorphism rounded-3xl overflow-hidden aspect-[3/4]" data-testid="model-main-image">
               <img
                 src={model.portfolio_images[0]}
+                srcSet={model.portfolio_srcsets?.[0] || undefined}
+                sizes="(min-width: 1024px) 50vw, 100vw"
                 alt={model.name}
                 className="w-full h-full object-cover"
               />
@@ -84,7 +86,14 @@ const ModelDetail = () => {
             <div className="grid grid-cols-3 gap-4">
               {model.portfolio_images.slice(1).map((img, index) => (
                 <div key={index} className="glassmorphism rounded-xl overflow-hidden aspect-square" data-testid={`portfolio-image-${index}`}>
-                  <img src={img} alt={`Portfolio ${index + 1}`} className="w-full h-full object-cover" />
+                  <img
+                    src={img}
+                    srcSet={model.portfolio_srcsets?.[index + 1] || undefined}
+                    sizes="(min-width: 1024px) 16vw, 33vw"
+                    loading="lazy"
+                    alt={`Portfolio ${index + 1}`}
+                    className="w-full h-full object-cover"
+                  />
                 </div>
               ))}
             </div>
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { axiosInstance } from '../App';
+import { fetchAllPages } from '../lib/pagination';
 import { Link } from 'react-router-dom';
 import { Calendar, DollarSign } from 'lucide-react';
 import { toast } from 'sonner';
@@ -14,8 +14,7 @@ const Models = () => {
 
   const loadModels = async () => {
     try {
-      const response = await axiosInstance.get('/models');
-      setModels(response.data);
+      setModels(await fetchAllPages('/models'));
     } catch (error) {
       toast.error('Erro ao carregar modelos');
     } finally {
@@ -45,6 +44,9 @@ const Models = () => {
                   <div className="aspect-[3/4] overflow-hidden">
                     <img
                       src={model.portfolio_images[0]}
+                      srcSet={model.portfolio_srcsets?.[0] || undefined}
+                      sizes="(min-width: 1024px) 25vw, (min-width: 768px) 50vw, 100vw"
+                      loading="lazy"
                       alt={model.name}
                       className="w-full h-full object-cover hover:scale-110 transition duration-500"
                       data-testid={`model-image-${model.id}`}
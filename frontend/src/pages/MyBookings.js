@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { axiosInstance } from '../App';
+import { fetchAllPages } from '../lib/pagination';
 import { Calendar, Clock, CheckCircle, XCircle } from 'lucide-react';
 import { toast } from 'sonner';
 
@@ -13,8 +13,7 @@ const MyBookings = () => {
 
   const loadBookings = async () => {
     try {
-      const response = await axiosInstance.get('/bookings');
-      setBookings(response.data);
+      setBookings(await fetchAllPages('/bookings'));
     } catch (error) {
       toast.error('Erro ao carregar reservas');
     } finally {
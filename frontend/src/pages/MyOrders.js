@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { axiosInstance } from '../App';
+import { fetchAllPages } from '../lib/pagination';
 import { Package, CheckCircle, Clock, Truck } from 'lucide-react';
 import { toast } from 'sonner';
 
@@ -13,8 +13,7 @@ const MyOrders = () => {
 
   const loadOrders = async () => {
     try {
-      const response = await axiosInstance.get('/orders');
-      setOrders(response.data);
+      setOrders(await fetchAllPages('/orders'));
     } catch (error) {
       toast.error('Erro ao carregar pedidos');
     } finally {
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { useParams, useNavigate } from 'react-router-dom';
+import { Link, useParams, useNavigate } from 'react-router-dom';
 import { axiosInstance } from '../App';
 import { ShoppingCart, Heart, Truck, Shield } from 'lucide-react';
 import { toast } from 'sonner';
@@ -12,9 +12,11 @@ const ProductDetail = ({ user }) => {
   const [selectedSize, setSelectedSize] = useState('');
   const [selectedColor, setSelectedColor] = useState('');
   const [quantity, setQuantity] = useState(1);
+  const [related, setRelated] = useState([]);
 
   useEffect(() => {
     loadProduct();
+    loadRelated();
   }, [id]);
 
   const loadProduct = async () => {
@@ -30,6 +32,15 @@ const ProductDetail = ({ user }) => {
     }
   };
 
+  const loadRelated = async () => {
+    try {
+      const response = await axiosInstance.get(`/products/${id}/related`, { params: { limit: 4 } });
+      setRelated(response.data);
+    } catch (error) {
+      setRelated([]);
+    }
+  };
+
   const handleAddToCart = async () => {
     if (!user) {
       toast.error('Faça login para adicionar ao carrinho');
@@ -68,6 +79,8 @@ const ProductDetail = ({ user }) => {
           <div className="glassmorphism rounded-3xl overflow-hidden" data-testid="product-image-container">
             <img
               src={product.image_url}
+              srcSet={product.image_srcset || undefined}
+              sizes="(min-width: 768px) 50vw, 100vw"
               alt={product.name}
               className="w-full h-full object-cover"
               data-testid="product-detail-image"
@@ -172,6 +185,34 @@ const ProductDetail = ({ user }) => {
             </div>
           </div>
         </div>
+
+        {related.length > 0 && (
+          <div className="mt-16" data-testid="related-products">
+            <h2 className="text-2xl font-bold text-gray-800 mb-6">Compre Junto</h2>
+            <div className="grid grid-cols-2 lg:grid-cols-4 gap-6">
+              {related.map((item) => (
+                <Link key={item.id} to={`/product/${item.id}`} data-testid={`related-product-${item.id}`}>
+                  <div className="product-card glassmorphism rounded-2xl overflow-hidden">
+                    <div className="aspect-[3/4] overflow-hidden">
+                      <img
+                        src={item.image_url}
+                        srcSet={item.image_srcset || undefined}
+                        sizes="(min-width: 1024px) 25vw, 50vw"
+                        loading="lazy"
+                        alt={item.name}
+                        className="w-full h-full object-cover hover:scale-110 transition duration-500"
+                      />
+                    </div>
+                    <div className="p-4">
+                      <h3 className="font-semibold text-gray-800 mb-1">{item.name}</h3>
+                      <p className="text-xl font-bold text-pink-600">R$ {item.price.toFixed(2)}</p>
+                    </div>
+                  </div>
+                </Link>
+              ))}
+            </div>
+          </div>
+        )}
       </div>
     </div>
   );
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { axiosInstance } from '../App';
+import { fetchAllPages } from '../lib/pagination';
 import { Link } from 'react-router-dom';
 import { Filter } from 'lucide-react';
 import { toast } from 'sonner';
@@ -27,9 +27,8 @@ const Shop = () => {
   const loadProducts = async () => {
     try {
       setLoading(true);
-      const url = selectedCategory === 'all' ? '/products' : `/products?category=${selectedCategory}`;
-      const response = await axiosInstance.get(url);
-      setProducts(response.data);
+      const params = selectedCategory === 'all' ? {} : { category: selectedCategory };
+      setProducts(await fetchAllPages('/products', params));
     } catch (error) {
       toast.error('Erro ao carregar produtos');
     } finally {
@@ -75,6 +74,9 @@ const Shop = () => {
                   <div className="aspect-[3/4] overflow-hidden">
                     <img
                       src={product.image_url}
+                      srcSet={product.image_srcset || undefined}
+                      sizes="(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw"
+                      loading="lazy"
                       alt={product.name}
                       className="w-full h-full object-cover hover:scale-110 transition duration-500"
                       data-testid={`product-image-${product.id}`}
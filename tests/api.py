@@ -0,0 +1,27 @@
+import contextlib
+
+import httpx
+
+import server
+
+
+@contextlib.asynccontextmanager
+async def running_api(mongo_client, db_name: str = "test"):
+    """Start the app with its lifespan on `mongo_client` and yield an HTTP client for it."""
+    app = server.create_app(mongo_client=mongo_client, db_name=db_name)
+    server.recommendations.snapshot_path = None
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            yield http
+
+
+async def sign_in(email: str = "user@example.com", name: str = "User") -> server.User:
+    """Insert a user into the bound database and return it."""
+    user = server.User(email=email, name=name)
+    await server.db.users.insert_one(user.model_dump())
+    return user
+
+
+def auth_headers(user: server.User) -> dict:
+    return {"Authorization": f"Bearer {server.create_access_token({'sub': user.id})}"}
@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+# The backend is a flat set of modules rather than a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+os.environ.setdefault("RATE_LIMITS_ENABLED", "false")
+os.environ.setdefault("PAYPAL_BACKEND", "fake")
@@ -0,0 +1,87 @@
+import asyncio
+from datetime import date
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from availability import BookingCalendar, InvalidBookingTime, SlotUnavailable, weekdays
+from tests.api import auth_headers, running_api, sign_in
+
+# A Monday
+MONDAY = date(2026, 3, 2)
+
+
+def calendar() -> BookingCalendar:
+    return BookingCalendar(AsyncMongoMockClient()["test"]["booking_slots"], opening_hour=9, closing_hour=18)
+
+
+def test_weekday_names_are_matched_loosely():
+    assert weekdays(["Segunda", "terca", "Quarta-feira", "SÁBADO", "Feriado"]) == {0, 1, 2, 5}
+
+
+@pytest.mark.parametrize("day, time, duration", [
+    ("02/03/2026", "10:00", 1),
+    ("2026-03-02", "10:30", 1),
+    ("2026-03-02", "10:00", 0),
+    ("2026-03-02", "08:00", 2),
+    ("2026-03-02", "17:00", 2),
+])
+def test_invalid_booking_times_are_rejected(day, time, duration):
+    with pytest.raises(InvalidBookingTime):
+        calendar().parse(day, time, duration)
+
+
+def test_parse_accepts_booking_ending_at_closing():
+    assert calendar().parse("2026-03-02", "16:00", 2) == (MONDAY, 16)
+
+
+def test_overlapping_reservation_is_refused_and_claims_nothing():
+    async def test():
+        booking_calendar = calendar()
+        await booking_calendar.reserve("m1", "b1", MONDAY, 10, 3)
+        with pytest.raises(SlotUnavailable):
+            await booking_calendar.reserve("m1", "b2", MONDAY, 12, 2)
+        assert not await booking_calendar.has_claims("b2")
+
+        # Adjacent hours, another model or another day are all free
+        await booking_calendar.reserve("m1", "b3", MONDAY, 13, 2)
+        await booking_calendar.reserve("m2", "b4", MONDAY, 10, 3)
+        await booking_calendar.reserve("m1", "b5", date(2026, 3, 3), 10, 3)
+
+    asyncio.run(test())
+
+
+def test_free_slots_skip_busy_hours_and_closed_days():
+    async def test():
+        booking_calendar = calendar()
+        await booking_calendar.reserve("m1", "b1", MONDAY, 11, 2)
+        days = await booking_calendar.free_slots("m1", ["Segunda", "Quarta"], MONDAY, date(2026, 3, 4), 2)
+        assert [(day["date"], day["weekday"]) for day in days] == [("2026-03-02", "Segunda"), ("2026-03-04", "Quarta")]
+        assert days[0]["slots"] == ["09:00", "13:00", "14:00", "15:00", "16:00"]
+        assert days[1]["slots"] == [f"{hour:02d}:00" for hour in range(9, 17)]
+
+        await booking_calendar.release("b1")
+        days = await booking_calendar.free_slots("m1", ["Segunda"], MONDAY, MONDAY, 2)
+        assert "11:00" in days[0]["slots"]
+
+    asyncio.run(test())
+
+
+def test_overlapping_booking_gets_409():
+    async def test():
+        client = AsyncMongoMockClient()
+        await client["test"].models.insert_one(server.Model(
+            id="m1", name="Ana", bio="", hourly_rate=100, portfolio_images=[], availability=["Segunda"],
+        ).model_dump())
+        async with running_api(client) as http:
+            headers = auth_headers(await sign_in())
+            booking = {"model_id": "m1", "date": "2026-03-02", "time": "10:00", "duration": 3, "message": "", "budget": 300}
+            assert (await http.post("/api/bookings", json=booking, headers=headers)).status_code == 200
+            overlap = await http.post("/api/bookings", json={**booking, "time": "12:00"}, headers=headers)
+            assert overlap.status_code == 409
+            closed = await http.post("/api/bookings", json={**booking, "date": "2026-03-03"}, headers=headers)
+            assert closed.status_code == 409
+            assert await server.db.bookings.count_documents({}) == 1
+
+    asyncio.run(test())
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient, AsyncMongoMockCollection
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+
+import server
+from tests.api import auth_headers, running_api, sign_in
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+PARALLEL_REQUESTS = 25
+
+
+async def mongo_available() -> bool:
+    client = AsyncIOMotorClient(MONGO_URL, serverSelectionTimeoutMS=1000)
+    try:
+        await client.admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        client.close()
+
+
+def yield_on_round_trips(monkeypatch):
+    """Make every mongomock call suspend first, as a real driver does.
+
+    mongomock-motor runs each call synchronously, so without this concurrent
+    requests would never interleave and a read-modify-write would look atomic.
+    """
+    for name in ("find_one", "find_one_and_update", "update_one", "insert_one", "delete_one"):
+        method = getattr(AsyncMongoMockCollection, name)
+
+        async def suspending(self, *args, _method=method, **kwargs):
+            await asyncio.sleep(0)
+            return await _method(self, *args, **kwargs)
+
+        monkeypatch.setattr(AsyncMongoMockCollection, name, suspending)
+
+
+@pytest.fixture(params=["mongomock", "mongod"])
+def make_client(request, monkeypatch):
+    if request.param == "mongomock":
+        yield_on_round_trips(monkeypatch)
+        return AsyncMongoMockClient
+    if not asyncio.run(mongo_available()):
+        pytest.skip(f"no mongod reachable at {MONGO_URL}")
+    return lambda: AsyncIOMotorClient(MONGO_URL, tz_aware=True)
+
+
+def run_with_api(make_client, test):
+    """Run `test(http, headers)` against the app on a scratch database with one product and one user."""
+    async def run():
+        client = make_client()
+        db_name = f"cart_test_{uuid.uuid4().hex[:8]}"
+        await client[db_name].products.insert_one(server.Product(
+            id="p1", name="Vestido", description="Midi", price=99.9, category="vestidos",
+            sizes=["M"], colors=["Rosa"], image_url="https://img/p1",
+        ).model_dump())
+        try:
+            async with running_api(client, db_name) as http:
+                await test(http, auth_headers(await sign_in()))
+        finally:
+            await client.drop_database(db_name)
+            client.close()
+
+    asyncio.run(run())
+
+
+def cart_line(**overrides) -> dict:
+    return {"product_id": "p1", "size": "M", "color": "Rosa", "quantity": 1, **overrides}
+
+
+def test_parallel_adds_of_same_line_sum_up(make_client):
+    async def test(http, headers):
+        responses = await asyncio.gather(*(
+            http.post("/api/cart", json=cart_line(), headers=headers) for _ in range(PARALLEL_REQUESTS)
+        ))
+        assert all(response.status_code == 200 for response in responses)
+        cart = (await http.get("/api/cart", headers=headers)).json()
+        assert [(line["product_id"], line["quantity"]) for line in cart["items"]] == [("p1", PARALLEL_REQUESTS)]
+        assert await server.db.carts.count_documents({}) == 1
+
+    run_with_api(make_client, test)
+
+
+def test_parallel_adds_of_different_lines_are_all_kept(make_client):
+    colors = [f"Cor {index}" for index in range(PARALLEL_REQUESTS)]
+
+    async def test(http, headers):
+        await asyncio.gather(*(http.post("/api/cart", json=cart_line(color=color), headers=headers) for color in colors))
+        cart = (await http.get("/api/cart", headers=headers)).json()
+        assert sorted(line["color"] for line in cart["items"]) == sorted(colors)
+
+    run_with_api(make_client, test)
+
+
+def test_field_path_values_are_stored_literally(make_client):
+    async def test(http, headers):
+        await http.post("/api/cart", json=cart_line(color="$size"), headers=headers)
+        cart = (await http.post("/api/cart", json=cart_line(color="$size"), headers=headers)).json()
+        assert [(line["color"], line["quantity"]) for line in cart["items"]] == [("$size", 2)]
+
+    run_with_api(make_client, test)
+
+
+def test_set_quantity_zero_removes_line(make_client):
+    async def test(http, headers):
+        await http.post("/api/cart", json=cart_line(quantity=3), headers=headers)
+        params = {"size": "M", "color": "Rosa"}
+        cart = (await http.put("/api/cart/p1", params=params, json={"quantity": 5}, headers=headers)).json()
+        assert cart["items"][0]["quantity"] == 5
+        missing = await http.put("/api/cart/p1", params={**params, "color": "Azul"}, json={"quantity": 5}, headers=headers)
+        assert missing.status_code == 404
+        cart = (await http.put("/api/cart/p1", params=params, json={"quantity": 0}, headers=headers)).json()
+        assert cart["items"] == []
+
+    run_with_api(make_client, test)
+
+
+def test_get_cart_creates_once(make_client):
+    async def test(http, headers):
+        carts = await asyncio.gather(*(http.get("/api/cart", headers=headers) for _ in range(5)))
+        assert len({cart.json()["id"] for cart in carts}) == 1
+        assert await server.db.carts.count_documents({}) == 1
+
+    run_with_api(make_client, test)
@@ -0,0 +1,97 @@
+from datetime import datetime, timezone
+
+import mongomock
+import pytest
+
+from cart_ops import add_item_pipeline, batch_pipeline, remove_item_update, set_quantity_update
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def line(product_id="p1", size="M", color="Rosa", quantity=1, price=99.9) -> dict:
+    return {
+        "product_id": product_id, "size": size, "color": color, "quantity": quantity,
+        "product_name": f"Produto {product_id}", "product_price": price, "product_image": f"https://img/{product_id}",
+    }
+
+
+def apply(cart, update, upsert=False) -> dict:
+    """Run `update` against `cart` (None for no cart yet) and return the stored cart."""
+    carts = mongomock.MongoClient().db.carts
+    if cart is not None:
+        carts.insert_one(cart)
+    carts.update_one({"user_id": "u1"}, update, upsert=upsert)
+    return carts.find_one({"user_id": "u1"}, {"_id": 0})
+
+
+def cart(*items) -> dict:
+    return {"id": "c1", "user_id": "u1", "items": list(items), "updated_at": NOW}
+
+
+def test_add_creates_missing_cart():
+    stored = apply(None, add_item_pipeline(line(quantity=2), cart_id="new", updated_at=NOW), upsert=True)
+    assert stored["id"] == "new"
+    assert stored["items"] == [line(quantity=2)]
+
+
+def test_add_increments_matching_line_in_place():
+    existing = cart(line("p1"), line("p2", quantity=3), line("p3"))
+    stored = apply(existing, add_item_pipeline(line("p2", quantity=2, price=1.0), cart_id="new", updated_at=NOW))
+    assert stored["id"] == "c1"
+    # The line keeps its position and the price it was added at
+    assert stored["items"] == [line("p1"), line("p2", quantity=5), line("p3")]
+
+
+def test_add_appends_other_size_or_color():
+    existing = cart(line(size="M", color="Rosa"))
+    stored = apply(existing, add_item_pipeline(line(size="M", color="Azul"), cart_id="new", updated_at=NOW))
+    stored = apply(stored, add_item_pipeline(line(size="G", color="Rosa"), cart_id="new", updated_at=NOW))
+    assert [(item["size"], item["color"]) for item in stored["items"]] == [("M", "Rosa"), ("M", "Azul"), ("G", "Rosa")]
+
+
+def test_field_path_values_are_stored_and_matched_literally():
+    item = line(product_id="$items", color="$$ROOT")
+    stored = apply(cart(), add_item_pipeline(item, cart_id="new", updated_at=NOW))
+    assert stored["items"] == [item]
+    stored = apply(stored, add_item_pipeline(item, cart_id="new", updated_at=NOW))
+    assert [(entry["product_id"], entry["color"], entry["quantity"]) for entry in stored["items"]] == [("$items", "$$ROOT", 2)]
+
+
+def test_set_quantity_changes_only_matching_line():
+    existing = cart(line("p1"), line("p1", color="Azul"))
+    stored = apply(existing, set_quantity_update("p1", "M", "Azul", 4, NOW))
+    assert [entry["quantity"] for entry in stored["items"]] == [1, 4]
+    assert stored["items"][1] == line("p1", color="Azul", quantity=4)
+
+
+@pytest.mark.parametrize("quantity", [0, -1])
+def test_set_quantity_below_one_removes_line(quantity):
+    existing = cart(line("p1"), line("p2"))
+    stored = apply(existing, set_quantity_update("p1", "M", "Rosa", quantity, NOW))
+    assert stored["items"] == [line("p2")]
+
+
+def test_remove_leaves_other_lines():
+    existing = cart(line("p1"), line("p1", size="G"))
+    stored = apply(existing, remove_item_update("p1", "M", "Rosa", NOW))
+    assert stored["items"] == [line("p1", size="G")]
+
+
+def test_batch_applies_operations_in_order():
+    existing = cart(line("p1", quantity=2), line("p2"))
+    operations = [
+        {"op": "add", **line("p3")},
+        {"op": "add", **line("p1", quantity=3)},
+        {"op": "set", "product_id": "p3", "size": "M", "color": "Rosa", "quantity": 5},
+        {"op": "remove", "product_id": "p2", "size": "M", "color": "Rosa"},
+        {"op": "set", "product_id": "p9", "size": "M", "color": "Rosa", "quantity": 1},
+    ]
+    stored = apply(existing, batch_pipeline(operations, cart_id="new", updated_at=NOW))
+    assert stored["items"] == [line("p1", quantity=5), line("p3", quantity=5)]
+    assert (stored["id"], stored["updated_at"].replace(tzinfo=timezone.utc)) == ("c1", NOW)
+
+
+def test_batch_set_below_one_removes_line():
+    operations = [{"op": "set", "product_id": "p1", "size": "M", "color": "Rosa", "quantity": 0}]
+    stored = apply(cart(line("p1")), batch_pipeline(operations, cart_id="new", updated_at=NOW))
+    assert stored["items"] == []
@@ -0,0 +1,32 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+from pydantic import BaseModel
+
+from catalog_cache import CatalogCache
+
+
+class Item(BaseModel):
+    id: str
+    name: str
+
+
+def test_failed_change_stream_falls_back_to_polling():
+    # mongomock has no change streams, so watch() fails with a TypeError
+    async def test():
+        collection = AsyncMongoMockClient()["test"]["items"]
+        await collection.insert_one({"id": "a", "name": "A"})
+        cache = CatalogCache(collection, Item, ttl_seconds=3600, poll_interval=0.01)
+        await cache.start()
+        try:
+            await collection.insert_one({"id": "b", "name": "B"})
+            for _ in range(100):
+                if "b" in cache._by_id:
+                    break
+                await asyncio.sleep(0.01)
+            assert not cache._watch_task.done()
+            assert [item.id for item in (await cache.page(None, "id", 10))[0]] == ["a", "b"]
+        finally:
+            await cache.stop()
+
+    asyncio.run(test())
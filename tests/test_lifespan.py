@@ -0,0 +1,32 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from tests.api import running_api
+
+
+def test_failing_shutdown_step_does_not_skip_the_rest(monkeypatch):
+    closed = []
+
+    stop_catalog = server.catalog_cache.stop
+
+    async def broken_stop():
+        await stop_catalog()
+        raise RuntimeError("watch task died")
+
+    async def unwritable_snapshot():
+        raise OSError("read-only file system")
+
+    monkeypatch.setattr(server.catalog_cache, "stop", broken_stop)
+    monkeypatch.setattr(server.recommendations, "stop", unwritable_snapshot)
+    monkeypatch.setattr(server.image_store, "close", lambda: closed.append("images"))
+
+    async def test():
+        async with running_api(AsyncMongoMockClient()) as http:
+            assert (await http.get("/api/products")).status_code == 200
+            hasher = server.password_hasher
+        assert closed == ["images"]
+        assert hasher._executor._shutdown
+
+    asyncio.run(test())
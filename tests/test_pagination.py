@@ -0,0 +1,83 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from pagination import InvalidCursor, decode_cursor, encode_cursor, paginate_sorted, sort_key
+
+Item = namedtuple("Item", "id price name created_at")
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+ITEMS = [
+    Item(id=f"p{index:02d}", price=float(index % 4) if index % 5 else None, name=f"Produto {index}",
+         created_at=START + timedelta(hours=index))
+    for index in range(23)
+]
+
+
+def raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def sorted_view(field: str):
+    items = sorted(ITEMS, key=lambda item: sort_key(getattr(item, field), item.id))
+    return [sort_key(getattr(item, field), item.id) for item in items], items
+
+
+@pytest.mark.parametrize("sort, value", [
+    ("price", None), ("price", 12.5), ("-price", 3), ("name", "Vestido"), ("-created_at", START),
+])
+def test_cursor_round_trips(sort, value):
+    assert decode_cursor(encode_cursor(sort, value, "p1"), sort) == (value, "p1")
+
+
+@pytest.mark.parametrize("sort", ["price", "-price", "name", "created_at", "-created_at", "id"])
+def test_pages_cover_every_item_once(sort):
+    field = sort.lstrip("-")
+    keys, items = sorted_view(field)
+    seen, cursor = [], None
+    while True:
+        page, cursor = paginate_sorted(keys, items, sort, 5, cursor)
+        seen.extend(page)
+        if cursor is None:
+            break
+    expected = list(reversed(items)) if sort.startswith("-") else items
+    assert seen == expected
+
+
+def test_cursor_for_other_sort_is_rejected():
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor("price", 10.0, "p1"), "-price")
+
+
+@pytest.mark.parametrize("sort, token", [
+    ("price", "not base64!"),
+    ("created_at", raw_cursor({"s": "created_at", "k": [{"$date": "garbage"}, "p1"]})),
+    ("created_at", raw_cursor({"s": "created_at", "k": [{"$date": 5}, "p1"]})),
+    ("price", raw_cursor({"s": "price", "k": [1.0]})),
+    ("price", raw_cursor({"s": "price", "k": [1.0, 7]})),
+])
+def test_malformed_cursor_is_rejected(sort, token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, sort)
+
+
+@pytest.mark.parametrize("sort, value", [
+    ("price", "cheap"),
+    ("price", True),
+    ("name", 3),
+    ("created_at", "2026-01-01"),
+    ("created_at", 1767225600),
+])
+def test_value_of_wrong_type_is_rejected(sort, value):
+    keys, items = sorted_view(sort)
+    with pytest.raises(InvalidCursor):
+        paginate_sorted(keys, items, sort, 5, raw_cursor({"s": sort, "k": [value, "p1"]}))
+
+
+def test_naive_date_is_rejected_for_aware_keys():
+    keys, items = sorted_view("created_at")
+    token = raw_cursor({"s": "-created_at", "k": [{"$date": "2026-01-01T05:00:00"}, "p1"]})
+    with pytest.raises(InvalidCursor):
+        paginate_sorted(keys, items, "-created_at", 5, token)
@@ -0,0 +1,45 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+import hashing
+import server
+from tests.api import auth_headers, running_api, sign_in
+
+
+def test_user_edit_is_visible_on_next_request():
+    async def test():
+        async with running_api(AsyncMongoMockClient()) as http:
+            user = await sign_in(name="Before")
+            headers = auth_headers(user)
+            assert (await http.get("/api/auth/me", headers=headers)).json()["name"] == "Before"
+            assert user.id in server.principal_cache
+
+            await server.db.users.update_one({"id": user.id}, {"$set": {"name": "After", "role": "admin"}})
+            server.invalidate_user(user.id)
+            me = (await http.get("/api/auth/me", headers=headers)).json()
+            assert (me["name"], me["role"]) == ("After", "admin")
+
+            await server.db.users.delete_one({"id": user.id})
+            server.invalidate_user(user.id)
+            assert (await http.get("/api/auth/me", headers=headers)).status_code == 401
+
+    asyncio.run(test())
+
+
+def test_login_rehash_invalidates_cached_user():
+    async def test():
+        async with running_api(AsyncMongoMockClient()) as http:
+            credentials = {"email": "rehash@example.com", "password": "segredo123"}
+            registered = await http.post("/api/auth/register", json={**credentials, "name": "Rehash"})
+            user_id = registered.json()["user"]["id"]
+            await http.get("/api/auth/me", headers=auth_headers(server.User(**registered.json()["user"])))
+            assert user_id in server.principal_cache
+
+            # A hash with fewer rounds than configured is upgraded on login
+            weak = hashing._context(4).hash(credentials["password"])
+            await server.db.users.update_one({"id": user_id}, {"$set": {"password": weak}})
+            assert (await http.post("/api/auth/login", json=credentials)).status_code == 200
+            assert user_id not in server.principal_cache
+
+    asyncio.run(test())
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+
+import httpx
+import pytest
+
+import rate_limit
+from rate_limit import MemoryBuckets, RateLimitMiddleware, client_ip, parse_rules
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def test_parse_rules():
+    login, checkout = parse_rules(" POST /api/auth/login ip 20/60:5 ; post /api/orders/{order_id} user 10/1;")
+    assert (login.key, login.rate, login.burst) == ("ip", 20 / 60, 5)
+    assert (checkout.method, checkout.rate, checkout.burst) == ("POST", 10.0, 10)
+    assert checkout.matches("POST", "/api/orders/abc")
+    assert not checkout.matches("POST", "/api/orders/abc/items")
+    assert not checkout.matches("GET", "/api/orders/abc")
+
+
+@pytest.mark.parametrize("spec", ["POST /api/x ip 10", "POST /api/x token 10/60", "POST /api/x ip ten/60"])
+def test_invalid_rules_are_rejected(spec):
+    with pytest.raises(ValueError):
+        parse_rules(spec)
+
+
+def test_bucket_allows_burst_then_refills_at_rate(clock):
+    async def test():
+        buckets = MemoryBuckets()
+        # 2 tokens per second, burst of 3
+        assert [(await buckets.take("k", 2.0, 3))[0] for _ in range(4)] == [True, True, True, False]
+        allowed, retry_after = await buckets.take("k", 2.0, 3)
+        assert not allowed and retry_after == pytest.approx(0.5)
+
+        clock.now += 0.5
+        assert (await buckets.take("k", 2.0, 3))[0]
+        assert not (await buckets.take("k", 2.0, 3))[0]
+
+        # Refill stops at the burst size
+        clock.now += 60
+        assert [(await buckets.take("k", 2.0, 3))[0] for _ in range(4)] == [True, True, True, False]
+        assert (await buckets.take("other", 2.0, 3))[0]
+
+    asyncio.run(test())
+
+
+def test_least_recently_used_keys_are_dropped(clock):
+    async def test():
+        buckets = MemoryBuckets(max_keys=2)
+        for key in ("a", "b", "c"):
+            await buckets.take(key, 1.0, 1)
+        assert not (await buckets.take("c", 1.0, 1))[0]
+        # "a" was evicted, so it starts with a full bucket again
+        assert (await buckets.take("a", 1.0, 1))[0]
+
+    asyncio.run(test())
+
+
+def test_client_ip_trusts_only_the_last_forwarded_hop():
+    scope = {"client": ("10.0.0.1", 1234), "headers": [(b"x-forwarded-for", b"6.6.6.6, 203.0.113.7")]}
+    assert client_ip(scope, trust_forwarded=True) == "203.0.113.7"
+    assert client_ip(scope, trust_forwarded=False) == "10.0.0.1"
+    assert client_ip({"client": ("10.0.0.1", 1234), "headers": []}, trust_forwarded=True) == "10.0.0.1"
+
+
+async def echo(scope, receive, send):
+    """Application answering 200 with the request body it received."""
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": body})
+
+
+def limited(spec: str, **options) -> httpx.AsyncClient:
+    app = RateLimitMiddleware(echo, parse_rules(spec), identify_user=lambda token: token or None, **options)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def test_middleware_rejects_over_limit_with_retry_after(clock):
+    async def test():
+        async with limited("POST /login ip 2/60") as http:
+            assert [(await http.post("/login")).status_code for _ in range(3)] == [200, 200, 429]
+            rejected = await http.post("/login")
+            assert rejected.headers["retry-after"] == "30"
+            assert rejected.json() == {"detail": "Too many requests"}
+            # Other routes and methods are not limited
+            assert (await http.get("/login")).status_code == 200
+            assert (await http.post("/other")).status_code == 200
+
+    asyncio.run(test())
+
+
+def test_email_key_reads_and_replays_body(clock):
+    async def test():
+        async with limited("POST /login email 1/60") as http:
+            body = {"email": " Ana@Example.com ", "password": "x"}
+            first = await http.post("/login", json=body)
+            assert first.status_code == 200 and json.loads(first.content) == body
+            assert (await http.post("/login", json={**body, "email": "ana@example.com"})).status_code == 429
+            assert (await http.post("/login", json={**body, "email": "bia@example.com"})).status_code == 200
+            # Requests without an email are not counted against any bucket
+            assert (await http.post("/login", content=b"not json")).status_code == 200
+
+    asyncio.run(test())
+
+
+def test_user_key_limits_each_token_separately(clock):
+    async def test():
+        async with limited("POST /orders user 1/60") as http:
+            ana = {"Authorization": "Bearer ana"}
+            assert (await http.post("/orders", headers=ana)).status_code == 200
+            assert (await http.post("/orders", headers=ana)).status_code == 429
+            assert (await http.post("/orders", headers={"Authorization": "Bearer bia"})).status_code == 200
+            assert (await http.post("/orders")).status_code == 200
+
+    asyncio.run(test())
+
+
+def test_forwarded_clients_get_their_own_bucket_behind_a_proxy(clock, caplog):
+    async def test(trust_forwarded):
+        async with limited("POST /login ip 1/60", trust_forwarded=trust_forwarded) as http:
+            return [
+                (await http.post("/login", headers={"X-Forwarded-For": f"203.0.113.{client}"})).status_code
+                for client in range(3)
+            ]
+
+    assert asyncio.run(test(trust_forwarded=True)) == [200, 200, 200]
+    with caplog.at_level(logging.WARNING, logger="rate_limit"):
+        assert asyncio.run(test(trust_forwarded=False)) == [200, 429, 429]
+    assert [record.message for record in caplog.records if "TRUST_FORWARDED_FOR" in record.message]
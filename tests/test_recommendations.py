@@ -0,0 +1,88 @@
+import asyncio
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from itertools import permutations
+
+from mongomock_motor import AsyncMongoMockClient
+
+from recommendations import CoOccurrence, Recommendations
+
+
+PRODUCTS = [f"p{index}" for index in range(12)]
+
+
+def expected_top(orders, product_id, k, columns):
+    """Top `k` co-purchases by count; ties go to the product seen first (lower column)."""
+    counts = Counter(
+        other
+        for order in orders if product_id in order
+        for other in set(order) if other != product_id
+    )
+    return sorted(counts, key=lambda other: (-counts[other], columns.index(other)))[:k]
+
+
+def random_orders(count, seed=7):
+    rng = random.Random(seed)
+    # Skewed towards the first products so counts differ
+    return [rng.sample(PRODUCTS[:rng.randint(4, len(PRODUCTS))], rng.randint(1, 4)) for _ in range(count)]
+
+
+def test_top_matches_counts_before_and_after_folding():
+    orders = random_orders(300)
+    matrix = CoOccurrence()
+    for order in orders[:200]:
+        matrix.add_order(order)
+    matrix.compact()
+    for order in orders[200:]:
+        matrix.add_order(order)
+
+    # Lookups merge the folded arrays with the pending delta
+    for product_id in matrix.ids:
+        assert matrix.top(product_id, 5) == expected_top(orders, product_id, 5, matrix.ids)
+    matrix.compact()
+    for product_id in matrix.ids:
+        assert matrix.top(product_id, 5) == expected_top(orders, product_id, 5, matrix.ids)
+
+
+def test_fold_counts_each_pair_once_per_order():
+    matrix = CoOccurrence()
+    matrix.add_order(["a", "b", "b", "c"])
+    matrix.add_order(["a", "b"])
+    matrix.compact()
+    assert matrix.nnz == len(list(permutations("abc", 2)))
+    assert matrix.top("a", 3) == ["b", "c"]
+    assert matrix.top("c", 3) == ["a", "b"]
+    assert matrix.top("unknown", 3) == []
+
+
+def test_snapshot_round_trip(tmp_path):
+    matrix = CoOccurrence()
+    for order in random_orders(50):
+        matrix.add_order(order)
+    matrix.save(tmp_path / "recommendations.npz", watermark_id="o1")
+    loaded, meta = CoOccurrence.load(tmp_path / "recommendations.npz")
+    assert meta == {"watermark_id": "o1"}
+    assert loaded.ids == matrix.ids
+    assert all(loaded.top(product_id, 5) == matrix.top(product_id, 5) for product_id in matrix.ids)
+
+
+def test_catch_up_reads_settled_orders_once():
+    async def test():
+        orders = AsyncMongoMockClient(tz_aware=True)["test"]["orders"]
+        now = datetime.now(timezone.utc)
+        await orders.insert_many([
+            {"id": f"o{index}", "created_at": now - timedelta(minutes=10 - index), "items": [{"product_id": "a"}, {"product_id": "b"}]}
+            for index in range(5)
+        ] + [{"id": "fresh", "created_at": now, "items": [{"product_id": "a"}, {"product_id": "c"}]}])
+
+        recommendations = Recommendations(orders, settle_seconds=60, batch_size=2)
+        assert await recommendations.catch_up() == 5
+        assert await recommendations.catch_up() == 0
+        assert recommendations.related("a", 5) == ["b"]
+
+        recommendations.settle_seconds = 0
+        assert await recommendations.catch_up() == 1
+        assert recommendations.related("a", 5) == ["b", "c"]
+
+    asyncio.run(test())
@@ -0,0 +1,100 @@
+from typing import List
+
+from pydantic import BaseModel
+
+from search import SearchIndex, fold, tokenize
+
+
+class Item(BaseModel):
+    id: str
+    name: str
+    description: str = ""
+    category: str
+    sizes: List[str] = []
+    colors: List[str] = []
+    price: float
+
+
+CATALOG = [
+    Item(id="1", name="Calça Jeans Reta", category="Calças", sizes=["P", "M"], colors=["Azul"], price=159.9),
+    Item(id="2", name="Calça de Linho", category="Calças", sizes=["M", "G"], colors=["Bege"], price=199.0),
+    Item(id="3", name="Vestido Midi Floral", description="Tecido leve de viscose", category="Vestidos",
+         sizes=["P", "M", "G"], colors=["Rosa", "Azul"], price=249.9),
+    Item(id="4", name="Blusa Básica", category="Blusas", sizes=["P"], colors=["Preto"], price=59.9),
+]
+
+
+def index(items=CATALOG) -> SearchIndex:
+    search_index = SearchIndex()
+    search_index.reset(items)
+    return search_index
+
+
+def ids(hits) -> List[str]:
+    return [item.id for item in hits.items]
+
+
+def test_tokens_are_accent_and_case_insensitive():
+    assert fold("Calça BÁSICA") == "calca basica"
+    assert tokenize("Calças de Linho") == ["calca", "linho"]
+
+
+def test_query_matches_regardless_of_accents():
+    search_index = index()
+    for query in ("calça", "calca", "CALCAS", "Calças"):
+        assert sorted(ids(search_index.search(query))) == ["1", "2"]
+    assert ids(search_index.search("basica")) == ["4"]
+
+
+def test_every_token_must_match():
+    assert ids(index().search("calca linho")) == ["2"]
+    assert index().search("calca floral").total == 0
+
+
+def test_last_token_matches_as_prefix():
+    assert ids(index().search("vest")) == ["3"]
+    assert ids(index().search("visco")) == ["3"]
+
+
+def test_name_matches_rank_above_description_matches():
+    items = [
+        Item(id="desc", name="Saia", description="Combina com vestido", category="Saias", price=1),
+        Item(id="name", name="Vestido Curto", category="Saias", price=1),
+    ]
+    assert ids(index(items).search("vestido")) == ["name", "desc"]
+
+
+def test_filters_and_facets_count_the_filtered_hits():
+    hits = index().search("", size="m", color="AZUL", max_price=200)
+    assert ids(hits) == ["1"]
+    hits = index().search("", category="calcas")
+    assert hits.total == 2
+    assert hits.facets["category"] == {"Calças": 2}
+    assert hits.facets["sizes"] == {"P": 1, "M": 2, "G": 1}
+    assert hits.facets["colors"] == {"Azul": 1, "Bege": 1}
+
+
+def test_price_range_is_inclusive():
+    assert sorted(ids(index().search("", min_price=159.9, max_price=199.0))) == ["1", "2"]
+
+
+def test_offset_and_limit_page_through_total():
+    search_index = index()
+    first = search_index.search("", limit=3)
+    second = search_index.search("", limit=3, offset=3)
+    assert (first.total, second.total) == (4, 4)
+    assert sorted(ids(first) + ids(second)) == ["1", "2", "3", "4"]
+
+
+def test_upsert_and_remove_keep_the_index_current():
+    search_index = index()
+    search_index.upsert(CATALOG[3].model_copy(update={"name": "Camisa Social", "colors": ["Branco"]}))
+    assert search_index.search("blusa basica").total == 0
+    assert ids(search_index.search("camisa")) == ["4"]
+    assert search_index.search("").facets["colors"].get("Preto") is None
+
+    search_index.remove("1")
+    assert ids(search_index.search("calca")) == ["2"]
+    search_index.upsert(Item(id="5", name="Calça Pantalona", category="Calças", price=10))
+    assert sorted(ids(search_index.search("calca"))) == ["2", "5"]
+    assert len(search_index) == 4